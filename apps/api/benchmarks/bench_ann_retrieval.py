@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Recall vs latency of chunk retrieval backends.
+
+Compares pgvector's `ORDER BY embedding <#> q LIMIT k` with the in-process
+ANN index (exact flat scan, and IVF at several nprobe settings). Exact
+top-k from the flat scan is the ground truth for recall. Query vectors are
+perturbed copies of stored chunk embeddings, so no embedding API calls are
+made.
+
+Usage (from apps/api):
+    python -m benchmarks.bench_ann_retrieval
+    python -m benchmarks.bench_ann_retrieval --nlist 256 --nprobe 4 8 16 32
+    python -m benchmarks.bench_ann_retrieval --synthetic 200000 --dim 1536   # offline, no pgvector
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import asyncpg
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.ann_index import ANNIndex
+
+
+async def load_chunks(conn: asyncpg.Connection, table: str):
+    rows = await conn.fetch(f"SELECT id, embedding::real[] AS embedding FROM {table} ORDER BY id")
+    ids = np.fromiter((row["id"] for row in rows), dtype=np.int64, count=len(rows))
+    return ids, np.array([row["embedding"] for row in rows], dtype=np.float32)
+
+
+def synthetic_chunks(n: int, dim: int, clusters: int = 200):
+    """Clustered unit vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.arange(1, n + 1, dtype=np.int64), vectors
+
+
+def make_queries(vectors: np.ndarray, count: int, noise: float) -> np.ndarray:
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), count, replace=False)]
+    queries = queries + noise * rng.standard_normal(queries.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    return len(set(found.tolist()) & set(truth.tolist())) / max(len(truth), 1)
+
+
+def time_index(index: ANNIndex, queries: np.ndarray, k: int):
+    """Per-query latency (ms) and results."""
+    timings, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(index.search(query, k)[0])
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, results
+
+
+def report(name: str, timings, results, truth) -> None:
+    p95 = sorted(timings)[int(len(timings) * 0.95) - 1]
+    mean_recall = statistics.mean(recall(found, exact) for found, exact in zip(results, truth))
+    print(f"{name:<22} {statistics.median(timings):>9.2f} {p95:>9.2f} {mean_recall:>9.3f}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--table", default="rag_chunks4")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N synthetic vectors instead of the database")
+    parser.add_argument("--dim", type=int, default=1536, help="Dimension for --synthetic")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--noise", type=float, default=0.05, help="Perturbation added to sampled query vectors")
+    parser.add_argument("-k", type=int, default=50)
+    parser.add_argument("--nlist", type=int, default=0, help="IVF partitions (default: ~sqrt(N))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    conn = None
+    if args.synthetic:
+        ids, vectors = synthetic_chunks(args.synthetic, args.dim)
+    else:
+        load_dotenv()
+        conn = await asyncpg.connect(os.getenv("DATABASE_URL"))
+        ids, vectors = await load_chunks(conn, args.table)
+    if len(ids) == 0:
+        print("No chunks to index")
+        return
+
+    queries = make_queries(vectors, min(args.queries, len(ids)), args.noise)
+    nlist = args.nlist or max(1, int(np.sqrt(len(ids))))
+    print(f"{len(ids)} chunks x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}, nlist={nlist}\n")
+    print(f"{'backend':<22} {'p50 ms':>9} {'p95 ms':>9} {'recall':>9}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        flat = ANNIndex(os.path.join(directory, "flat"))
+        flat.add(ids, vectors)
+        timings, truth = time_index(flat, queries, args.k)
+        report("ann flat (exact)", timings, truth, truth)
+
+        started = time.perf_counter()
+        ivf = ANNIndex(os.path.join(directory, "ivf"), nlist=nlist)
+        ivf.add(ids, vectors)
+        print(f"{'(ivf build)':<22} {(time.perf_counter() - started) * 1000:>9.0f}")
+        for nprobe in args.nprobe:
+            ivf.nprobe = nprobe
+            timings, results = time_index(ivf, queries, args.k)
+            report(f"ann ivf nprobe={nprobe}", timings, results, truth)
+
+    if conn is not None:
+        try:
+            timings, results = [], []
+            for query in queries:
+                literal = "[" + ",".join(repr(float(v)) for v in query) + "]"
+                started = time.perf_counter()
+                rows = await conn.fetch(
+                    f"SELECT id FROM {args.table} ORDER BY embedding <#> $1::vector LIMIT $2",
+                    literal, args.k
+                )
+                timings.append((time.perf_counter() - started) * 1000)
+                results.append(np.array([row["id"] for row in rows], dtype=np.int64))
+            report("pgvector <#>", timings, results, truth)
+        finally:
+            await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
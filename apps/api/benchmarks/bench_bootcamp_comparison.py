@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark /dashboard/bootcamp-comparison as cohorts grow.
+
+Seeds synthetic bootcamps, students, class_samples and grades into TEMP
+tables (which shadow the real tables for this connection only, nothing is
+written to the shared schema), then times the pre-aggregated comparison
+query against the old join-then-aggregate shape at increasing sizes.
+
+Usage (from apps/api):
+    python -m benchmarks.bench_bootcamp_comparison
+    python -m benchmarks.bench_bootcamp_comparison --scales 100 200 400 800 --no-legacy
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import asyncpg
+from dotenv import load_dotenv
+
+from utils.bootcamp_comparison import build_bootcamp_comparison_query
+
+# The previous query: joins every table before grouping, so rows multiply
+# as instructors x students x samples x grades per bootcamp.
+LEGACY_QUERY = """
+    SELECT
+        b.bootcamp_id,
+        COUNT(DISTINCT ib.instructor_id) as instructor_count,
+        COUNT(DISTINCT s.student_id) as student_count,
+        COUNT(DISTINCT cs.id) as total_sessions,
+        COALESCE(AVG(cs.attendance_pct), 0) as avg_attendance_rate,
+        COALESCE(AVG(cs.avg_attention_rate), 0) as avg_attention_rate,
+        COALESCE(AVG(g.score), 0) as avg_grade
+    FROM bootcamps b
+    LEFT JOIN instructor_bootcamps ib ON b.bootcamp_id = ib.bootcamp_id
+    LEFT JOIN students s ON b.bootcamp_id = s.bootcamp_id
+    LEFT JOIN class_samples cs ON s.bootcamp_id = cs.bootcamp_id
+    LEFT JOIN grades g ON s.student_id = g.student_id
+    GROUP BY b.bootcamp_id
+"""
+
+
+async def seed(conn: asyncpg.Connection, bootcamps: int, students: int, samples: int, grades: int) -> None:
+    """(Re)create TEMP tables with `students`/`samples` rows per bootcamp."""
+    for table in ("grades", "class_samples", "students", "instructor_bootcamps", "bootcamps"):
+        await conn.execute(f"DROP TABLE IF EXISTS pg_temp.{table}")
+
+    await conn.execute("""
+        CREATE TEMP TABLE bootcamps AS
+        SELECT b as bootcamp_id, 'Bootcamp ' || b as bootcamp_name,
+               CURRENT_DATE - 30 as start_date, CURRENT_DATE + 30 as end_date
+        FROM generate_series(1, $1) b
+    """, bootcamps)
+    await conn.execute("""
+        CREATE TEMP TABLE instructor_bootcamps AS
+        SELECT (b * 10 + i)::text as instructor_id, b as bootcamp_id
+        FROM generate_series(1, $1) b, generate_series(1, 2) i
+    """, bootcamps)
+    await conn.execute("""
+        CREATE TEMP TABLE students AS
+        SELECT (b - 1) * $2 + s as student_id, b as bootcamp_id
+        FROM generate_series(1, $1) b, generate_series(1, $2) s
+    """, bootcamps, students)
+    await conn.execute("""
+        CREATE TEMP TABLE class_samples AS
+        SELECT row_number() OVER () as id, b as bootcamp_id,
+               CURRENT_DATE - (n % 30) as date,
+               60 + random() * 40 as attendance_pct,
+               50 + random() * 50 as avg_attention_rate
+        FROM generate_series(1, $1) b, generate_series(1, $2) n
+    """, bootcamps, samples)
+    await conn.execute("""
+        CREATE TEMP TABLE grades AS
+        SELECT s.student_id, (40 + random() * 60)::int as score
+        FROM students s, generate_series(1, $1) g
+    """, grades)
+    for table in ("bootcamps", "instructor_bootcamps", "students", "class_samples", "grades"):
+        await conn.execute(f"ANALYZE pg_temp.{table}")
+
+
+async def time_query(conn: asyncpg.Connection, query: str, repeats: int) -> float:
+    """Median wall time in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await conn.fetch(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[50, 100, 200, 400],
+                        help="Students per bootcamp at each step (samples scale alongside)")
+    parser.add_argument("--bootcamps", type=int, default=5)
+    parser.add_argument("--samples-per-student", type=int, default=2)
+    parser.add_argument("--grades-per-student", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--no-legacy", action="store_true", help="Skip the old fan-out query")
+    args = parser.parse_args()
+
+    load_dotenv()
+    conn = await asyncpg.connect(os.getenv("DATABASE_URL"))
+    query = build_bootcamp_comparison_query()
+
+    print(f"{'students/bc':>12} {'samples/bc':>11} {'new ms':>9} {'ms/1k rows':>11} {'legacy ms':>10}")
+    try:
+        for students in args.scales:
+            samples = students * args.samples_per_student
+            await seed(conn, args.bootcamps, students, samples, args.grades_per_student)
+
+            new_ms = await time_query(conn, query, args.repeats)
+            source_rows = args.bootcamps * (students * (1 + args.grades_per_student) + samples)
+            legacy = "-"
+            if not args.no_legacy:
+                legacy = f"{await time_query(conn, LEGACY_QUERY, args.repeats):.1f}"
+
+            print(f"{students:>12} {samples:>11} {new_ms:>9.1f} {new_ms / source_rows * 1000:>11.3f} {legacy:>10}")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
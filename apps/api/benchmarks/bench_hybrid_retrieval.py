@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Entity recall and prompt size: vector-only retrieval vs hybrid retrieval.
+
+Questions are generated about student names and unit titles that appear in
+the chunk table. A question counts as a hit when a retrieved chunk mentions
+its entity. Vector retrieval at k=50 (the old default) is compared with
+hybrid retrieval at smaller k, along with the estimated tokens of the
+packed prompt context.
+
+Usage (from apps/api):
+    python -m benchmarks.bench_hybrid_retrieval
+    python -m benchmarks.bench_hybrid_retrieval --entities 50 --hybrid-k 5 10 20
+    EMBEDDING_BACKEND=fake python -m benchmarks.bench_hybrid_retrieval   # no embedding API calls
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from core.settings import settings
+from db.pool import close_pool, create_pool
+from utils.context_packer import pack_chunks
+from utils.vector_rag import RAG_TABLE, get_hybrid_chunks, get_top_k_chunks
+
+QUESTION_TEMPLATES = {
+    "student": "How is {} doing overall?",
+    "unit": "What are the average grades in {}?",
+}
+
+
+async def sample_entities(pool, per_kind: int):
+    """(kind, name) pairs whose name occurs in at least one chunk."""
+    sources = {"student": ("students", "full_name"), "unit": ("units", "unit_title")}
+    entities = []
+    for kind, (table, column) in sources.items():
+        rows = await pool.fetch(f"""
+            SELECT DISTINCT e.{column} AS name
+            FROM {table} e
+            WHERE e.{column} IS NOT NULL
+              AND EXISTS (SELECT 1 FROM {RAG_TABLE} c WHERE c.chunk_text ILIKE '%' || e.{column} || '%')
+            LIMIT $1
+        """, per_kind)
+        entities.extend((kind, row["name"]) for row in rows)
+    return entities
+
+
+async def evaluate(name: str, retrieve, entities, k: int) -> None:
+    hits, timings, tokens = 0, [], []
+    for kind, entity in entities:
+        question = QUESTION_TEMPLATES[kind].format(entity)
+        started = time.perf_counter()
+        chunks = await retrieve(question, k)
+        timings.append((time.perf_counter() - started) * 1000)
+        packed, used = pack_chunks(chunks, settings.rag_context_token_budget, settings.rag_dedupe_threshold)
+        tokens.append(used)
+        if any(entity.lower() in text.lower() for text, _, _ in packed):
+            hits += 1
+    print(f"{name:<18} {k:>4} {hits / len(entities):>9.3f} {statistics.mean(tokens):>10.0f} {statistics.median(timings):>9.1f}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=25, help="Entities sampled per kind")
+    parser.add_argument("--vector-k", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--hybrid-k", type=int, nargs="+", default=[10])
+    args = parser.parse_args()
+
+    pool = await create_pool(settings.database_url)
+    try:
+        entities = await sample_entities(pool, args.entities)
+        if not entities:
+            print("No entity names found in chunk text")
+            return
+        print(f"{len(entities)} questions against {RAG_TABLE}, reranker={settings.rag_reranker}\n")
+        print(f"{'retriever':<18} {'k':>4} {'hit rate':>9} {'ctx tokens':>10} {'p50 ms':>9}")
+
+        for k in args.vector_k:
+            await evaluate("vector", lambda q, k: get_top_k_chunks(q, k=k, pool=pool), entities, k)
+        for k in args.hybrid_k:
+            await evaluate("hybrid", lambda q, k: get_hybrid_chunks(q, k=k, pool=pool), entities, k)
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,20 @@
 from fastapi import HTTPException, Header, Depends
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 import asyncpg
 from uuid import UUID
 
 from db.pool import get_pool
 from core.rbac import is_admin, is_instructor
+from core.settings import settings
+from utils.ttl_cache import TTLCache
+
+# "{role}:{user_id}" -> list of bootcamp IDs the user may read. The role comes
+# from a request header, so an id seen as admin must not share an entry with
+# the same id seen as instructor.
+_bootcamp_scope_cache = TTLCache(
+    maxsize=settings.scope_cache_size,
+    ttl=settings.scope_cache_ttl_seconds
+)
 
 
 async def get_current_user(
@@ -70,13 +80,9 @@ async def assert_bootcamp_scope(
     
     # Check if instructor is assigned to this bootcamp
     if is_instructor(user):
-        query = """
-            SELECT 1 FROM instructor_bootcamps 
-            WHERE instructor_id = $1 AND bootcamp_id = $2
-        """
-        result = await pool.fetchrow(query, user["user_id"], bootcamp_id)
+        allowed = await get_instructor_bootcamp_ids(user["user_id"], pool)
         
-        if not result:
+        if bootcamp_id not in allowed:
             raise HTTPException(
                 status_code=403,
                 detail=f"Access denied to bootcamp {bootcamp_id}"
@@ -90,11 +96,93 @@ async def assert_bootcamp_scope(
     )
 
 
+def _scope_key(role: str, user_id: Any) -> str:
+    return f"{role}:{user_id}"
+
+
 async def get_instructor_bootcamp_ids(user_id: UUID, pool: asyncpg.Pool) -> list[int]:
     """Get bootcamps this instructor can access"""
+    key = _scope_key("instructor", user_id)
+    cached = _bootcamp_scope_cache.get(key)
+    if cached is not None:
+        return list(cached)
+    
     query = """
         SELECT bootcamp_id FROM instructor_bootcamps 
         WHERE instructor_id = $1
     """
     rows = await pool.fetch(query, user_id)
-    return [row['bootcamp_id'] for row in rows]
\ No newline at end of file
+    bootcamp_ids = [row['bootcamp_id'] for row in rows]
+    _bootcamp_scope_cache.set(key, bootcamp_ids)
+    return list(bootcamp_ids)
+
+
+async def _get_all_bootcamp_ids(user_id: Any, pool: asyncpg.Pool) -> list[int]:
+    """Get every bootcamp (admin scope)"""
+    key = _scope_key("admin", user_id)
+    cached = _bootcamp_scope_cache.get(key)
+    if cached is not None:
+        return list(cached)
+    
+    rows = await pool.fetch("SELECT bootcamp_id FROM bootcamps")
+    bootcamp_ids = [row['bootcamp_id'] for row in rows]
+    _bootcamp_scope_cache.set(key, bootcamp_ids)
+    return list(bootcamp_ids)
+
+
+def invalidate_bootcamp_scope(user_id: Optional[Any] = None) -> None:
+    """
+    Drop cached bootcamp scope.
+    
+    Call with an instructor's user_id after their assignments change, or
+    with no argument after bootcamps are created/removed.
+    """
+    if user_id is None:
+        _bootcamp_scope_cache.clear()
+    else:
+        for role in ("admin", "instructor"):
+            _bootcamp_scope_cache.pop(_scope_key(role, user_id))
+
+
+class BootcampScope:
+    """Bootcamps the current user may read, resolved once per request."""
+
+    def __init__(self, user: Dict[str, Any], bootcamp_ids: List[int]):
+        self.user = user
+        self.bootcamp_ids = bootcamp_ids
+
+    @property
+    def is_admin(self) -> bool:
+        return is_admin(self.user)
+
+    def restrict(self, requested: Optional[List[int]] = None) -> List[int]:
+        """
+        Narrow a requested bootcamp list to what the user may see.
+        
+        No request means every bootcamp in scope. Admins get the requested
+        list as-is; instructors get the intersection with their assignments.
+        """
+        if not requested:
+            return list(self.bootcamp_ids)
+        if self.is_admin:
+            return list(requested)
+        allowed = set(self.bootcamp_ids)
+        return [bid for bid in requested if bid in allowed]
+
+
+async def get_bootcamp_scope(user: Dict[str, Any] = Depends(get_current_user)) -> BootcampScope:
+    """
+    Resolve the caller's bootcamp scope.
+    
+    FastAPI caches dependencies per request, so every handler/dependency that
+    depends on this shares one lookup; across requests the result is memoized
+    per user in a bounded TTL cache.
+    """
+    pool = get_pool()
+    if is_admin(user):
+        bootcamp_ids = await _get_all_bootcamp_ids(user["user_id"], pool)
+    elif is_instructor(user):
+        bootcamp_ids = await get_instructor_bootcamp_ids(user["user_id"], pool)
+    else:
+        bootcamp_ids = []
+    return BootcampScope(user, bootcamp_ids)
\ No newline at end of file
@@ -13,6 +13,111 @@ class Settings(BaseSettings):
     openai_api_key: str = ""
     log_level: str = "info"
     
+    # Dashboard fan-out (GET /dashboard)
+    dashboard_concurrent: bool = True
+    dashboard_max_concurrency: int = 4
+    dashboard_timeout_seconds: float = 15.0
+    
+    # Bootcamp scope cache (per user)
+    scope_cache_size: int = 2048
+    scope_cache_ttl_seconds: float = 60.0
+    
+    # class_samples rollups
+    rollups_enabled: bool = True
+    rollup_refresh_interval_seconds: float = 60.0
+    rollup_batch_size: int = 50000
+    rollup_recheck_ids: int = 10000  # recent ids re-scanned for rows that committed out of id order
+    rollup_rebuild_interval_seconds: float = 0.0  # > 0: periodic full rebuild for rows committed even later
+    
+    # Dashboard response cache ("memory" or "redis"). The memory backend keeps
+    # data versions per worker, so a write handled by one worker does not
+    # invalidate the others' entries: multi-worker deployments need "redis".
+    response_cache_enabled: bool = True
+    response_cache_backend: str = "memory"
+    response_cache_url: str = "redis://localhost:6379/0"
+    response_cache_size: int = 1024
+    response_cache_ttl_seconds: float = 300.0
+    
+    # Correlation analysis scatter budget (points)
+    correlation_max_points: int = 500
+    
+    # Assistant LLM / retrieval timeouts (seconds)
+    llm_timeout_seconds: float = 30.0
+    embedding_timeout_seconds: float = 10.0
+    rag_retrieval_timeout_seconds: float = 5.0
+    
+    # SQL assistant: read-only pool for generated SELECTs (empty URL = database_url)
+    sql_rag_database_url: str = ""
+    sql_rag_pool_min_size: int = 1
+    sql_rag_pool_max_size: int = 10
+    sql_rag_statement_timeout_ms: int = 5000
+    sql_rag_max_rows: int = 200
+    sql_rag_candidates: int = 1  # > 1: generate candidates together, run the cheapest valid plan
+    sql_rag_candidate_temperature: float = 0.7
+    sql_rag_governor_enabled: bool = True  # EXPLAIN generated SQL first, cap or reject expensive plans
+    sql_rag_max_plan_cost: float = 500000.0
+    sql_rag_max_plan_rows: int = 100000
+    sql_rag_max_result_bytes: int = 1000000
+    sql_rag_stats_size: int = 500
+    
+    # Embeddings ("openai", or "fake" for offline use) and their cache
+    embedding_backend: str = "openai"
+    embedding_cache_size: int = 4096
+    embedding_cache_ttl_seconds: float = 86400.0
+    embedding_cache_persistent: bool = True
+    
+    # Assistant semantic answer cache (cosine similarity threshold)
+    answer_cache_enabled: bool = True
+    answer_cache_threshold: float = 0.95
+    answer_cache_size: int = 512
+    answer_cache_ttl_seconds: float = 3600.0
+    
+    # Chunk retrieval: "pgvector" (ORDER BY <#>) or "ann" (in-process index)
+    rag_table: str = "rag_chunks4"
+    retriever_backend: str = "pgvector"
+    ann_index_dir: str = ".ann_index"
+    ann_nlist: int = 0  # 0 = exact flat scan
+    ann_nprobe: int = 8
+    ann_refresh_interval_seconds: float = 300.0
+    ann_filter_overfetch: int = 5  # ANN candidates per result when metadata filters apply
+    
+    # Hybrid retrieval: full-text + vector fused by reciprocal rank, then reranked
+    rag_retrieval_mode: str = "hybrid"  # or "vector"
+    rag_top_k: int = 10
+    rag_candidate_k: int = 40
+    rag_rrf_k: int = 60
+    rag_text_search_config: str = "english"
+    rag_reranker: str = "lexical"  # "none", "lexical" or "cross_encoder"
+    rag_reranker_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    rag_rerank_weight: float = 0.5
+    rag_search_indexes_at_startup: bool = False  # build in the background; else run `python -m db.rag_schema`
+    
+    # RAG chunk ingestion (re-embeds only changed chunks)
+    rag_ingest_batch_size: int = 128
+    rag_ingest_interval_seconds: float = 0.0  # 0 = only when triggered
+    rag_schema_at_startup: bool = False  # needs owner rights; else run `python -m db.rag_schema`
+    
+    # SQL assistant question-template -> SQL plan cache
+    sql_plan_cache_enabled: bool = True
+    sql_plan_cache_size: int = 512
+    sql_plan_entity_refresh_seconds: float = 300.0
+    sql_plan_max_failures: int = 3
+    
+    # SQL assistant schema snapshot
+    schema_check_interval_seconds: float = 60.0
+    sql_schema_token_budget: int = 1500
+    
+    # Vector assistant prompt packing (estimated tokens)
+    rag_context_token_budget: int = 3000
+    rag_history_token_budget: int = 500
+    rag_dedupe_threshold: float = 0.8
+    
+    # Assistant per-session conversation memory
+    conversation_max_sessions: int = 1000
+    conversation_max_turns: int = 5
+    conversation_idle_ttl_seconds: float = 1800.0
+    conversation_summary_enabled: bool = False
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -7,6 +7,9 @@ logger = logging.getLogger(__name__)
 # Global connection pool
 _pool: Optional[asyncpg.Pool] = None
 
+# Separate pool for model-generated SQL (assistant); read-only at the session level
+_readonly_pool: Optional[asyncpg.Pool] = None
+
 
 async def create_pool(database_url: str) -> asyncpg.Pool:
     """Create and return a connection pool."""
@@ -28,9 +31,46 @@ async def create_pool(database_url: str) -> asyncpg.Pool:
         raise
 
 
+async def create_readonly_pool(
+    database_url: str,
+    statement_timeout_ms: int,
+    min_size: int = 1,
+    max_size: int = 10
+) -> asyncpg.Pool:
+    """
+    Create the read-only pool used to run generated SQL.
+
+    Every session defaults to read-only transactions with a statement
+    timeout, so a runaway query cannot write or hold a connection forever
+    even if a caller forgets to set them per transaction.
+    """
+    global _readonly_pool
+    try:
+        _readonly_pool = await asyncpg.create_pool(
+            database_url,
+            min_size=min_size,
+            max_size=max_size,
+            command_timeout=max(statement_timeout_ms / 1000 * 2, 5),
+            server_settings={
+                'jit': 'off',
+                'default_transaction_read_only': 'on',
+                'statement_timeout': str(statement_timeout_ms)
+            }
+        )
+        logger.info("Read-only database pool created successfully")
+        return _readonly_pool
+    except Exception as e:
+        logger.error(f"Failed to create read-only database pool: {e}")
+        raise
+
+
 async def close_pool():
-    """Close the connection pool."""
-    global _pool
+    """Close the connection pools."""
+    global _pool, _readonly_pool
+    if _readonly_pool:
+        await _readonly_pool.close()
+        _readonly_pool = None
+        logger.info("Read-only database pool closed")
     if _pool:
         await _pool.close()
         _pool = None
@@ -41,4 +81,11 @@ def get_pool() -> asyncpg.Pool:
     """Get the current connection pool."""
     if _pool is None:
         raise RuntimeError("Database pool not initialized. Call create_pool() first.")
-    return _pool
\ No newline at end of file
+    return _pool
+
+
+def get_readonly_pool() -> asyncpg.Pool:
+    """Get the read-only pool for generated SQL."""
+    if _readonly_pool is None:
+        raise RuntimeError("Read-only pool not initialized. Call create_readonly_pool() first.")
+    return _readonly_pool
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Create the RAG chunk table, its ingestion state tables and the hybrid
+retrieval search indexes.
+
+Run once per deploy (and whenever RAG_TABLE changes) as a role allowed to
+create the vector extension and own the tables; the API workers then only
+check that the tables exist (see settings.rag_schema_at_startup and
+settings.rag_search_indexes_at_startup). Rerunning it also rebuilds search
+indexes left INVALID by an interrupted concurrent build.
+
+Usage (from apps/api):
+    python -m db.rag_schema
+    python -m db.rag_schema --database-url postgresql://owner@host/classsight
+"""
+
+import argparse
+import asyncio
+import sys
+
+import asyncpg
+
+from core.settings import settings
+from utils.chunk_ingest import ensure_chunk_ingest_tables
+from utils.hybrid_retrieval import ensure_rag_search_indexes
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=settings.database_url, help="Defaults to DATABASE_URL")
+    parser.add_argument("--rag-table", default=settings.rag_table)
+    args = parser.parse_args()
+
+    pool = await asyncpg.create_pool(args.database_url, min_size=1, max_size=1)
+    try:
+        if not await ensure_chunk_ingest_tables(pool, args.rag_table):
+            print(f"Failed to create the chunk tables for {args.rag_table}", file=sys.stderr)
+            return 1
+        print(f"Chunk tables ready: {args.rag_table}")
+        if not await ensure_rag_search_indexes(pool, args.rag_table):
+            print(f"Failed to build the search indexes on {args.rag_table}", file=sys.stderr)
+            return 1
+        print(f"Search indexes ready: {args.rag_table}")
+        return 0
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,413 @@
+import asyncio
+import asyncpg
+import logging
+import time
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Pre-aggregated class_samples summaries.
+#
+# Every tier stores sums and non-null counts per bootcamp/bucket rather than
+# averages, so re-grouping (e.g. daily -> weekly, several bootcamps -> one
+# series) still yields exact averages. Tiers are refreshed incrementally from
+# a class_samples.id watermark; readers merge the rollup with the raw rows
+# not yet folded in, so results never lag behind the source table.
+#
+# Sequence ids are handed out before commit, so a row can become visible
+# after rows with higher ids were already folded. The watermark therefore
+# trails the highest scanned id by `recheck_ids`: every refresh re-scans
+# that window, and a ledger of ids folded above the watermark keeps rows
+# from being counted twice. A row committing later than that window is
+# only picked up by rebuild_rollups() (see rollup_rebuild_interval_seconds).
+
+STATE_TABLE = "class_samples_rollup_state"
+# ids folded above last_sample_id, tagged with the refresh batch that folded them
+FOLDED_TABLE = "class_samples_rollup_folded"
+
+# name -> (table, {key column: (sql type, expression over class_samples)})
+ROLLUP_TIERS = {
+    "hourly": (
+        "class_samples_rollup_hourly",
+        {
+            "date": ("DATE", "date"),
+            # -1 stands in for a NULL start_time so it can live in the primary key
+            "hour": ("SMALLINT", "COALESCE(EXTRACT(HOUR FROM start_time)::smallint, -1)"),
+        },
+    ),
+    "daily": (
+        "class_samples_rollup_daily",
+        {
+            "date": ("DATE", "date"),
+        },
+    ),
+    "weekly": (
+        "class_samples_rollup_weekly",
+        {
+            "week_start": ("TIMESTAMPTZ", "DATE_TRUNC('week', date)"),
+        },
+    ),
+}
+
+# measure name -> class_samples column. Stored as <name>_sum / <name>_n.
+ROLLUP_MEASURES = {
+    "attendance": "attendance_pct",
+    "attention": "avg_attention_rate",
+    "distraction": "avg_distraction_rate",
+    "enrolled": "students_enrolled",
+    "present": "avg_students_no",
+    "max_present": "max_students_no",
+    "min_present": "min_students_no",
+}
+
+# Whether ensure_rollup_tables() succeeded in this process
+_rollups_ready = False
+
+
+def _value_columns() -> List[str]:
+    """Non-key columns shared by every tier, in storage order."""
+    columns = ["sample_count"]
+    for name in ROLLUP_MEASURES:
+        columns.extend([f"{name}_sum", f"{name}_n"])
+    columns.extend(["max_attention", "min_attention"])
+    return columns
+
+
+def _aggregate_select(tier: str, where: str) -> str:
+    """SELECT that aggregates raw class_samples into rows shaped like `tier`."""
+    _, keys = ROLLUP_TIERS[tier]
+    key_exprs = [f"{expr} as {name}" for name, (_, expr) in keys.items()]
+    measure_exprs = ["COUNT(*) as sample_count"]
+    for name, column in ROLLUP_MEASURES.items():
+        measure_exprs.append(f"SUM({column})::double precision as {name}_sum")
+        measure_exprs.append(f"COUNT({column}) as {name}_n")
+    measure_exprs.append("MAX(max_attention_rate)::double precision as max_attention")
+    measure_exprs.append("MIN(min_attention_rate)::double precision as min_attention")
+
+    group_by = ", ".join(["bootcamp_id"] + [str(i + 2) for i in range(len(keys))])
+    return f"""
+        SELECT
+            bootcamp_id,
+            {", ".join(key_exprs + measure_exprs)}
+        FROM class_samples
+        WHERE {where}
+        GROUP BY {group_by}
+    """
+
+
+async def ensure_rollup_tables(pool: asyncpg.Pool) -> bool:
+    """Create rollup tables and watermark row if missing. Returns readiness."""
+    global _rollups_ready
+
+    value_ddl = ["sample_count BIGINT NOT NULL DEFAULT 0"]
+    for name in ROLLUP_MEASURES:
+        value_ddl.append(f"{name}_sum DOUBLE PRECISION NOT NULL DEFAULT 0")
+        value_ddl.append(f"{name}_n BIGINT NOT NULL DEFAULT 0")
+    value_ddl.extend(["max_attention DOUBLE PRECISION", "min_attention DOUBLE PRECISION"])
+
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                for table, keys in ROLLUP_TIERS.values():
+                    key_ddl = [f"{name} {sql_type} NOT NULL" for name, (sql_type, _) in keys.items()]
+                    await conn.execute(f"""
+                        CREATE TABLE IF NOT EXISTS {table} (
+                            bootcamp_id INTEGER NOT NULL,
+                            {", ".join(key_ddl + value_ddl)},
+                            PRIMARY KEY (bootcamp_id, {", ".join(keys)})
+                        )
+                    """)
+
+                await conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+                        id SMALLINT PRIMARY KEY DEFAULT 1,
+                        last_sample_id BIGINT NOT NULL DEFAULT 0,
+                        refreshed_at TIMESTAMPTZ
+                    )
+                """)
+                await conn.execute(f"""
+                    ALTER TABLE {STATE_TABLE}
+                        ADD COLUMN IF NOT EXISTS scanned_id BIGINT NOT NULL DEFAULT 0,
+                        ADD COLUMN IF NOT EXISTS last_batch BIGINT NOT NULL DEFAULT 0
+                """)
+                await conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {FOLDED_TABLE} (
+                        id BIGINT PRIMARY KEY,
+                        bootcamp_id INTEGER,
+                        batch BIGINT NOT NULL
+                    )
+                """)
+                await conn.execute(
+                    f"INSERT INTO {STATE_TABLE} (id) VALUES (1) ON CONFLICT (id) DO NOTHING"
+                )
+        _rollups_ready = True
+    except Exception as e:
+        logger.warning(f"class_samples rollups disabled: {e}")
+        _rollups_ready = False
+
+    return _rollups_ready
+
+
+def _tier_upsert(tier: str) -> str:
+    """Statement adding the class_samples rows whose ids are bound to $1 into `tier`."""
+    table, keys = ROLLUP_TIERS[tier]
+    key_names = list(keys)
+    columns = _value_columns()
+    updates = []
+    for col in columns:
+        if col == "max_attention":
+            updates.append(f"{col} = GREATEST({table}.{col}, EXCLUDED.{col})")
+        elif col == "min_attention":
+            updates.append(f"{col} = LEAST({table}.{col}, EXCLUDED.{col})")
+        else:
+            updates.append(f"{col} = {table}.{col} + EXCLUDED.{col}")
+
+    return f"""
+        INSERT INTO {table} (bootcamp_id, {", ".join(key_names + columns)})
+        {_aggregate_select(tier, "id = ANY($1::bigint[])")}
+        ON CONFLICT (bootcamp_id, {", ".join(key_names)})
+        DO UPDATE SET {", ".join(updates)}
+    """
+
+
+async def refresh_rollups(pool: asyncpg.Pool, batch_size: int = 50000, recheck_ids: int = 10000) -> int:
+    """
+    Fold class_samples rows not yet in the rollups into every tier.
+
+    Each pass scans ids from the watermark up to `batch_size` past the
+    highest id scanned so far, in its own transaction, so a large backlog
+    never holds one long lock. Ids already in the folded ledger are skipped,
+    which is what lets the last `recheck_ids` ids be scanned again for rows
+    whose transactions committed out of id order.
+
+    Note: edits to already folded samples are not picked up. Use
+    rebuild_rollups() after back-filling or editing existing samples.
+
+    Returns:
+        Number of samples folded in
+    """
+    if not _rollups_ready:
+        return 0
+
+    folded = 0
+
+    while True:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                state = await conn.fetchrow(
+                    f"SELECT last_sample_id, scanned_id, last_batch FROM {STATE_TABLE} WHERE id = 1 FOR UPDATE"
+                )
+                low = state["last_sample_id"]
+                scanned = max(state["scanned_id"], low)
+                batch = state["last_batch"] + 1
+                high = scanned + batch_size
+
+                rows = await conn.fetch(f"""
+                    INSERT INTO {FOLDED_TABLE} (id, bootcamp_id, batch)
+                    SELECT c.id, c.bootcamp_id, $3
+                    FROM class_samples c
+                    WHERE c.id > $1 AND c.id <= $2
+                      AND NOT EXISTS (SELECT 1 FROM {FOLDED_TABLE} f WHERE f.id = c.id)
+                    RETURNING id
+                """, low, high, batch)
+                ids = [row["id"] for row in rows]
+                for tier in ROLLUP_TIERS:
+                    if ids:
+                        await conn.execute(_tier_upsert(tier), ids)
+
+                newest = max((i for i in ids if i > scanned), default=None)
+                done = False
+                if newest is not None:
+                    scanned = newest
+                else:
+                    # Nothing new in this window: either caught up, or an ID
+                    # gap wider than one batch that the scan can jump over
+                    next_id = await conn.fetchval(
+                        "SELECT MIN(id) FROM class_samples WHERE id > $1", high
+                    )
+                    if next_id is None:
+                        done = True
+                    else:
+                        scanned = next_id - 1
+
+                low = max(low, scanned - recheck_ids)
+                await conn.execute(f"DELETE FROM {FOLDED_TABLE} WHERE id <= $1", low)
+                await conn.execute(f"""
+                    UPDATE {STATE_TABLE}
+                    SET last_sample_id = $1, scanned_id = $2, last_batch = $3, refreshed_at = NOW()
+                    WHERE id = 1
+                """, low, scanned, batch if ids else batch - 1)
+                folded += len(ids)
+        if done:
+            return folded
+
+
+async def rebuild_rollups(pool: asyncpg.Pool, batch_size: int = 50000, recheck_ids: int = 10000) -> int:
+    """Truncate every tier and the folded ledger, reset the watermark and refresh from scratch."""
+    if not _rollups_ready:
+        return 0
+
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(f"SELECT 1 FROM {STATE_TABLE} WHERE id = 1 FOR UPDATE")
+            for table, _ in ROLLUP_TIERS.values():
+                await conn.execute(f"TRUNCATE {table}")
+            await conn.execute(f"TRUNCATE {FOLDED_TABLE}")
+            await conn.execute(
+                f"UPDATE {STATE_TABLE} SET last_sample_id = 0, scanned_id = 0, refreshed_at = NULL WHERE id = 1"
+            )
+
+    return await refresh_rollups(pool, batch_size, recheck_ids)
+
+
+async def rollup_refresh_loop(
+    pool: asyncpg.Pool,
+    interval_seconds: float,
+    batch_size: int = 50000,
+    recheck_ids: int = 10000,
+    rebuild_interval_seconds: float = 0.0,
+    on_samples_changed: Optional[Callable[[List[int]], Awaitable[None]]] = None
+) -> None:
+    """
+    Background task: refresh rollups every `interval_seconds` until cancelled.
+
+    With `rebuild_interval_seconds` > 0 the tiers are also rebuilt from
+    scratch that often, which picks up rows that committed later than the
+    recheck window. `on_samples_changed` receives the bootcamp IDs with
+    newly folded samples, whichever worker did the folding.
+    """
+    seen_batch = None
+    last_rebuild = time.monotonic()
+    while True:
+        try:
+            if rebuild_interval_seconds > 0 and time.monotonic() - last_rebuild >= rebuild_interval_seconds:
+                last_rebuild = time.monotonic()
+                folded = await rebuild_rollups(pool, batch_size, recheck_ids)
+                logger.info(f"Rebuilt rollups from {folded} class_samples rows")
+            else:
+                folded = await refresh_rollups(pool, batch_size, recheck_ids)
+                if folded:
+                    logger.info(f"Folded {folded} class_samples rows into rollups")
+
+            if on_samples_changed is not None and _rollups_ready:
+                batch = await pool.fetchval(
+                    f"SELECT last_batch FROM {STATE_TABLE} WHERE id = 1"
+                )
+                if seen_batch is not None and batch > seen_batch:
+                    rows = await pool.fetch(
+                        f"SELECT DISTINCT bootcamp_id FROM {FOLDED_TABLE} WHERE batch > $1 AND batch <= $2",
+                        seen_batch, batch
+                    )
+                    await on_samples_changed([row["bootcamp_id"] for row in rows])
+                seen_batch = batch
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Rollup refresh failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+def _as_date(value: Optional[Union[str, date]]) -> Optional[date]:
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+def _pick_tier(granularity: str, start: Optional[date], end: Optional[date]) -> Optional[tuple]:
+    """
+    Choose the coarsest tier that answers a chart query.
+
+    Returns:
+        (tier, time_period SQL over that tier) or None when only raw rows will do
+    """
+    if granularity == "hourly":
+        return "hourly", "CASE WHEN hour < 0 THEN NULL ELSE date || ' ' || hour::text || ':00' END"
+    if granularity == "weekly":
+        # Weekly rows only answer ranges made of whole weeks (Monday..Sunday)
+        if (start is None or start.weekday() == 0) and (end is None or end.weekday() == 6):
+            return "weekly", "week_start::text"
+        return "daily", "DATE_TRUNC('week', date)::text"
+    if granularity == "daily":
+        return "daily", "date::text"
+    return None
+
+
+async def fetch_rollup_buckets(
+    conn: asyncpg.Connection,
+    bootcamp_ids: List[int],
+    granularity: str,
+    date_start: Optional[Union[str, date]] = None,
+    date_end: Optional[Union[str, date]] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Read chart buckets from the coarsest rollup tier that answers the query.
+
+    Rows carry the same columns as the raw chart queries (time_period,
+    avg_attendance, avg_attention, avg_distraction, max_attention,
+    min_attention, avg_enrolled, avg_present, avg_max_present,
+    avg_min_present, session_count) and use the same time_period labels.
+
+    Returns:
+        List of rows, or None if rollups are unavailable or cannot answer
+        this granularity (callers should fall back to class_samples).
+    """
+    if not _rollups_ready:
+        return None
+
+    start = _as_date(date_start)
+    end = _as_date(date_end)
+    picked = _pick_tier(granularity, start, end)
+    if picked is None:
+        return None
+    tier, period_expr = picked
+    table, keys = ROLLUP_TIERS[tier]
+
+    params: List[Any] = [bootcamp_ids]
+    rollup_where = ["bootcamp_id = ANY($1)"]
+    raw_where = ["bootcamp_id = ANY($1)"]
+    date_column = "week_start" if tier == "weekly" else "date"
+    if start is not None:
+        params.append(start)
+        rollup_where.append(f"{date_column} >= ${len(params)}")
+        raw_where.append(f"date >= ${len(params)}")
+    if end is not None:
+        params.append(end)
+        if tier == "weekly":
+            rollup_where.append(f"{date_column} <= ${len(params)}::date - 6")
+        else:
+            rollup_where.append(f"{date_column} <= ${len(params)}")
+        raw_where.append(f"date <= ${len(params)}")
+    raw_where.append(f"id > (SELECT last_sample_id FROM {STATE_TABLE} WHERE id = 1)")
+    raw_where.append(f"NOT EXISTS (SELECT 1 FROM {FOLDED_TABLE} f WHERE f.id = class_samples.id)")
+
+    stored_columns = ["bootcamp_id"] + list(keys) + _value_columns()
+
+    def avg(name: str) -> str:
+        return f"SUM({name}_sum) / NULLIF(SUM({name}_n), 0)"
+
+    query = f"""
+        SELECT
+            {period_expr} as time_period,
+            {avg("attendance")} as avg_attendance,
+            {avg("attention")} as avg_attention,
+            {avg("distraction")} as avg_distraction,
+            MAX(max_attention) as max_attention,
+            MIN(min_attention) as min_attention,
+            {avg("enrolled")} as avg_enrolled,
+            {avg("present")} as avg_present,
+            {avg("max_present")} as avg_max_present,
+            {avg("min_present")} as avg_min_present,
+            SUM(sample_count) as session_count
+        FROM (
+            SELECT {", ".join(stored_columns)}
+            FROM {table}
+            WHERE {" AND ".join(rollup_where)}
+            UNION ALL
+            {_aggregate_select(tier, " AND ".join(raw_where))}
+        ) parts
+        GROUP BY time_period
+        ORDER BY time_period
+    """
+
+    return await conn.fetch(query, *params)
@@ -1,11 +1,19 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 from datetime import datetime
 
 from core.settings import settings
-from db.pool import create_pool, close_pool
+from db.pool import create_pool, create_readonly_pool, close_pool
+from db.rollups import ensure_rollup_tables, rollup_refresh_loop
+from utils.ann_index import ann_refresh_loop, chunk_index
+from utils.chunk_ingest import chunk_ingest_loop, chunk_ingest_tables_exist, ensure_chunk_ingest_tables
+from utils.embedding_cache import ensure_embedding_cache_table
+from utils.hybrid_retrieval import ensure_rag_search_indexes
+from utils.schema_snapshot import ensure_schema_snapshot_table
+from utils.response_cache import bump_data_version
 from routers import (
     health,
     rbac_probe,
@@ -32,16 +40,81 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting ClassSight API...")
     try:
-        await create_pool(settings.database_url)
+        pool = await create_pool(settings.database_url)
         logger.info("Database connection established")
     except Exception as e:
         logger.error(f"Failed to connect to database: {e}")
         raise
     
+    # Read-only pool for assistant-generated SQL; the assistant degrades without it
+    try:
+        await create_readonly_pool(
+            settings.sql_rag_database_url or settings.database_url,
+            settings.sql_rag_statement_timeout_ms,
+            settings.sql_rag_pool_min_size,
+            settings.sql_rag_pool_max_size
+        )
+    except Exception as e:
+        logger.error(f"SQL assistant disabled, read-only pool unavailable: {e}")
+    
+    # Persistent tier of the embedding cache; memory-only if this fails
+    if settings.embedding_cache_persistent:
+        await ensure_embedding_cache_table(pool)
+    
+    # Persisted schema snapshot so assistant workers start warm
+    await ensure_schema_snapshot_table(pool)
+    
+    # RAG chunk table plus its ingestion state; optionally refreshed on a timer.
+    # The DDL normally runs once per deploy via `python -m db.rag_schema`.
+    ingest_task = None
+    if settings.rag_schema_at_startup:
+        ingest_ready = await ensure_chunk_ingest_tables(pool, settings.rag_table)
+    else:
+        ingest_ready = await chunk_ingest_tables_exist(pool, settings.rag_table)
+    if ingest_ready and settings.rag_ingest_interval_seconds > 0:
+        from utils.vector_rag import chunk_ingestor
+        ingest_task = asyncio.create_task(chunk_ingest_loop(chunk_ingestor, settings.rag_ingest_interval_seconds))
+    
+    # Full-text and metadata filter indexes behind hybrid chunk retrieval; built
+    # off the startup path since CREATE INDEX CONCURRENTLY can take minutes
+    index_task = None
+    if settings.rag_retrieval_mode == "hybrid" and settings.rag_search_indexes_at_startup:
+        index_task = asyncio.create_task(ensure_rag_search_indexes(pool, settings.rag_table))
+    
+    # Keep class_samples rollups current in the background
+    rollup_task = None
+    if settings.rollups_enabled and await ensure_rollup_tables(pool):
+        rollup_task = asyncio.create_task(rollup_refresh_loop(
+            pool,
+            settings.rollup_refresh_interval_seconds,
+            settings.rollup_batch_size,
+            settings.rollup_recheck_ids,
+            settings.rollup_rebuild_interval_seconds,
+            on_samples_changed=bump_data_version
+        ))
+    
+    # In-process ANN index over RAG chunks: reopen from disk, then follow new chunks
+    ann_task = None
+    if settings.retriever_backend == "ann":
+        await asyncio.to_thread(chunk_index.load)
+        ann_task = asyncio.create_task(ann_refresh_loop(
+            chunk_index,
+            pool,
+            settings.rag_table,
+            settings.ann_refresh_interval_seconds
+        ))
+    
     yield
     
     # Shutdown
     logger.info("Shutting down ClassSight API...")
+    for task in (rollup_task, ann_task, ingest_task, index_task):
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
     await close_pool()
     logger.info("Database connection closed")
 
@@ -45,6 +45,7 @@ class DashboardResponse(BaseModel):
     attention: List[SeriesPoint]
     attendance: List[SeriesPoint]
     capacity: List[SeriesPoint]
+    distraction: List[SeriesPoint] = Field(default_factory=list)
     leaderboard_students: List[LeaderboardEntry]
     leaderboard_instructors: List[LeaderboardEntry]
 
@@ -117,6 +118,7 @@ class AssistantQuery(BaseModel):
     rag_system: Optional[Literal['vector', 'sql']] = 'vector'  # Which RAG system to use
     kb: Optional[str] = None  # knowledge base scope
     bootcamp_id: Optional[int] = None
+    student_id: Optional[int] = None  # narrows document retrieval to one student
     start: Optional[date] = None
     end: Optional[date] = None
 
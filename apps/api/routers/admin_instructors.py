@@ -4,9 +4,10 @@ from datetime import datetime
 import asyncpg
 from uuid import UUID
 
-from core.deps import get_current_user, require_admin
+from core.deps import get_current_user, require_admin, invalidate_bootcamp_scope
 from db.pool import get_pool
 from utils.pagination import parse_pagination_params
+from utils.response_cache import bump_data_version
 from models.schemas import InstructorsList, InstructorRow, AssignmentBody, InstructorApproval
 
 router = APIRouter()
@@ -327,6 +328,9 @@ async def assign_instructor_to_bootcamp(
             assignment_data.is_primary or False,
             user["user_id"]
         )
+        invalidate_bootcamp_scope(user_id)
+        # Instructor counts in cached dashboard responses
+        await bump_data_version([assignment_data.bootcamp_id])
         
         return {
             "instructor_id": user_id,
@@ -377,6 +381,8 @@ async def remove_instructor_assignment(
         """
         
         await pool.execute(delete_query, user_id, bootcamp_id)
+        invalidate_bootcamp_scope(user_id)
+        await bump_data_version([bootcamp_id])
         
         return {
             "instructor_id": user_id,
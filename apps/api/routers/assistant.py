@@ -1,18 +1,39 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import Dict, Any
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
 from datetime import datetime
 from uuid import uuid4, UUID
+import asyncio
 import asyncpg
 import json
+import logging
 
-from core.deps import get_current_user, assert_bootcamp_scope
+from core.deps import (
+    BootcampScope,
+    assert_bootcamp_scope,
+    get_bootcamp_scope,
+    get_current_user,
+    require_admin
+)
+from core.settings import settings
 from db.pool import get_pool
 from models.schemas import AssistantQuery, AssistantReply
+from utils.answer_cache import answer_cache, current_versions
+from utils.chunk_ingest import get_ingest_job
+from utils.conversation_memory import conversation_memory
+from utils.tokens import estimate_tokens
 
 # Import RAG systems
 try:
-    from utils.sql_rag import answer_question
-    from utils.vector_rag import rag_answer
+    from utils.sql_rag import answer_question, resolve_question_sql, sql_cost_stats, stream_llm_answer
+    from utils.vector_rag import (
+        NO_CONTEXT_ANSWER,
+        chunk_ingestor,
+        embedding_cache,
+        prepare_rag_prompt,
+        rag_answer,
+        stream_llm
+    )
     SQL_RAG_AVAILABLE = True
     VECTOR_RAG_AVAILABLE = True
 except ImportError as e:
@@ -21,34 +42,42 @@ except ImportError as e:
     VECTOR_RAG_AVAILABLE = False
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Fire-and-forget tasks (message storage), referenced until they finish
+_background_tasks: Set[asyncio.Task] = set()
 
 
 @router.post("/query", response_model=AssistantReply)
-async def query_assistant(query: AssistantQuery):
-    """Chat with the AI assistant"""
+async def query_assistant(
+    query: AssistantQuery,
+    scope: BootcampScope = Depends(get_bootcamp_scope)
+):
+    """Chat with the AI assistant, answering only from the caller's bootcamps"""
     pool = get_pool()
     
     try:
         # Ensure we have a session ID
         session_id = query.session_id or uuid4()
-        
-        # Create a default user for session tracking (no auth required)
-        default_user_id = UUID("00000000-0000-0000-0000-000000000000")  # Anonymous user UUID
+        user_id = scope.user["user_id"]
+        await assert_bootcamp_scope(scope.user, query.bootcamp_id, pool)
         
         # Upsert chat session
-        await _ensure_chat_session(pool, session_id, default_user_id, query.bootcamp_id)
+        await _ensure_chat_session(pool, session_id, user_id, query.bootcamp_id)
         
         # Store user message
         user_message_id = await _store_message(
-            pool, session_id, default_user_id, "user", query.query
+            pool, session_id, user_id, "user", query.query
         )
         
-        # Call RAG system (no user needed for RAG)
-        rag_response = await _call_rag_system(query, None)
+        # Call RAG system within the caller's scope, reusing semantically equal answers
+        rag_response = await _call_rag_system_cached(query, scope, session_id)
+        if rag_response.get("system_used") in ("sql", "vector", "vector_fallback"):
+            await conversation_memory.record(session_id, query.query, rag_response["answer"])
         
         # Store assistant response
         assistant_message_id = await _store_message(
-            pool, session_id, default_user_id, "assistant", 
+            pool, session_id, user_id, "assistant", 
             rag_response["answer"], rag_response.get("sources", [])
         )
         
@@ -74,14 +103,17 @@ async def _ensure_chat_session(
     user_id: UUID,
     bootcamp_id: int = None
 ) -> None:
-    """Ensure chat session exists, create if not."""
+    """Ensure chat session exists, create if not. Sessions of other users are not found."""
     
     # Check if session exists
     existing = await pool.fetchrow(
-        "SELECT 1 FROM chat_sessions WHERE id = $1",
+        "SELECT user_id FROM chat_sessions WHERE id = $1",
         session_id
     )
     
+    if existing and str(existing["user_id"]) != str(user_id):
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    
     if not existing:
         # Create new session
         await pool.execute("""
@@ -102,11 +134,12 @@ async def _store_message(
     user_id: UUID,
     role: str,
     content: str,
-    sources: list = None
+    sources: list = None,
+    message_id: Optional[UUID] = None
 ) -> UUID:
     """Store a chat message and return its ID."""
     
-    message_id = uuid4()
+    message_id = message_id or uuid4()
     
     await pool.execute("""
         INSERT INTO chat_messages (
@@ -117,7 +150,100 @@ async def _store_message(
     return message_id
 
 
-async def _call_rag_system(query: AssistantQuery, user: Dict[str, Any] = None) -> Dict[str, Any]:
+def _effective_bootcamp_ids(query: AssistantQuery, scope: BootcampScope) -> Optional[List[int]]:
+    """
+    The bootcamps an assistant answer is computed over: the query's bootcamp
+    when it names one (callers check it is in scope), otherwise every
+    bootcamp the caller can see. None means no restriction (admins).
+
+    SQL, retrieval filters and the answer-cache key all use this one set,
+    so a cached answer never covers more than the key says.
+    """
+    if query.bootcamp_id is not None:
+        return [query.bootcamp_id]
+    return None if scope.is_admin else list(scope.bootcamp_ids)
+
+
+def _retrieval_filters(query: AssistantQuery, scope: BootcampScope) -> Dict[str, Any]:
+    """Chunk metadata filters: the effective bootcamps, and the query's student."""
+    filters: Dict[str, Any] = {}
+    bootcamp_ids = _effective_bootcamp_ids(query, scope)
+    if bootcamp_ids is not None:
+        filters["bootcamp_id"] = bootcamp_ids
+    if query.student_id is not None:
+        filters["student_id"] = [query.student_id]
+    return filters
+
+
+async def _lookup_cached_answer(
+    query: AssistantQuery,
+    scope: BootcampScope,
+    session_id: Optional[UUID] = None
+) -> Tuple[Optional[Dict[str, Any]], Optional[tuple]]:
+    """
+    Probe the semantic answer cache.
+
+    Returns (cached reply or None, key to store a fresh reply under). The
+    key is None when caching is off, the probe failed, or the session
+    already has conversation context: such answers depend on earlier turns
+    ("and her attendance?") and must be neither served from nor stored in
+    a cache shared with other sessions.
+    """
+    if not (settings.answer_cache_enabled and VECTOR_RAG_AVAILABLE):
+        return None, None
+
+    try:
+        summary, turns = await conversation_memory.context(session_id)
+        if summary or turns:
+            return None, None
+
+        bootcamp_ids = _effective_bootcamp_ids(query, scope)
+        # None (every bootcamp) must not share a key with an empty scope
+        cache_scope = (
+            query.rag_system,
+            query.kb,
+            None if bootcamp_ids is None else tuple(sorted(bootcamp_ids)),
+            query.student_id,
+            query.start,
+            query.end
+        )
+        versions = await current_versions(bootcamp_ids)
+        embedding = await embedding_cache.get(query.query)
+        return answer_cache.lookup(cache_scope, versions, embedding), (cache_scope, versions, embedding)
+    except Exception as e:
+        logger.warning(f"Answer cache lookup failed: {e}")
+        return None, None
+
+
+async def _call_rag_system_cached(
+    query: AssistantQuery,
+    scope: BootcampScope,
+    session_id: Optional[UUID] = None
+) -> Dict[str, Any]:
+    """
+    _call_rag_system behind the semantic answer cache.
+
+    A question close enough to one already answered for the same scope,
+    with unchanged bootcamp data and no earlier turns in the session,
+    reuses that answer. Only answers from a
+    healthy primary system are cached (no error or fallback replies).
+    """
+    cached, cache_key = await _lookup_cached_answer(query, scope, session_id)
+    if cached is not None:
+        # No LLM call was made for this reply
+        return {**cached, "tokens_used": 0}
+
+    rag_response = await _call_rag_system(query, scope, session_id)
+    if cache_key and rag_response.get("system_used") in ("sql", "vector"):
+        answer_cache.store(*cache_key, rag_response)
+    return rag_response
+
+
+async def _call_rag_system(
+    query: AssistantQuery,
+    scope: BootcampScope,
+    session_id: Optional[UUID] = None
+) -> Dict[str, Any]:
     """Process query with RAG system - V2 (SQL) is default, fallback to V1 (Vector) if V2 fails"""
     
     # Determine which system to try first
@@ -131,12 +257,13 @@ async def _call_rag_system(query: AssistantQuery, user: Dict[str, Any] = None) -
                     "tokens_used": None
                 }
             
-            result = rag_answer(query.query)
+            result = await rag_answer(query.query, session_id=session_id, filters=_retrieval_filters(query, scope))
             
             return {
                 "answer": result["answer"],
                 "sources": result.get("sources", []),
-                "tokens_used": None
+                "tokens_used": result.get("tokens_used"),
+                "system_used": "vector"
             }
         except Exception as e:
             print(f"Vector RAG Error (user requested): {e}")
@@ -152,13 +279,13 @@ async def _call_rag_system(query: AssistantQuery, user: Dict[str, Any] = None) -
         # Try SQL RAG first (V2 - preferred system)
         try:
             if SQL_RAG_AVAILABLE:
-                result = answer_question(query.query)
+                result = await answer_question(query.query, session_id, _effective_bootcamp_ids(query, scope))
                 
                 return {
                     "answer": result["answer"],
                     "sources": result.get("sources", []),
                     "tokens_used": None,
-                    "system_used": "sql"  # Track which system was used
+                    "system_used": "sql" if "error" not in result else "sql_error"  # Track which system was used
                 }
         except Exception as e:
             print(f"SQL RAG failed, falling back to Vector RAG: {e}")
@@ -167,12 +294,12 @@ async def _call_rag_system(query: AssistantQuery, user: Dict[str, Any] = None) -
         try:
             if VECTOR_RAG_AVAILABLE:
                 print("Falling back to Vector RAG system...")
-                result = rag_answer(query.query)
+                result = await rag_answer(query.query, session_id=session_id, filters=_retrieval_filters(query, scope))
                 
                 return {
                     "answer": f"{result['answer']}\n\n*Note: Answered using backup system (V1) due to primary system unavailability.*",
                     "sources": result.get("sources", []),
-                    "tokens_used": None,
+                    "tokens_used": result.get("tokens_used"),
                     "system_used": "vector_fallback"  # Track that this was a fallback
                 }
         except Exception as e:
@@ -187,6 +314,202 @@ async def _call_rag_system(query: AssistantQuery, user: Dict[str, Any] = None) -
         }
 
 
+def _sse(event: str, data: Any) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _run_in_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _single(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+async def _with_suffix(tokens: AsyncIterator[str], suffix: str) -> AsyncIterator[str]:
+    async for text in tokens:
+        yield text
+    yield suffix
+
+
+async def _open_answer_stream(
+    query: AssistantQuery,
+    scope: BootcampScope,
+    session_id: Optional[UUID] = None
+) -> Dict[str, Any]:
+    """
+    Streaming counterpart of _call_rag_system: pick a system, do retrieval or
+    SQL up front, and return sources plus an iterator of answer text.
+    """
+    if query.rag_system != 'vector' and SQL_RAG_AVAILABLE:
+        try:
+            resolved = await resolve_question_sql(query.query, _effective_bootcamp_ids(query, scope))
+            if "answer" in resolved:
+                return {"sources": [], "tokens": _single(resolved["answer"]), "system_used": "sql_error", "prompt": None}
+            return {
+                "sources": resolved["sources"],
+                "tokens": stream_llm_answer(query.query, resolved["sql"], resolved["rows"], session_id),
+                "system_used": "sql",
+                "prompt": None
+            }
+        except Exception as e:
+            logger.warning(f"SQL RAG failed, falling back to Vector RAG: {e}")
+
+    if not VECTOR_RAG_AVAILABLE:
+        raise RuntimeError("No assistant system is available")
+
+    system_used = "vector" if query.rag_system == 'vector' else "vector_fallback"
+    prepared = await prepare_rag_prompt(query.query, session_id=session_id, filters=_retrieval_filters(query, scope))
+    if prepared is None:
+        return {"sources": [], "tokens": _single(NO_CONTEXT_ANSWER), "system_used": system_used, "prompt": None}
+
+    tokens = stream_llm(prepared["prompt"])
+    if system_used == "vector_fallback":
+        tokens = _with_suffix(tokens, "\n\n*Note: Answered using backup system (V1) due to primary system unavailability.*")
+    return {"sources": prepared["sources"], "tokens": tokens, "system_used": system_used, "prompt": prepared["prompt"]}
+
+
+async def _store_user_turn(pool: asyncpg.Pool, session_id: UUID, user_id: UUID, query: AssistantQuery) -> None:
+    await _ensure_chat_session(pool, session_id, user_id, query.bootcamp_id)
+    await _store_message(pool, session_id, user_id, "user", query.query)
+
+
+async def _store_assistant_turn(
+    user_turn: asyncio.Task,
+    pool: asyncpg.Pool,
+    session_id: UUID,
+    user_id: UUID,
+    message_id: UUID,
+    answer: str,
+    sources: list
+) -> None:
+    try:
+        # The session row must exist first
+        await user_turn
+        await _store_message(pool, session_id, user_id, "assistant", answer, sources, message_id)
+    except Exception as e:
+        logger.error(f"Failed to store streamed chat turn for session {session_id}: {e}")
+
+
+@router.post("/query/stream")
+async def stream_assistant(
+    query: AssistantQuery,
+    scope: BootcampScope = Depends(get_bootcamp_scope)
+):
+    """
+    Chat with the AI assistant, streamed as server-sent events.
+
+    Events, in order: `sources` (list), one `token` ({"text"}) per answer
+    fragment, then `done` ({"session_id", "message_id", "tokens_used"}).
+    An `error` event ends the stream early. Chat messages are stored in the
+    background; `message_id` is the ID the assistant message is stored under.
+    """
+    pool = get_pool()
+    session_id = query.session_id or uuid4()
+    user_id = scope.user["user_id"]
+    await assert_bootcamp_scope(scope.user, query.bootcamp_id, pool)
+    if query.session_id is not None:
+        # Ownership must be settled before anything is streamed
+        await _ensure_chat_session(pool, session_id, user_id, query.bootcamp_id)
+
+    # Session row and user message, off the critical path
+    user_turn = _run_in_background(_store_user_turn(pool, session_id, user_id, query))
+
+    async def events() -> AsyncIterator[str]:
+        parts = []
+        try:
+            cached, cache_key = await _lookup_cached_answer(query, scope, session_id)
+            if cached is not None:
+                stream = {"sources": cached.get("sources", []), "tokens": _single(cached["answer"]), "system_used": "cache", "prompt": None}
+            else:
+                stream = await _open_answer_stream(query, scope, session_id)
+
+            yield _sse("sources", stream["sources"])
+            async for text in stream["tokens"]:
+                parts.append(text)
+                yield _sse("token", {"text": text})
+        except Exception as e:
+            yield _sse("error", {"detail": f"Failed to process query: {str(e)}"})
+            return
+
+        answer = "".join(parts)
+        if cached is not None:
+            tokens_used = 0
+        elif stream["prompt"] is not None:
+            tokens_used = estimate_tokens(stream["prompt"]) + estimate_tokens(answer)
+        else:
+            tokens_used = None
+
+        if stream["system_used"] in ("sql", "vector", "vector_fallback", "cache"):
+            await conversation_memory.record(session_id, query.query, answer)
+        if cache_key and stream["system_used"] in ("sql", "vector"):
+            answer_cache.store(*cache_key, {
+                "answer": answer,
+                "sources": stream["sources"],
+                "tokens_used": tokens_used,
+                "system_used": stream["system_used"]
+            })
+
+        message_id = uuid4()
+        _run_in_background(_store_assistant_turn(
+            user_turn, pool, session_id, user_id, message_id, answer, stream["sources"]
+        ))
+        yield _sse("done", {"session_id": session_id, "message_id": message_id, "tokens_used": tokens_used})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/ingest", status_code=202)
+async def start_chunk_ingest(
+    prune_untracked: bool = False,
+    user: Dict[str, Any] = Depends(require_admin)
+):
+    """
+    Refresh the assistant's document chunks from the database (admin only).
+
+    Runs in the background; only chunks whose content changed are
+    re-embedded. Poll GET /assistant/ingest for progress.
+    """
+    if not VECTOR_RAG_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Vector RAG system is not available")
+    if chunk_ingestor.progress.get("status") == "running":
+        return chunk_ingestor.progress
+    _run_in_background(chunk_ingestor.run(prune_untracked))
+    return {"status": "started"}
+
+
+@router.get("/ingest")
+async def get_chunk_ingest_status(
+    job_id: Optional[int] = None,
+    user: Dict[str, Any] = Depends(require_admin)
+):
+    """Progress of a chunk ingestion job (the latest one by default), from any worker."""
+    job = await get_ingest_job(get_pool(), job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
+
+
+
+@router.get("/sql-stats")
+async def get_sql_cost_stats(
+    recent: int = 20,
+    user: Dict[str, Any] = Depends(require_admin)
+):
+    """Plan estimates and run times of recent generated SQL in this worker (admin only)."""
+    if not SQL_RAG_AVAILABLE:
+        raise HTTPException(status_code=503, detail="SQL RAG system is not available")
+    return sql_cost_stats.snapshot(recent)
+
+
 # Optional: Get chat history
 @router.get("/sessions/{session_id}/messages")
 async def get_chat_history(
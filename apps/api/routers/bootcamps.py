@@ -3,10 +3,11 @@ from typing import Dict, Any, Optional
 from datetime import date
 import asyncpg
 
-from core.deps import get_current_user, require_admin, assert_bootcamp_scope, get_instructor_bootcamp_ids
+from core.deps import get_current_user, require_admin, assert_bootcamp_scope, get_instructor_bootcamp_ids, invalidate_bootcamp_scope
 from core.rbac import is_admin, is_instructor  
 from db.pool import get_pool
 from utils.pagination import parse_pagination_params
+from utils.response_cache import bump_data_version
 from models.schemas import BootcampsList, BootcampRow, BootcampCreate, BootcampUpdate
 
 router = APIRouter()
@@ -183,6 +184,9 @@ async def create_bootcamp(
             bootcamp_data.description,
             user["user_id"]
         )
+        # Admin scope covers every bootcamp, so cached scopes are now stale
+        invalidate_bootcamp_scope()
+        await bump_data_version([result['bootcamp_id']])
         
         # Determine status
         today = date.today()
@@ -395,6 +399,7 @@ async def update_bootcamp(
         """
         
         updated = await pool.fetchrow(update_query, *params)
+        await bump_data_version([bootcamp_id])
         
         # Get counts for response
         counts_query = """
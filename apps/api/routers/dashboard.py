@@ -1,15 +1,25 @@
 from fastapi import APIRouter, Depends, Query, HTTPException, Body
 from typing import Dict, Any, Optional, List
 from datetime import date, datetime, timedelta
+import asyncio
 import asyncpg
 from statistics import mean
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import logging
 
-from core.deps import get_current_user, assert_bootcamp_scope, get_instructor_bootcamp_ids
+from core.deps import get_current_user, get_bootcamp_scope, BootcampScope
 from core.rbac import is_admin, is_instructor
+from core.settings import settings
 from db.pool import get_pool
-from utils.dates import resolve_date_range, granularity_to_sql_bucket
+from db.rollups import fetch_rollup_buckets
+from utils.concurrency import gather_limited, gather_settled
+from utils.correlation import fetch_correlation_columns, compute_correlations, downsample_scatter
+from utils.bootcamp_comparison import fetch_bootcamp_comparison
+from utils.dates import resolve_date_range
+from utils.downsample import downsample_rows, downsample_series
+from utils.instructor_metrics import fetch_instructor_metrics, score_instructors
+from utils.response_cache import cache_response
+from utils.series import get_combined_series
 from models.schemas import DashboardResponse, Kpi, SeriesPoint, LeaderboardEntry
 
 class DashboardFilters(BaseModel):
@@ -123,39 +133,24 @@ class DashboardFilters(BaseModel):
     include_completed: bool = False
     date_start: Optional[str] = None
     date_end: Optional[str] = None
+    max_points: Optional[int] = Field(None, ge=2, description="Point budget for scatter/series responses")
+
+class DashboardBatchRequest(BaseModel):
+    widgets: List[str]
+    filters: DashboardFilters = DashboardFilters()
 
 @router.post("/kpis")
+@cache_response("kpis")
 async def get_kpis(
     filters: DashboardFilters = Body(...),
-    user: Dict[str, Any] = Depends(get_current_user)
+    user: Dict[str, Any] = Depends(get_current_user),
+    scope: BootcampScope = Depends(get_bootcamp_scope)
 ):
     """Get KPI metrics from real database data"""
     pool = get_pool()
     try:
         async with pool.acquire() as conn:
-            # Filter bootcamps based on user role
-            allowed_bootcamps = []
-            if filters.bootcamp_ids:
-                if not is_admin(user):
-                    # Verify instructor has access to these bootcamps
-                    instructor_bootcamps = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                    instructor_bootcamp_ids = [row["bootcamp_id"] for row in instructor_bootcamps]
-                    allowed_bootcamps = [bid for bid in filters.bootcamp_ids if bid in instructor_bootcamp_ids]
-                else:
-                    allowed_bootcamps = filters.bootcamp_ids
-            else:
-                # Get all accessible bootcamps
-                if is_admin(user):
-                    bootcamp_rows = await conn.fetch("SELECT bootcamp_id FROM bootcamps")
-                else:
-                    bootcamp_rows = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                allowed_bootcamps = [row["bootcamp_id"] for row in bootcamp_rows]
+            allowed_bootcamps = scope.restrict(filters.bootcamp_ids)
 
             if not allowed_bootcamps:
                 return {
@@ -283,204 +278,170 @@ async def get_kpis(
         logger.error(f"Failed to fetch KPIs: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch KPIs: {str(e)}")
 
+# Shared chart bucket scan (attendance / attention / student metrics)
+
+# time_period label per chart granularity, over raw class_samples
+CHART_PERIODS = {
+    "half-hourly": "cs.date || ' ' || cs.start_time",
+    "hourly": "cs.date || ' ' || EXTRACT(HOUR FROM cs.start_time)::text || ':00'",
+    "daily": "cs.date::text",
+    "weekly": "DATE_TRUNC('week', cs.date)::text"
+}
+
+
+async def _fetch_chart_buckets(
+    conn: asyncpg.Connection,
+    allowed_bootcamps: List[int],
+    granularity: str,
+    date_start: Optional[str],
+    date_end: Optional[str]
+) -> List[asyncpg.Record]:
+    """
+    Every chart measure per time bucket in one scan.
+    
+    Reads the coarsest class_samples rollup when one answers the query,
+    otherwise aggregates raw class_samples.
+    """
+    rows = await fetch_rollup_buckets(conn, allowed_bootcamps, granularity, date_start, date_end)
+    if rows is not None:
+        return rows
+    
+    date_group = CHART_PERIODS.get(granularity, "cs.date::text")
+    
+    params = [allowed_bootcamps]
+    date_filter = ""
+    if date_start:
+        date_filter += " AND cs.date >= $2"
+        params.append(date_start)
+    if date_end:
+        date_filter += f" AND cs.date <= ${len(params) + 1}"
+        params.append(date_end)
+
+    query = f"""
+        SELECT 
+            {date_group} as time_period,
+            AVG(cs.attendance_pct) as avg_attendance,
+            AVG(cs.avg_attention_rate) as avg_attention,
+            AVG(cs.avg_distraction_rate) as avg_distraction,
+            MAX(cs.max_attention_rate) as max_attention,
+            MIN(cs.min_attention_rate) as min_attention,
+            AVG(cs.students_enrolled) as avg_enrolled,
+            AVG(cs.avg_students_no) as avg_present,
+            AVG(cs.max_students_no) as avg_max_present,
+            AVG(cs.min_students_no) as avg_min_present,
+            COUNT(*) as session_count
+        FROM class_samples cs
+        WHERE cs.bootcamp_id = ANY($1) {date_filter}
+        GROUP BY {date_group}
+        ORDER BY time_period
+    """
+    
+    return await conn.fetch(query, *params)
+
+
+def _format_attendance_chart(rows: List[asyncpg.Record], max_points: Optional[int] = None) -> List[Dict[str, Any]]:
+    chart_data = [
+        {
+            "date": row["time_period"],
+            "attendance": round(row["avg_attendance"] or 0, 1),
+            "session_count": row["session_count"]
+        }
+        for row in rows
+    ]
+    return downsample_rows(chart_data, "attendance", max_points)
+
+
+def _format_attention_chart(rows: List[asyncpg.Record], max_points: Optional[int] = None) -> List[Dict[str, Any]]:
+    chart_data = [
+        {
+            "date": row["time_period"],
+            "attention": round(row["avg_attention"] or 0, 1),
+            "distraction": round(row["avg_distraction"] or 0, 1),
+            "max_attention": round(row["max_attention"] or 0, 1),
+            "min_attention": round(row["min_attention"] or 0, 1),
+            "session_count": row["session_count"]
+        }
+        for row in rows
+    ]
+    return downsample_rows(chart_data, "attention", max_points)
+
+
+def _format_student_metrics(rows: List[asyncpg.Record], max_points: Optional[int] = None) -> List[Dict[str, Any]]:
+    chart_data = [
+        {
+            "date": row["time_period"],
+            "enrolled": round(row["avg_enrolled"] or 0, 1),
+            "avg_present": round(row["avg_present"] or 0, 1),
+            "max_present": round(row["avg_max_present"] or 0, 1),
+            "min_present": round(row["avg_min_present"] or 0, 1),
+            "session_count": row["session_count"]
+        }
+        for row in rows
+    ]
+    return downsample_rows(chart_data, "avg_present", max_points)
+
 @router.post("/attendance-chart")
+@cache_response("attendance-chart")
 async def get_attendance_chart(
     filters: DashboardFilters = Body(...),
-    user: Dict[str, Any] = Depends(get_current_user)
+    user: Dict[str, Any] = Depends(get_current_user),
+    scope: BootcampScope = Depends(get_bootcamp_scope)
 ):
     """Get attendance chart data based on time granularity"""
     pool = get_pool()
     try:
         async with pool.acquire() as conn:
-            # Get allowed bootcamps based on user role
-            allowed_bootcamps = []
-            if filters.bootcamp_ids:
-                if not is_admin(user):
-                    instructor_bootcamps = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                    instructor_bootcamp_ids = [row["bootcamp_id"] for row in instructor_bootcamps]
-                    allowed_bootcamps = [bid for bid in filters.bootcamp_ids if bid in instructor_bootcamp_ids]
-                else:
-                    allowed_bootcamps = filters.bootcamp_ids
-            else:
-                if is_admin(user):
-                    bootcamp_rows = await conn.fetch("SELECT bootcamp_id FROM bootcamps")
-                else:
-                    bootcamp_rows = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                allowed_bootcamps = [row["bootcamp_id"] for row in bootcamp_rows]
+            allowed_bootcamps = scope.restrict(filters.bootcamp_ids)
 
             if not allowed_bootcamps:
                 return []
 
-            # Build date aggregation based on granularity
-            date_format_map = {
-                "half-hourly": "cs.date || ' ' || cs.start_time",
-                "hourly": "cs.date || ' ' || EXTRACT(HOUR FROM cs.start_time)::text || ':00'",
-                "daily": "cs.date::text",
-                "weekly": "DATE_TRUNC('week', cs.date)::text"
-            }
-            
-            date_group = date_format_map.get(filters.granularity, "cs.date::text")
-            
-            # Build query with filters
-            params = [allowed_bootcamps]
-            date_filter = ""
-            if filters.date_start:
-                date_filter += " AND cs.date >= $2"
-                params.append(filters.date_start)
-            if filters.date_end:
-                date_filter += f" AND cs.date <= ${len(params) + 1}"
-                params.append(filters.date_end)
-
-            query = f"""
-                SELECT 
-                    {date_group} as time_period,
-                    AVG(cs.attendance_pct) as avg_attendance,
-                    COUNT(*) as session_count
-                FROM class_samples cs
-                WHERE cs.bootcamp_id = ANY($1) {date_filter}
-                GROUP BY {date_group}
-                ORDER BY time_period
-            """
-            
-            rows = await conn.fetch(query, *params)
-            
-            chart_data = []
-            for row in rows:
-                chart_data.append({
-                    "date": row["time_period"],
-                    "attendance": round(row["avg_attendance"] or 0, 1),
-                    "session_count": row["session_count"]
-                })
-            
-            return chart_data
+            rows = await _fetch_chart_buckets(
+                conn, allowed_bootcamps, filters.granularity, filters.date_start, filters.date_end
+            )
+            return _format_attendance_chart(rows, filters.max_points)
             
     except Exception as e:
         logger.error(f"Failed to fetch attendance chart: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch attendance chart: {str(e)}")
 
 @router.post("/attention-chart") 
+@cache_response("attention-chart")
 async def get_attention_chart(
     filters: DashboardFilters = Body(...),
-    user: Dict[str, Any] = Depends(get_current_user)
+    user: Dict[str, Any] = Depends(get_current_user),
+    scope: BootcampScope = Depends(get_bootcamp_scope)
 ):
     """Get attention vs distraction chart data"""
     pool = get_pool()
     try:
         async with pool.acquire() as conn:
-            # Get allowed bootcamps
-            allowed_bootcamps = []
-            if filters.bootcamp_ids:
-                if not is_admin(user):
-                    instructor_bootcamps = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                    instructor_bootcamp_ids = [row["bootcamp_id"] for row in instructor_bootcamps]
-                    allowed_bootcamps = [bid for bid in filters.bootcamp_ids if bid in instructor_bootcamp_ids]
-                else:
-                    allowed_bootcamps = filters.bootcamp_ids
-            else:
-                if is_admin(user):
-                    bootcamp_rows = await conn.fetch("SELECT bootcamp_id FROM bootcamps")
-                else:
-                    bootcamp_rows = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                allowed_bootcamps = [row["bootcamp_id"] for row in bootcamp_rows]
+            allowed_bootcamps = scope.restrict(filters.bootcamp_ids)
 
             if not allowed_bootcamps:
                 return []
 
-            # Date aggregation based on granularity
-            date_format_map = {
-                "half-hourly": "cs.date || ' ' || cs.start_time",
-                "hourly": "cs.date || ' ' || EXTRACT(HOUR FROM cs.start_time)::text || ':00'", 
-                "daily": "cs.date::text",
-                "weekly": "DATE_TRUNC('week', cs.date)::text"
-            }
-            
-            date_group = date_format_map.get(filters.granularity, "cs.date::text")
-            
-            # Build query with filters
-            params = [allowed_bootcamps]
-            date_filter = ""
-            if filters.date_start:
-                date_filter += " AND cs.date >= $2"
-                params.append(filters.date_start)
-            if filters.date_end:
-                date_filter += f" AND cs.date <= ${len(params) + 1}"
-                params.append(filters.date_end)
-
-            query = f"""
-                SELECT 
-                    {date_group} as time_period,
-                    AVG(cs.avg_attention_rate) as avg_attention,
-                    AVG(cs.avg_distraction_rate) as avg_distraction,
-                    MAX(cs.max_attention_rate) as max_attention,
-                    MIN(cs.min_attention_rate) as min_attention,
-                    COUNT(*) as session_count
-                FROM class_samples cs
-                WHERE cs.bootcamp_id = ANY($1) {date_filter}
-                GROUP BY {date_group}
-                ORDER BY time_period
-            """
-            
-            rows = await conn.fetch(query, *params)
-            
-            chart_data = []
-            for row in rows:
-                chart_data.append({
-                    "date": row["time_period"],
-                    "attention": round(row["avg_attention"] or 0, 1),
-                    "distraction": round(row["avg_distraction"] or 0, 1),
-                    "max_attention": round(row["max_attention"] or 0, 1),
-                    "min_attention": round(row["min_attention"] or 0, 1),
-                    "session_count": row["session_count"]
-                })
-            
-            return chart_data
+            rows = await _fetch_chart_buckets(
+                conn, allowed_bootcamps, filters.granularity, filters.date_start, filters.date_end
+            )
+            return _format_attention_chart(rows, filters.max_points)
             
     except Exception as e:
         logger.error(f"Failed to fetch attention chart: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch attention chart: {str(e)}")
 
 @router.post("/grade-distribution")
+@cache_response("grade-distribution")
 async def get_grade_distribution(
     filters: DashboardFilters = Body(...),
-    user: Dict[str, Any] = Depends(get_current_user)
+    user: Dict[str, Any] = Depends(get_current_user),
+    scope: BootcampScope = Depends(get_bootcamp_scope)
 ):
     """Get grade distribution data from real database"""
     pool = get_pool()
     try:
         async with pool.acquire() as conn:
-            # Get allowed bootcamps
-            allowed_bootcamps = []
-            if filters.bootcamp_ids:
-                if not is_admin(user):
-                    instructor_bootcamps = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                    instructor_bootcamp_ids = [row["bootcamp_id"] for row in instructor_bootcamps]
-                    allowed_bootcamps = [bid for bid in filters.bootcamp_ids if bid in instructor_bootcamp_ids]
-                else:
-                    allowed_bootcamps = filters.bootcamp_ids
-            else:
-                if is_admin(user):
-                    bootcamp_rows = await conn.fetch("SELECT bootcamp_id FROM bootcamps")
-                else:
-                    bootcamp_rows = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                allowed_bootcamps = [row["bootcamp_id"] for row in bootcamp_rows]
+            allowed_bootcamps = scope.restrict(filters.bootcamp_ids)
 
             if not allowed_bootcamps:
                 return []
@@ -522,102 +483,36 @@ async def get_grade_distribution(
         raise HTTPException(status_code=500, detail=f"Failed to fetch grade distribution: {str(e)}")
 
 @router.post("/student-metrics")
+@cache_response("student-metrics")
 async def get_student_metrics(
     filters: DashboardFilters = Body(...),
-    user: Dict[str, Any] = Depends(get_current_user)
+    user: Dict[str, Any] = Depends(get_current_user),
+    scope: BootcampScope = Depends(get_bootcamp_scope)
 ):
     """Get student count and headcount metrics from camera data"""
-    # Extract filter values
-    bootcamp_ids = filters.bootcamp_ids
-    granularity = filters.granularity
-    include_completed = filters.include_completed
-    date_start = filters.date_start
-    date_end = filters.date_end
     pool = get_pool()
     try:
         async with pool.acquire() as conn:
-            # Get allowed bootcamps
-            allowed_bootcamps = []
-            if bootcamp_ids:
-                if not is_admin(user):
-                    instructor_bootcamps = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                    instructor_bootcamp_ids = [row["bootcamp_id"] for row in instructor_bootcamps]
-                    allowed_bootcamps = [bid for bid in bootcamp_ids if bid in instructor_bootcamp_ids]
-                else:
-                    allowed_bootcamps = bootcamp_ids
-            else:
-                if is_admin(user):
-                    bootcamp_rows = await conn.fetch("SELECT bootcamp_id FROM bootcamps")
-                else:
-                    bootcamp_rows = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                allowed_bootcamps = [row["bootcamp_id"] for row in bootcamp_rows]
+            allowed_bootcamps = scope.restrict(filters.bootcamp_ids)
 
             if not allowed_bootcamps:
                 return []
 
-            # Date aggregation
-            date_format_map = {
-                "half-hourly": "cs.date || ' ' || cs.start_time",
-                "hourly": "cs.date || ' ' || EXTRACT(HOUR FROM cs.start_time)::text || ':00'",
-                "daily": "cs.date::text", 
-                "weekly": "DATE_TRUNC('week', cs.date)::text"
-            }
-            
-            date_group = date_format_map.get(granularity, "cs.date::text")
-            
-            # Build query
-            params = [allowed_bootcamps]
-            date_filter = ""
-            if date_start:
-                date_filter += " AND cs.date >= $2"
-                params.append(date_start)
-            if date_end:
-                date_filter += f" AND cs.date <= ${len(params) + 1}"
-                params.append(date_end)
-
-            query = f"""
-                SELECT 
-                    {date_group} as time_period,
-                    AVG(cs.students_enrolled) as avg_enrolled,
-                    AVG(cs.avg_students_no) as avg_present,
-                    AVG(cs.max_students_no) as avg_max_present,
-                    AVG(cs.min_students_no) as avg_min_present,
-                    COUNT(*) as session_count
-                FROM class_samples cs
-                WHERE cs.bootcamp_id = ANY($1) {date_filter}
-                GROUP BY {date_group}
-                ORDER BY time_period
-            """
-            
-            rows = await conn.fetch(query, *params)
-            
-            metrics_data = []
-            for row in rows:
-                metrics_data.append({
-                    "date": row["time_period"],
-                    "enrolled": round(row["avg_enrolled"] or 0, 1),
-                    "avg_present": round(row["avg_present"] or 0, 1),
-                    "max_present": round(row["avg_max_present"] or 0, 1),
-                    "min_present": round(row["avg_min_present"] or 0, 1),
-                    "session_count": row["session_count"]
-                })
-            
-            return metrics_data
+            rows = await _fetch_chart_buckets(
+                conn, allowed_bootcamps, filters.granularity, filters.date_start, filters.date_end
+            )
+            return _format_student_metrics(rows, filters.max_points)
             
     except Exception as e:
         logger.error(f"Failed to fetch student metrics: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch student metrics: {str(e)}")
 
 @router.post("/grade-performance")
+@cache_response("grade-performance")
 async def get_grade_performance(
     filters: DashboardFilters = Body(...),
-    user: Dict[str, Any] = Depends(get_current_user)
+    user: Dict[str, Any] = Depends(get_current_user),
+    scope: BootcampScope = Depends(get_bootcamp_scope)
 ):
     """Get grade performance and distribution data"""
     # Extract filter values
@@ -629,27 +524,7 @@ async def get_grade_performance(
     pool = get_pool()
     try:
         async with pool.acquire() as conn:
-            # Get allowed bootcamps
-            allowed_bootcamps = []
-            if bootcamp_ids:
-                if not is_admin(user):
-                    instructor_bootcamps = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                    instructor_bootcamp_ids = [row["bootcamp_id"] for row in instructor_bootcamps]
-                    allowed_bootcamps = [bid for bid in bootcamp_ids if bid in instructor_bootcamp_ids]
-                else:
-                    allowed_bootcamps = bootcamp_ids
-            else:
-                if is_admin(user):
-                    bootcamp_rows = await conn.fetch("SELECT bootcamp_id FROM bootcamps")
-                else:
-                    bootcamp_rows = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                allowed_bootcamps = [row["bootcamp_id"] for row in bootcamp_rows]
+            allowed_bootcamps = scope.restrict(bootcamp_ids)
 
             if not allowed_bootcamps:
                 return {"distribution": [], "trends": []}
@@ -739,7 +614,7 @@ async def get_grade_performance(
 
             return {
                 "distribution": distribution,
-                "trends": trends
+                "trends": downsample_rows(trends, "avg_score", filters.max_points)
             }
             
     except Exception as e:
@@ -747,35 +622,17 @@ async def get_grade_performance(
         raise HTTPException(status_code=500, detail=f"Failed to fetch grade performance: {str(e)}")
 
 @router.post("/leaderboard")
+@cache_response("leaderboard")
 async def get_leaderboard(
     filters: DashboardFilters = Body(...),
-    user: Dict[str, Any] = Depends(get_current_user)
+    user: Dict[str, Any] = Depends(get_current_user),
+    scope: BootcampScope = Depends(get_bootcamp_scope)
 ):
     """Get student leaderboard"""
     pool = get_pool()
     try:
         async with pool.acquire() as conn:
-            # Get allowed bootcamps
-            allowed_bootcamps = []
-            if filters.bootcamp_ids:
-                if not is_admin(user):
-                    instructor_bootcamps = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                    instructor_bootcamp_ids = [row["bootcamp_id"] for row in instructor_bootcamps]
-                    allowed_bootcamps = [bid for bid in filters.bootcamp_ids if bid in instructor_bootcamp_ids]
-                else:
-                    allowed_bootcamps = filters.bootcamp_ids
-            else:
-                if is_admin(user):
-                    bootcamp_rows = await conn.fetch("SELECT bootcamp_id FROM bootcamps")
-                else:
-                    bootcamp_rows = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                allowed_bootcamps = [row["bootcamp_id"] for row in bootcamp_rows]
+            allowed_bootcamps = scope.restrict(filters.bootcamp_ids)
 
             if not allowed_bootcamps:
                 return []
@@ -815,35 +672,17 @@ async def get_leaderboard(
         raise HTTPException(status_code=500, detail=f"Failed to fetch leaderboard: {str(e)}")
 
 @router.post("/attendance-heatmap")
+@cache_response("attendance-heatmap")
 async def get_attendance_heatmap(
     filters: DashboardFilters = Body(...),
-    user: Dict[str, Any] = Depends(get_current_user)
+    user: Dict[str, Any] = Depends(get_current_user),
+    scope: BootcampScope = Depends(get_bootcamp_scope)
 ):
     """Get attendance heatmap data"""
     pool = get_pool()
     try:
         async with pool.acquire() as conn:
-            # Get allowed bootcamps
-            allowed_bootcamps = []
-            if filters.bootcamp_ids:
-                if not is_admin(user):
-                    instructor_bootcamps = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                    instructor_bootcamp_ids = [row["bootcamp_id"] for row in instructor_bootcamps]
-                    allowed_bootcamps = [bid for bid in filters.bootcamp_ids if bid in instructor_bootcamp_ids]
-                else:
-                    allowed_bootcamps = filters.bootcamp_ids
-            else:
-                if is_admin(user):
-                    bootcamp_rows = await conn.fetch("SELECT bootcamp_id FROM bootcamps")
-                else:
-                    bootcamp_rows = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                allowed_bootcamps = [row["bootcamp_id"] for row in bootcamp_rows]
+            allowed_bootcamps = scope.restrict(filters.bootcamp_ids)
 
             if not allowed_bootcamps:
                 return []
@@ -885,7 +724,9 @@ async def get_dashboard(
     start: Optional[date] = Query(None, description="Start date (defaults to current Saudi week)"),
     end: Optional[date] = Query(None, description="End date (defaults to current Saudi week)"),
     granularity: str = Query("day", description="Time granularity: 30m, hour, day, week"),
-    user: Dict[str, Any] = Depends(get_current_user)
+    max_points: Optional[int] = Query(None, ge=2, description="Downsample each series to at most this many points"),
+    user: Dict[str, Any] = Depends(get_current_user),
+    scope: BootcampScope = Depends(get_bootcamp_scope)
 ):
     """Get dashboard data with analytics"""
     pool = get_pool()
@@ -894,7 +735,11 @@ async def get_dashboard(
     start_date, end_date = resolve_date_range(start, end)
     
     # Check bootcamp access permissions
-    await assert_bootcamp_scope(user, bootcamp_id, pool)
+    if bootcamp_id is not None and not scope.restrict([bootcamp_id]):
+        raise HTTPException(
+            status_code=403,
+            detail=f"Access denied to bootcamp {bootcamp_id}"
+        )
     
     # Get bootcamp filter for instructor
     bootcamp_filter = []
@@ -902,31 +747,42 @@ async def get_dashboard(
         if bootcamp_id:
             bootcamp_filter = [bootcamp_id]
         else:
-            bootcamp_filter = await get_instructor_bootcamp_ids(user["user_id"], pool)
+            bootcamp_filter = scope.restrict()
             if not bootcamp_filter:
                 # Instructor has no bootcamps assigned
                 return _empty_dashboard_response()
     elif bootcamp_id:
         bootcamp_filter = [bootcamp_id]
     
+    # Each section is independent; every helper goes through the pool, so each
+    # one runs on its own pooled connection when fanned out.
+    sections = {
+        "kpis": lambda: _get_dashboard_kpis(pool, bootcamp_filter, start_date, end_date),
+        "series": lambda: get_combined_series(pool, bootcamp_filter, start_date, end_date, granularity),
+        "leaderboard_students": lambda: _get_student_leaderboard(pool, bootcamp_filter, start_date, end_date),
+        "leaderboard_instructors": lambda: _get_instructor_leaderboard(pool, bootcamp_filter, start_date, end_date),
+    }
+    
     # Build the response
     try:
-        kpis = await _get_dashboard_kpis(pool, bootcamp_filter, start_date, end_date)
-        attention_series = await _get_attention_series(pool, bootcamp_filter, start_date, end_date, granularity)
-        attendance_series = await _get_attendance_series(pool, bootcamp_filter, start_date, end_date, granularity)
-        capacity_series = await _get_capacity_series(pool, bootcamp_filter, start_date, end_date, granularity)
-        student_leaderboard = await _get_student_leaderboard(pool, bootcamp_filter, start_date, end_date)
-        instructor_leaderboard = await _get_instructor_leaderboard(pool, bootcamp_filter, start_date, end_date)
+        if settings.dashboard_concurrent:
+            results = await gather_limited(
+                sections,
+                limit=settings.dashboard_max_concurrency,
+                timeout=settings.dashboard_timeout_seconds
+            )
+        else:
+            results = {name: await factory() for name, factory in sections.items()}
         
-        return DashboardResponse(
-            kpis=kpis,
-            attention=attention_series,
-            attendance=attendance_series,
-            capacity=capacity_series,
-            leaderboard_students=student_leaderboard,
-            leaderboard_instructors=instructor_leaderboard
-        )
+        series = {
+            name: downsample_series(points, max_points)
+            for name, points in results.pop("series").items()
+        }
+        return DashboardResponse(**results, **series)
     
+    except asyncio.TimeoutError:
+        logger.error(f"Dashboard fan-out exceeded {settings.dashboard_timeout_seconds}s deadline")
+        raise HTTPException(status_code=504, detail="Dashboard data took too long to load")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch dashboard data: {str(e)}")
 
@@ -1024,111 +880,6 @@ async def _get_dashboard_kpis(
     return kpis
 
 
-async def _get_attention_series(
-    pool: asyncpg.Pool,
-    bootcamp_filter: List[int],
-    start_date: date,
-    end_date: date,
-    granularity: str
-) -> List[SeriesPoint]:
-    """Get attention time series data."""
-    
-    bucket = granularity_to_sql_bucket(granularity)
-    bootcamp_condition = ""
-    params = [start_date, end_date]
-    
-    if bootcamp_filter:
-        bootcamp_condition = f"AND bootcamp_id = ANY(${len(params) + 1})"
-        params.append(bootcamp_filter)
-    
-    query = f"""
-        SELECT 
-            DATE_TRUNC('{bucket}', bucket_at) as bucket,
-            AVG(avg_attention_rate) as avg_attention
-        FROM class_samples 
-        WHERE date BETWEEN $1 AND $2 {bootcamp_condition}
-        GROUP BY bucket
-        ORDER BY bucket
-    """
-    
-    rows = await pool.fetch(query, *params)
-    
-    return [
-        SeriesPoint(t=row['bucket'], v=round(float(row['avg_attention']), 2))
-        for row in rows
-    ]
-
-
-async def _get_attendance_series(
-    pool: asyncpg.Pool,
-    bootcamp_filter: List[int],
-    start_date: date,
-    end_date: date,
-    granularity: str
-) -> List[SeriesPoint]:
-    """Get attendance time series data."""
-    
-    bucket = granularity_to_sql_bucket(granularity)
-    bootcamp_condition = ""
-    params = [start_date, end_date]
-    
-    if bootcamp_filter:
-        bootcamp_condition = f"AND bootcamp_id = ANY(${len(params) + 1})"
-        params.append(bootcamp_filter)
-    
-    query = f"""
-        SELECT 
-            DATE_TRUNC('{bucket}', bucket_at) as bucket,
-            AVG(attendance_pct) as avg_attendance
-        FROM class_samples 
-        WHERE date BETWEEN $1 AND $2 {bootcamp_condition}
-        GROUP BY bucket
-        ORDER BY bucket
-    """
-    
-    rows = await pool.fetch(query, *params)
-    
-    return [
-        SeriesPoint(t=row['bucket'], v=round(float(row['avg_attendance']), 2))
-        for row in rows
-    ]
-
-
-async def _get_capacity_series(
-    pool: asyncpg.Pool,
-    bootcamp_filter: List[int],
-    start_date: date,
-    end_date: date,
-    granularity: str
-) -> List[SeriesPoint]:
-    """Get capacity utilization time series data."""
-    
-    bucket = granularity_to_sql_bucket(granularity)
-    bootcamp_condition = ""
-    params = [start_date, end_date]
-    
-    if bootcamp_filter:
-        bootcamp_condition = f"AND cs.bootcamp_id = ANY(${len(params) + 1})"
-        params.append(bootcamp_filter)
-    
-    query = f"""
-        SELECT 
-            DATE_TRUNC('{bucket}', cs.bucket_at) as bucket,
-            AVG(cs.attendance_pct) as capacity_utilized
-        FROM class_samples cs
-        WHERE cs.date BETWEEN $1 AND $2 {bootcamp_condition}
-        GROUP BY bucket
-        ORDER BY bucket
-    """
-    
-    rows = await pool.fetch(query, *params)
-    
-    return [
-        SeriesPoint(t=row['bucket'], v=round(float(row['capacity_utilized']), 2))
-        for row in rows
-    ]
-
-
 async def _get_student_leaderboard(
     pool: asyncpg.Pool,
     bootcamp_filter: List[int],
@@ -1222,6 +973,7 @@ def _empty_dashboard_response() -> DashboardResponse:
         attention=[],
         attendance=[],
         capacity=[],
+        distraction=[],
         leaderboard_students=[],
         leaderboard_instructors=[]
     )
@@ -1321,99 +1073,36 @@ async def get_instructor_performance(
                         "bootcamp_ids": [b["bootcamp_id"] for b in target_bootcamps]
                     }
             
-            performance_data = []
+            # All per-instructor aggregates in a fixed number of grouped queries
+            assignments = [
+                (instructor_id, bootcamp_id)
+                for instructor_id, instructor in instructors_data.items()
+                for bootcamp_id in instructor["bootcamp_ids"]
+            ]
+            metrics = await fetch_instructor_metrics(
+                conn, assignments, filters.date_start, filters.date_end
+            )
             
-            for instructor_id, instructor in instructors_data.items():
-                bootcamp_ids = instructor["bootcamp_ids"]
-                
-                # Get class_samples data for instructor's bootcamps
-                class_data_query = """
-                    SELECT 
-                        AVG(attendance_pct) as avg_attendance,
-                        AVG(avg_attention_rate) as avg_attention,
-                        AVG(avg_distraction_rate) as avg_distraction,
-                        COUNT(*) as total_sessions,
-                        COUNT(DISTINCT date) as unique_days
-                    FROM class_samples
-                    WHERE bootcamp_id = ANY($1)
-                """
-                class_params = [bootcamp_ids]
-                
-                # Add date filtering if specified
-                if filters.date_start:
-                    class_data_query += f" AND date >= ${len(class_params) + 1}"
-                    class_params.append(filters.date_start)
-                if filters.date_end:
-                    class_data_query += f" AND date <= ${len(class_params) + 1}"
-                    class_params.append(filters.date_end)
-                
-                class_row = await conn.fetchrow(class_data_query, *class_params)
-                
-                # Get student count for instructor's bootcamps
-                student_count_query = """
-                    SELECT COUNT(DISTINCT student_id) as total_students
-                    FROM students
-                    WHERE bootcamp_id = ANY($1)
-                """
-                student_row = await conn.fetchrow(student_count_query, bootcamp_ids)
-                
-                # Get grade data for instructor's students
-                grades_query = """
-                    SELECT 
-                        AVG(g.score) as avg_grades,
-                        COUNT(*) as total_grades,
-                        COUNT(DISTINCT g.student_id) as students_with_grades
-                    FROM grades g
-                    JOIN students s ON g.student_id = s.student_id
-                    WHERE s.bootcamp_id = ANY($1)
-                """
-                grades_row = await conn.fetchrow(grades_query, bootcamp_ids)
-                
-                # Calculate metrics with proper null handling
-                avg_attendance = float(class_row["avg_attendance"] or 0) if class_row else 0
-                avg_attention = float(class_row["avg_attention"] or 0) if class_row else 0
-                avg_distraction = float(class_row["avg_distraction"] or 0) if class_row else 0
-                total_students = student_row["total_students"] or 0
-                total_sessions = class_row["total_sessions"] or 0 if class_row else 0
-                avg_grades = float(grades_row["avg_grades"] or 0) if grades_row else 0
-                
-                # Calculate effectiveness score (weighted combination of metrics)
-                # Attendance: 30%, Attention: 40%, Grades: 30%
-                effectiveness_score = 0
-                if avg_attendance > 0 or avg_attention > 0 or avg_grades > 0:
-                    effectiveness_score = (
-                        (avg_attendance * 0.30) +
-                        (avg_attention * 0.40) +
-                        (avg_grades * 0.30)
-                    )
-                
-                # Calculate engagement score (attention vs distraction)
-                engagement_score = 0
-                if avg_attention > 0 and avg_distraction > 0:
-                    engagement_score = max(0, avg_attention - avg_distraction)
-                elif avg_attention > 0:
-                    engagement_score = avg_attention
-                
+            instructor_ids = list(instructors_data.keys())
+            scores = score_instructors(instructor_ids, metrics)
+            
+            performance_data = []
+            for i, instructor_id in enumerate(instructor_ids):
+                instructor = instructors_data[instructor_id]
                 performance_data.append({
                     "instructor_id": instructor_id,
                     "full_name": instructor["full_name"],
                     "email": instructor["email"],
                     "bootcamps": instructor["bootcamps"],
-                    "avg_attendance": round(avg_attendance, 1),
-                    "avg_attention": round(avg_attention, 1),
-                    "avg_distraction": round(avg_distraction, 1),
-                    "avg_student_grades": round(avg_grades, 1),
-                    "total_students": total_students,
-                    "total_sessions": total_sessions,
-                    "effectiveness_score": round(effectiveness_score, 1),
-                    "engagement_score": round(engagement_score, 1),
-                    "performance_tier": (
-                        "Excellent" if effectiveness_score >= 80 else
-                        "Good" if effectiveness_score >= 65 else
-                        "Average" if effectiveness_score >= 50 else
-                        "Needs Improvement" if effectiveness_score > 0 else
-                        "No Data"
-                    )
+                    "avg_attendance": round(float(scores["avg_attendance"][i]), 1),
+                    "avg_attention": round(float(scores["avg_attention"][i]), 1),
+                    "avg_distraction": round(float(scores["avg_distraction"][i]), 1),
+                    "avg_student_grades": round(float(scores["avg_student_grades"][i]), 1),
+                    "total_students": int(scores["total_students"][i]),
+                    "total_sessions": int(scores["total_sessions"][i]),
+                    "effectiveness_score": round(float(scores["effectiveness_score"][i]), 1),
+                    "engagement_score": round(float(scores["engagement_score"][i]), 1),
+                    "performance_tier": str(scores["performance_tier"][i])
                 })
             
             # Sort by effectiveness score descending
@@ -1426,9 +1115,11 @@ async def get_instructor_performance(
         raise HTTPException(status_code=500, detail=f"Failed to fetch instructor performance: {str(e)}")
 
 @router.post("/correlation-analysis")
+@cache_response("correlation-analysis")
 async def get_correlation_analysis(
     filters: DashboardFilters = Body(...),
-    user: Dict[str, Any] = Depends(get_current_user)
+    user: Dict[str, Any] = Depends(get_current_user),
+    scope: BootcampScope = Depends(get_bootcamp_scope)
 ):
     """Get correlation analysis between attendance, attention, and grades"""
     # Extract filter values
@@ -1440,113 +1131,32 @@ async def get_correlation_analysis(
     pool = get_pool()
     try:
         async with pool.acquire() as conn:
-            # Get allowed bootcamps
-            allowed_bootcamps = []
-            if bootcamp_ids:
-                if not is_admin(user):
-                    instructor_bootcamps = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                    instructor_bootcamp_ids = [row["bootcamp_id"] for row in instructor_bootcamps]
-                    allowed_bootcamps = [bid for bid in bootcamp_ids if bid in instructor_bootcamp_ids]
-                else:
-                    allowed_bootcamps = bootcamp_ids
-            else:
-                if is_admin(user):
-                    bootcamp_rows = await conn.fetch("SELECT bootcamp_id FROM bootcamps")
-                else:
-                    bootcamp_rows = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                allowed_bootcamps = [row["bootcamp_id"] for row in bootcamp_rows]
+            allowed_bootcamps = scope.restrict(bootcamp_ids)
 
             if not allowed_bootcamps:
                 return {"scatter_data": [], "correlations": {}}
 
-            # Build date filter
-            params = [allowed_bootcamps]
-            date_filter = ""
-            if date_start:
-                date_filter += " AND cs.date >= $2"
-                params.append(date_start)
-            if date_end:
-                date_filter += f" AND cs.date <= ${len(params) + 1}"
-                params.append(date_end)
-
-            # Get correlation data
-            query = f"""
-                SELECT 
-                    cs.attendance_pct,
-                    cs.avg_attention_rate,
-                    AVG(g.score) as avg_grade
-                FROM class_samples cs
-                LEFT JOIN students s ON cs.bootcamp_id = s.bootcamp_id
-                LEFT JOIN grades g ON s.student_id = g.student_id
-                WHERE cs.bootcamp_id = ANY($1) {date_filter}
-                AND cs.attendance_pct IS NOT NULL 
-                AND cs.avg_attention_rate IS NOT NULL
-                GROUP BY cs.id, cs.attendance_pct, cs.avg_attention_rate
-                ORDER BY cs.attendance_pct
-            """
-            
-            rows = await conn.fetch(query, *params)
-            
-            scatter_data = []
-            attendance_vals = []
-            attention_vals = []
-            grade_vals = []
-            
-            for row in rows:
-                if row["attendance_pct"] and row["avg_attention_rate"]:
-                    data_point = {
-                        "attendance": round(float(row["attendance_pct"]), 1),
-                        "attention": round(float(row["avg_attention_rate"]), 1),
-                        "grade": round(float(row["avg_grade"] or 0), 1)
-                    }
-                    scatter_data.append(data_point)
-                    
-                    attendance_vals.append(float(row["attendance_pct"]))
-                    attention_vals.append(float(row["avg_attention_rate"]))
-                    if row["avg_grade"]:
-                        grade_vals.append(float(row["avg_grade"]))
-
-            # Calculate simple correlation coefficients (Pearson's r approximation)
-            def correlation(x, y):
-                if len(x) < 2 or len(y) < 2:
-                    return 0
-                n = len(x)
-                sum_x = sum(x)
-                sum_y = sum(y)
-                sum_xy = sum(x[i] * y[i] for i in range(n))
-                sum_x2 = sum(x[i] ** 2 for i in range(n))
-                sum_y2 = sum(y[i] ** 2 for i in range(n))
-                
-                numerator = n * sum_xy - sum_x * sum_y
-                denominator = ((n * sum_x2 - sum_x ** 2) * (n * sum_y2 - sum_y ** 2)) ** 0.5
-                
-                return numerator / denominator if denominator != 0 else 0
-
-            correlations = {
-                "attendance_attention": round(correlation(attendance_vals, attention_vals), 3),
-                "attendance_grades": round(correlation(attendance_vals, grade_vals), 3) if grade_vals else 0,
-                "attention_grades": round(correlation(attention_vals, grade_vals), 3) if grade_vals else 0
-            }
+            # Columnar fetch; correlations computed with NumPy
+            columns = await fetch_correlation_columns(conn, allowed_bootcamps, date_start, date_end)
 
-            return {
-                "scatter_data": scatter_data,
-                "correlations": correlations
-            }
+        result = compute_correlations(columns)
+        max_points = filters.max_points or settings.correlation_max_points
+        return {
+            "scatter_data": downsample_scatter(columns, max_points),
+            "scatter_total": len(columns["attendance"]),
+            **result
+        }
             
     except Exception as e:
         logger.error(f"Failed to fetch correlation analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch correlation analysis: {str(e)}")
 
 @router.post("/heatmap-data")
+@cache_response("heatmap-data")
 async def get_heatmap_data(
     filters: DashboardFilters = Body(...),
-    user: Dict[str, Any] = Depends(get_current_user)
+    user: Dict[str, Any] = Depends(get_current_user),
+    scope: BootcampScope = Depends(get_bootcamp_scope)
 ):
     """Get heatmap data for time slot vs day of week performance analysis"""
     # Extract filter values
@@ -1559,27 +1169,7 @@ async def get_heatmap_data(
     pool = get_pool()
     try:
         async with pool.acquire() as conn:
-            # Get allowed bootcamps
-            allowed_bootcamps = []
-            if bootcamp_ids:
-                if not is_admin(user):
-                    instructor_bootcamps = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                    instructor_bootcamp_ids = [row["bootcamp_id"] for row in instructor_bootcamps]
-                    allowed_bootcamps = [bid for bid in bootcamp_ids if bid in instructor_bootcamp_ids]
-                else:
-                    allowed_bootcamps = bootcamp_ids
-            else:
-                if is_admin(user):
-                    bootcamp_rows = await conn.fetch("SELECT bootcamp_id FROM bootcamps")
-                else:
-                    bootcamp_rows = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                allowed_bootcamps = [row["bootcamp_id"] for row in bootcamp_rows]
+            allowed_bootcamps = scope.restrict(bootcamp_ids)
 
             if not allowed_bootcamps:
                 return []
@@ -1643,82 +1233,30 @@ async def get_heatmap_data(
         raise HTTPException(status_code=500, detail=f"Failed to fetch heatmap data: {str(e)}")
 
 @router.post("/bootcamp-comparison")
+@cache_response("bootcamp-comparison")
 async def get_bootcamp_comparison(
     filters: DashboardFilters = Body(...),
-    user: Dict[str, Any] = Depends(get_current_user)
+    user: Dict[str, Any] = Depends(get_current_user),
+    scope: BootcampScope = Depends(get_bootcamp_scope)
 ):
     """Get bootcamp comparison metrics"""
     pool = get_pool()
     try:
         async with pool.acquire() as conn:
             # Build bootcamp filter
-            bootcamp_filter = ""
-            params = []
-            
-            if filters.bootcamp_ids:
-                if not is_admin(user):
-                    # Verify instructor access
-                    instructor_bootcamps = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                        user["user_id"]
-                    )
-                    instructor_bootcamp_ids = [row["bootcamp_id"] for row in instructor_bootcamps]
-                    bootcamp_ids = [bid for bid in filters.bootcamp_ids if bid in instructor_bootcamp_ids]
-                else:
-                    bootcamp_ids = filters.bootcamp_ids
-                
-                if bootcamp_ids:
-                    bootcamp_filter = f"AND b.bootcamp_id = ANY($1::int[])"
-                    params.append(bootcamp_ids)
-            elif not is_admin(user):
-                instructor_bootcamps = await conn.fetch(
-                    "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $1",
-                    user["user_id"]
-                )
-                bootcamp_ids = [row["bootcamp_id"] for row in instructor_bootcamps]
-                if bootcamp_ids:
-                    bootcamp_filter = f"AND b.bootcamp_id = ANY($1::int[])"
-                    params.append(bootcamp_ids)
-
-            # Date filter using filters from DashboardFilters
-            date_filter = ""
-            if filters.start_date and filters.end_date:
-                date_filter = "AND b.start_date >= $2 AND b.end_date <= $3"
-                params.extend([filters.start_date, filters.end_date])
-
-            query = f"""
-                SELECT 
-                    b.bootcamp_id,
-                    b.bootcamp_name,
-                    b.start_date,
-                    b.end_date,
-                    CASE 
-                        WHEN b.end_date < CURRENT_DATE THEN 'completed'
-                        WHEN b.start_date > CURRENT_DATE THEN 'upcoming'
-                        ELSE 'active'
-                    END as status,
-                    COUNT(DISTINCT ib.instructor_id) as instructor_count,
-                    COUNT(DISTINCT s.student_id) as student_count,
-                    COUNT(DISTINCT cs.session_id) as total_sessions,
-                    COALESCE(AVG(cs.headcount::float / NULLIF(cs.total_expected, 0) * 100), 0) as avg_attendance_rate,
-                    COALESCE(AVG((cs.attention_count::float / NULLIF(cs.headcount, 0)) * 100), 0) as avg_attention_rate,
-                    COALESCE(AVG(g.grade), 0) as avg_grade,
-                    COALESCE(
-                        COUNT(DISTINCT CASE WHEN g.grade >= 70 THEN s.student_id END)::float / 
-                        NULLIF(COUNT(DISTINCT s.student_id), 0) * 100, 0
-                    ) as completion_rate,
-                    85.0 as satisfaction_score
-                FROM bootcamps b
-                LEFT JOIN instructor_bootcamps ib ON b.bootcamp_id = ib.bootcamp_id
-                LEFT JOIN students s ON b.bootcamp_id = s.bootcamp_id
-                LEFT JOIN class_samples cs ON s.student_id = cs.student_id
-                LEFT JOIN grades g ON s.student_id = g.student_id
-                WHERE 1=1 {bootcamp_filter} {date_filter}
-                GROUP BY b.bootcamp_id, b.bootcamp_name, b.start_date, b.end_date
-                ORDER BY b.bootcamp_name
-            """
+            bootcamp_ids = None
+            if filters.bootcamp_ids or not scope.is_admin:
+                bootcamp_ids = scope.restrict(filters.bootcamp_ids)
+                if not bootcamp_ids:
+                    return []
+
+            # Date filter on bootcamp start/end dates
+            date_start = date_end = None
+            if filters.date_start and filters.date_end:
+                date_start = date.fromisoformat(filters.date_start)
+                date_end = date.fromisoformat(filters.date_end)
 
-            rows = await conn.fetch(query, *params)
+            rows = await fetch_bootcamp_comparison(conn, bootcamp_ids, date_start, date_end)
             
             bootcamp_data = []
             for row in rows:
@@ -1748,7 +1286,9 @@ async def get_bootcamp_comparison(
 async def get_predictive_insights(
     bootcamp_ids: Optional[List[int]] = None,
     time_range: str = "7d",
-    user: Dict[str, Any] = Depends(get_current_user)
+    max_points: Optional[int] = None,
+    user: Dict[str, Any] = Depends(get_current_user),
+    scope: BootcampScope = Depends(get_bootcamp_scope)
 ):
     """Get predictive analytics data"""
     pool = get_pool()
@@ -1765,24 +1305,8 @@ async def get_predictive_insights(
             bootcamp_filter = ""
             params = [hours_back]
             
-            if bootcamp_ids:
-                if not is_admin(user):
-                    instructor_bootcamps = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $2",
-                        user["user_id"]
-                    )
-                    instructor_bootcamp_ids = [row["bootcamp_id"] for row in instructor_bootcamps]
-                    bootcamp_ids = [bid for bid in bootcamp_ids if bid in instructor_bootcamp_ids]
-                
-                if bootcamp_ids:
-                    bootcamp_filter = f"AND s.bootcamp_id = ANY($2::int[])"
-                    params.append(bootcamp_ids)
-            elif not is_admin(user):
-                instructor_bootcamps = await conn.fetch(
-                    "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $2",
-                    user["user_id"]
-                )
-                bootcamp_ids = [row["bootcamp_id"] for row in instructor_bootcamps]
+            if bootcamp_ids or not scope.is_admin:
+                bootcamp_ids = scope.restrict(bootcamp_ids)
                 if bootcamp_ids:
                     bootcamp_filter = f"AND s.bootcamp_id = ANY($2::int[])"
                     params.append(bootcamp_ids)
@@ -1870,7 +1394,7 @@ async def get_predictive_insights(
                     })
             
             return {
-                "data": prediction_data,
+                "data": downsample_rows(prediction_data, "actual_attention", max_points),
                 "alerts": alerts,
                 "accuracy": 0.82  # Model accuracy placeholder
             }
@@ -1883,7 +1407,9 @@ async def get_predictive_insights(
 async def get_engagement_metrics(
     bootcamp_ids: Optional[List[int]] = None,
     time_window: str = "1h",
-    user: Dict[str, Any] = Depends(get_current_user)
+    max_points: Optional[int] = None,
+    user: Dict[str, Any] = Depends(get_current_user),
+    scope: BootcampScope = Depends(get_bootcamp_scope)
 ):
     """Get real-time engagement metrics"""
     pool = get_pool()
@@ -1902,14 +1428,7 @@ async def get_engagement_metrics(
             params = [minutes_back]
             
             if bootcamp_ids:
-                if not is_admin(user):
-                    instructor_bootcamps = await conn.fetch(
-                        "SELECT bootcamp_id FROM instructor_bootcamps WHERE instructor_id = $2",
-                        user["user_id"]
-                    )
-                    instructor_bootcamp_ids = [row["bootcamp_id"] for row in instructor_bootcamps]
-                    bootcamp_ids = [bid for bid in bootcamp_ids if bid in instructor_bootcamp_ids]
-                
+                bootcamp_ids = scope.restrict(bootcamp_ids)
                 if bootcamp_ids:
                     bootcamp_filter = f"AND s.bootcamp_id = ANY($2::int[])"
                     params.append(bootcamp_ids)
@@ -2008,10 +1527,105 @@ async def get_engagement_metrics(
             }
             
             return {
-                "data": engagement_data,
+                "data": downsample_rows(engagement_data, "attention_score", max_points),
                 "real_time_metrics": real_time_metrics
             }
             
     except Exception as e:
         logger.error(f"Failed to fetch engagement metrics: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch engagement metrics: {str(e)}")
+
+
+# Batch endpoint: every widget for one page in a single request
+
+# widget name -> handler(filters, user, scope)
+DASHBOARD_WIDGETS = {
+    "kpis": lambda f, u, s: get_kpis(filters=f, user=u, scope=s),
+    "grade-distribution": lambda f, u, s: get_grade_distribution(filters=f, user=u, scope=s),
+    "grade-performance": lambda f, u, s: get_grade_performance(filters=f, user=u, scope=s),
+    "leaderboard": lambda f, u, s: get_leaderboard(filters=f, user=u, scope=s),
+    "attendance-heatmap": lambda f, u, s: get_attendance_heatmap(filters=f, user=u, scope=s),
+    "correlation-analysis": lambda f, u, s: get_correlation_analysis(filters=f, user=u, scope=s),
+    "heatmap-data": lambda f, u, s: get_heatmap_data(filters=f, user=u, scope=s),
+    "bootcamp-comparison": lambda f, u, s: get_bootcamp_comparison(filters=f, user=u, scope=s),
+    "instructor-performance": lambda f, u, s: get_instructor_performance(filters=f, user=u),
+}
+
+# Chart widgets share one bucket scan; widget name -> formatter
+CHART_WIDGETS = {
+    "attendance-chart": _format_attendance_chart,
+    "attention-chart": _format_attention_chart,
+    "student-metrics": _format_student_metrics,
+}
+
+
+@router.post("/batch")
+async def get_dashboard_batch(
+    request: DashboardBatchRequest = Body(...),
+    user: Dict[str, Any] = Depends(get_current_user),
+    scope: BootcampScope = Depends(get_bootcamp_scope)
+):
+    """
+    Evaluate several dashboard widgets in one request.
+    
+    Scope is resolved once for all widgets, and the chart widgets share a
+    single class_samples/rollup scan. A failing widget is reported under
+    "errors" without affecting the others.
+    """
+    filters = request.filters
+    widgets = list(dict.fromkeys(request.widgets))
+    
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    
+    async def _chart_buckets():
+        allowed_bootcamps = scope.restrict(filters.bootcamp_ids)
+        if not allowed_bootcamps:
+            return []
+        async with get_pool().acquire() as conn:
+            return await _fetch_chart_buckets(
+                conn, allowed_bootcamps, filters.granularity, filters.date_start, filters.date_end
+            )
+    
+    tasks = {}
+    chart_widgets = [w for w in widgets if w in CHART_WIDGETS]
+    if chart_widgets:
+        tasks["__charts__"] = _chart_buckets
+    for widget in widgets:
+        if widget in DASHBOARD_WIDGETS:
+            tasks[widget] = (lambda w: lambda: DASHBOARD_WIDGETS[w](filters, user, scope))(widget)
+        elif widget not in CHART_WIDGETS:
+            errors[widget] = "Unknown widget"
+    
+    settled = await gather_settled(
+        tasks,
+        limit=settings.dashboard_max_concurrency,
+        timeout=settings.dashboard_timeout_seconds
+    )
+    
+    def _describe(error: Exception) -> str:
+        if isinstance(error, HTTPException):
+            return str(error.detail)
+        if isinstance(error, asyncio.TimeoutError):
+            return "Timed out"
+        return str(error)
+    
+    if chart_widgets:
+        ok, value = settled.pop("__charts__")
+        for widget in chart_widgets:
+            if ok:
+                results[widget] = CHART_WIDGETS[widget](value, filters.max_points)
+            else:
+                errors[widget] = _describe(value)
+    
+    for widget, (ok, value) in settled.items():
+        if ok:
+            results[widget] = value
+        else:
+            logger.error(f"Dashboard batch widget {widget} failed: {value}")
+            errors[widget] = _describe(value)
+    
+    return {
+        "widgets": {w: results[w] for w in widgets if w in results},
+        "errors": errors
+    }
@@ -8,6 +8,7 @@ from core.rbac import is_admin, is_instructor
 from db.pool import get_pool
 from utils.pagination import parse_pagination_params
 from models.schemas import GradesList, GradeRow, GradePatch
+from utils.response_cache import bump_data_version
 
 router = APIRouter()
 
@@ -233,6 +234,7 @@ async def update_grade(
         """
         
         result = await pool.fetchrow(update_query, grade_data.score, grade_id)
+        await bump_data_version([grade_info['bootcamp_id']])
         
         return {
             "grade_id": grade_id,
@@ -0,0 +1,127 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from utils.ann_index import ANNIndex, refresh_ann_index
+from utils.embedding_cache import FakeEmbedder
+
+
+class FakeChunkTable:
+    """The three queries refresh_ann_index issues, over {id: (embedding, bootcamp_id)}."""
+
+    def __init__(self):
+        self.rows = {}
+        self.next_id = 1
+
+    def insert(self, embedding, bootcamp_id=-1):
+        self.rows[self.next_id] = (embedding, bootcamp_id)
+        self.next_id += 1
+        return self.next_id - 1
+
+    async def fetchrow(self, query, watermark):
+        assert "COUNT(*)" in query
+        return {"indexed": sum(i <= watermark for i in self.rows), "max_id": max(self.rows, default=0)}
+
+    async def fetch(self, query, *args):
+        if "unnest" in query:
+            return [{"id": i} for i in args[0] if i not in self.rows]
+        watermark, limit = args
+        ids = sorted(i for i in self.rows if i > watermark)[:limit]
+        return [{"id": i, "embedding": self.rows[i][0], "bootcamp_id": self.rows[i][1]} for i in ids]
+
+
+def embed(texts):
+    vectors = np.array(asyncio.run(FakeEmbedder(dim=32).embed(texts)), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def table():
+    return FakeChunkTable()
+
+
+def refresh(index, table, **kwargs):
+    return asyncio.run(refresh_ann_index(index, table, "rag_chunks", **kwargs))
+
+
+def test_changed_chunk_does_not_leave_its_old_vector_in_the_index(tmp_path, table):
+    texts = [
+        "Salma Hasan: average grade 71% in Python Programming.",
+        "Omar Ali: average grade 80% in Python Programming.",
+        "Lina Saad: average grade 65% in Data Analysis.",
+        "Bootcamp Data Science runs from March to June.",
+    ]
+    for vector in embed(texts):
+        table.insert(vector.tolist())
+    index = ANNIndex(str(tmp_path))
+    assert refresh(index, table) == 4
+
+    # The ingestor re-renders Salma's chunk: delete id 1, insert the new text
+    changed = "Salma Hasan: average grade 74% in Python Programming."
+    del table.rows[1]
+    new_id = table.insert(embed([changed])[0].tolist())
+    assert refresh(index, table, max_dead_fraction=0.5) == 1
+
+    assert index.size == 5 and index.live_size == 4
+    ids, _ = index.search(embed([changed])[0], k=4)
+    assert ids[0] == new_id
+    assert sorted(ids.tolist()) == [2, 3, 4, new_id]
+
+
+def test_tombstones_apply_to_partition_and_ivf_searches(tmp_path, table):
+    vectors = embed([f"chunk {i}" for i in range(40)])
+    for i, vector in enumerate(vectors):
+        table.insert(vector.tolist(), bootcamp_id=i % 2)
+    index = ANNIndex(str(tmp_path), nlist=4, nprobe=4)
+    refresh(index, table)
+
+    del table.rows[3]
+    refresh(index, table)
+
+    ids, _ = index.search(vectors[2], k=20, partitions=[0, 1])
+    assert 3 not in ids.tolist() and len(ids) == 20
+    ids, _ = index.search(vectors[2], k=39)
+    assert 3 not in ids.tolist() and len(ids) == 39
+
+
+def test_tombstones_survive_a_reload(tmp_path, table):
+    for vector in embed(["a", "b", "c"]):
+        table.insert(vector.tolist())
+    index = ANNIndex(str(tmp_path))
+    refresh(index, table)
+    del table.rows[2]
+    refresh(index, table, max_dead_fraction=0.5)
+
+    reopened = ANNIndex(str(tmp_path))
+    assert reopened.load()
+    assert reopened.size == 3
+    assert reopened.live_ids().tolist() == [1, 3]
+
+
+def test_index_is_rebuilt_once_mostly_tombstones(tmp_path, table):
+    for vector in embed([f"chunk {i}" for i in range(10)]):
+        table.insert(vector.tolist())
+    index = ANNIndex(str(tmp_path))
+    refresh(index, table)
+
+    for i in range(1, 5):
+        del table.rows[i]
+    refresh(index, table, max_dead_fraction=0.2)
+
+    assert index.size == index.live_size == 6
+    assert index.ids.tolist() == list(range(5, 11))
+
+
+def test_rows_appearing_below_the_watermark_force_a_rebuild(tmp_path, table):
+    table.next_id = 10
+    for vector in embed(["a", "b"]):
+        table.insert(vector.tolist())
+    index = ANNIndex(str(tmp_path))
+    refresh(index, table)
+
+    # A chunk whose transaction committed after a higher id was indexed
+    table.rows[5] = (embed(["late"])[0].tolist(), -1)
+    refresh(index, table)
+
+    assert index.ids.tolist() == [5, 10, 11]
@@ -0,0 +1,60 @@
+import asyncio
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from core.deps import BootcampScope
+from models.schemas import AssistantQuery
+from routers import assistant
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    """Per-session (summary, turns), and a fake embedding so no API is called."""
+    contexts = {}
+
+    async def context(session_id):
+        return contexts.get(session_id, ("", []))
+
+    async def embed(text):
+        return np.ones(4, dtype=np.float32) / 2
+
+    async def versions(bootcamp_ids):
+        return (0,)
+
+    monkeypatch.setattr(assistant, "VECTOR_RAG_AVAILABLE", True)
+    monkeypatch.setattr(assistant.conversation_memory, "context", context)
+    monkeypatch.setattr(assistant.embedding_cache, "get", embed)
+    monkeypatch.setattr(assistant, "current_versions", versions)
+    return contexts
+
+
+def lookup(query, session_id):
+    scope = BootcampScope({"user_id": "7", "role": "instructor"}, [1, 2])
+    return asyncio.run(assistant._lookup_cached_answer(query, scope, session_id))
+
+
+def test_first_turn_is_cacheable(memory):
+    cached, key = lookup(AssistantQuery(query="How is Salma doing?", bootcamp_id=1), uuid4())
+    assert cached is None
+    assert key is not None
+    assert key[0][2] == (1,)
+
+
+def test_follow_ups_bypass_the_shared_cache(memory):
+    first, follow_up = uuid4(), uuid4()
+    memory[follow_up] = ("", [("How is Salma doing?", "Salma averages 71%.")])
+    query = AssistantQuery(query="and what about her attendance?", bootcamp_id=1)
+
+    # An answer stored from a fresh session...
+    _, key = lookup(query, first)
+    assistant.answer_cache.store(*key, {"answer": "from another session", "sources": []})
+    try:
+        # ...is not served to a session whose question depends on its history
+        assert lookup(query, follow_up) == (None, None)
+
+        memory[follow_up] = ("Talked about Salma Hasan.", [])
+        assert lookup(query, follow_up) == (None, None)
+    finally:
+        assistant.answer_cache.clear()
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from core.deps import (
+    BootcampScope,
+    _get_all_bootcamp_ids,
+    get_instructor_bootcamp_ids,
+    invalidate_bootcamp_scope
+)
+
+
+class FakePool:
+    """Answers the two scope queries: all bootcamps, or one instructor's assignments."""
+
+    def __init__(self, all_ids, assignments):
+        self.all_ids = all_ids
+        self.assignments = assignments
+        self.queries = 0
+
+    async def fetch(self, query, *args):
+        self.queries += 1
+        if "instructor_bootcamps" in query:
+            return [{"bootcamp_id": bid} for bid in self.assignments.get(args[0], [])]
+        return [{"bootcamp_id": bid} for bid in self.all_ids]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    invalidate_bootcamp_scope()
+    yield
+    invalidate_bootcamp_scope()
+
+
+def test_admin_and_instructor_entries_for_one_id_do_not_mix():
+    pool = FakePool(all_ids=[1, 2, 3], assignments={"7": [2]})
+
+    assert asyncio.run(_get_all_bootcamp_ids("7", pool)) == [1, 2, 3]
+    assert asyncio.run(get_instructor_bootcamp_ids("7", pool)) == [2]
+    # And the other way round, now both are cached
+    assert asyncio.run(_get_all_bootcamp_ids("7", pool)) == [1, 2, 3]
+    assert pool.queries == 2
+
+
+def test_invalidate_drops_both_roles_for_a_user():
+    pool = FakePool(all_ids=[1, 2], assignments={"7": [1]})
+    asyncio.run(_get_all_bootcamp_ids("7", pool))
+    asyncio.run(get_instructor_bootcamp_ids("7", pool))
+
+    pool.assignments["7"] = [1, 2]
+    pool.all_ids = [1, 2, 3]
+    invalidate_bootcamp_scope("7")
+
+    assert asyncio.run(get_instructor_bootcamp_ids("7", pool)) == [1, 2]
+    assert asyncio.run(_get_all_bootcamp_ids("7", pool)) == [1, 2, 3]
+
+
+def test_cached_lists_are_copies():
+    pool = FakePool(all_ids=[], assignments={"7": [1]})
+    asyncio.run(get_instructor_bootcamp_ids("7", pool)).append(99)
+
+    assert asyncio.run(get_instructor_bootcamp_ids("7", pool)) == [1]
+
+
+def scope(role, bootcamp_ids):
+    return BootcampScope({"user_id": "7", "role": role}, bootcamp_ids)
+
+
+def test_restrict_without_request_returns_whole_scope():
+    assert scope("instructor", [1, 2]).restrict() == [1, 2]
+    assert scope("instructor", [1, 2]).restrict([]) == [1, 2]
+    assert scope("admin", [1, 2, 3]).restrict(None) == [1, 2, 3]
+
+
+def test_restrict_intersects_instructor_requests():
+    assert scope("instructor", [1, 2]).restrict([2, 3, 1]) == [2, 1]
+    assert scope("instructor", [1, 2]).restrict([3]) == []
+
+
+def test_restrict_passes_admin_requests_through():
+    assert scope("admin", [1, 2]).restrict([5]) == [5]
+    assert scope("admin", [1, 2]).is_admin
+    assert not scope("instructor", [1, 2]).is_admin
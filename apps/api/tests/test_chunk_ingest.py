@@ -0,0 +1,54 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from utils.chunk_ingest import (
+    JOBS_TABLE,
+    STATE_TABLE,
+    chunk_ingest_tables_exist,
+    ensure_chunk_ingest_tables
+)
+
+
+class FakeCatalog:
+    """Pool over a set of existing table names that records every statement."""
+
+    def __init__(self, tables=()):
+        self.tables = set(tables)
+        self.statements = []
+
+    async def fetchval(self, query, names):
+        self.statements.append(query)
+        missing = [name for name in names if name not in self.tables]
+        return missing or None
+
+    async def execute(self, query, *args):
+        self.statements.append(" ".join(query.split()))
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+
+def test_existing_tables_are_only_checked():
+    catalog = FakeCatalog({"rag_chunks", STATE_TABLE, JOBS_TABLE})
+    assert asyncio.run(chunk_ingest_tables_exist(catalog, "rag_chunks"))
+    assert not any("CREATE" in s for s in catalog.statements)
+
+
+def test_missing_tables_disable_ingestion_without_ddl(caplog):
+    catalog = FakeCatalog({"rag_chunks"})
+    assert not asyncio.run(chunk_ingest_tables_exist(catalog, "rag_chunks"))
+    assert not any("CREATE" in s for s in catalog.statements)
+    assert STATE_TABLE in caplog.text and "db.rag_schema" in caplog.text
+
+
+def test_table_creation_is_serialized_across_workers():
+    catalog = FakeCatalog()
+    assert asyncio.run(ensure_chunk_ingest_tables(catalog, "rag_chunks"))
+    assert catalog.statements[0].startswith("SELECT pg_advisory_xact_lock")
+    assert catalog.statements[1] == "CREATE EXTENSION IF NOT EXISTS vector"
+    assert any(s.startswith("CREATE TABLE IF NOT EXISTS rag_chunks (") for s in catalog.statements)
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from utils.concurrency import gather_limited, gather_settled
+
+
+class FakeConnections:
+    """Counts checked-out connections; a section holds one until it finishes or is cancelled."""
+
+    def __init__(self):
+        self.in_use = 0
+        self.cancelled = []
+
+    def section(self, name, seconds, error=None):
+        async def run():
+            self.in_use += 1
+            try:
+                await asyncio.sleep(seconds)
+                if error:
+                    raise error
+                return name
+            except asyncio.CancelledError:
+                self.cancelled.append(name)
+                raise
+            finally:
+                self.in_use -= 1
+        return run
+
+
+def test_gather_limited_returns_results_in_task_order():
+    connections = FakeConnections()
+    tasks = {name: connections.section(name, delay) for name, delay in [("a", 0.02), ("b", 0.0), ("c", 0.01)]}
+    assert asyncio.run(gather_limited(tasks, limit=2)) == {"a": "a", "b": "b", "c": "c"}
+
+
+def test_gather_limited_cancels_siblings_when_one_section_fails():
+    connections = FakeConnections()
+    tasks = {
+        "kpis": connections.section("kpis", 0.0, error=ValueError("bad section")),
+        "trend": connections.section("trend", 10),
+        "heatmap": connections.section("heatmap", 10),
+    }
+
+    async def run():
+        with pytest.raises(ValueError):
+            await gather_limited(tasks, limit=4)
+        # Nothing is still running once the error reaches the caller
+        return connections.in_use
+
+    assert asyncio.run(run()) == 0
+    assert sorted(connections.cancelled) == ["heatmap", "trend"]
+
+
+def test_gather_limited_cancels_everything_at_the_deadline():
+    connections = FakeConnections()
+    tasks = {"fast": connections.section("fast", 0.0), "slow": connections.section("slow", 10)}
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await gather_limited(tasks, timeout=0.05)
+        return connections.in_use
+
+    assert asyncio.run(run()) == 0
+    assert connections.cancelled == ["slow"]
+
+
+def test_gather_settled_reports_failures_per_task():
+    connections = FakeConnections()
+    tasks = {
+        "ok": connections.section("ok", 0.0),
+        "bad": connections.section("bad", 0.0, error=ValueError("bad section")),
+        "slow": connections.section("slow", 10),
+    }
+    results = asyncio.run(gather_settled(tasks, timeout=0.05))
+
+    assert results["ok"] == (True, "ok")
+    assert results["bad"][0] is False and isinstance(results["bad"][1], ValueError)
+    assert results["slow"][0] is False and isinstance(results["slow"][1], asyncio.TimeoutError)
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from utils.correlation import (
+    _fisher_interval,
+    _pearson,
+    _rank,
+    compute_correlations,
+    downsample_scatter
+)
+
+
+def columns(attendance, attention, grade):
+    return {
+        "attendance": np.array(attendance, dtype=np.float64),
+        "attention": np.array(attention, dtype=np.float64),
+        "grade": np.array(grade, dtype=np.float64),
+    }
+
+
+def test_rank_averages_ties():
+    assert _rank(np.array([10.0, 20.0, 20.0, 5.0])).tolist() == [2.0, 3.5, 3.5, 1.0]
+
+
+def test_pearson_matches_numpy_and_handles_degenerate_input():
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=200)
+    y = 0.5 * x + rng.normal(size=200)
+
+    assert _pearson(x, y) == pytest.approx(np.corrcoef(x, y)[0, 1])
+    assert _pearson(np.array([1.0]), np.array([2.0])) == 0.0
+    assert _pearson(np.ones(5), np.arange(5.0)) == 0.0
+
+
+def test_fisher_interval_brackets_r():
+    low, high = _fisher_interval(0.5, 100)
+    assert low < 0.5 < high
+    assert _fisher_interval(0.5, 3) == (0.5, 0.5)
+    assert _fisher_interval(1.0, 100) == (1.0, 1.0)
+
+
+def test_compute_correlations_uses_complete_cases_per_pair():
+    data = columns(
+        attendance=[1, 2, 3, 4, 5],
+        attention=[2, 4, 6, 8, 10],
+        grade=[5, np.nan, 3, 2, 1],
+    )
+    result = compute_correlations(data)
+
+    assert result["correlations"]["attendance_attention"] == 1.0
+    assert result["spearman"]["attendance_grades"] == -1.0
+    assert result["sample_sizes"] == {
+        "attendance_attention": 5,
+        "attendance_grades": 4,
+        "attention_grades": 4,
+    }
+    low, high = result["confidence_intervals"]["attendance_attention"]["pearson"]
+    assert low <= 1.0 <= high
+
+
+def test_spearman_is_rank_based():
+    # Monotonic but not linear: Spearman is exactly 1, Pearson is not
+    x = np.arange(1.0, 11.0)
+    result = compute_correlations(columns(x, x ** 3, x))
+
+    assert result["spearman"]["attendance_attention"] == 1.0
+    assert result["correlations"]["attendance_attention"] < 1.0
+
+
+def test_downsample_scatter_caps_points_and_keeps_the_range():
+    n = 1000
+    data = columns(np.arange(n) / 10, np.arange(n) / 20, [np.nan] * n)
+    points = downsample_scatter(data, 50)
+
+    assert len(points) == 50
+    assert points[0]["attendance"] == 0.0
+    assert points[-1]["attendance"] == 99.9
+    assert all(p["grade"] == 0.0 for p in points)
+
+
+def test_downsample_scatter_edge_cases():
+    assert downsample_scatter(columns([], [], []), 10) == []
+    assert downsample_scatter(columns([1], [2], [3]), 0) == []
+    assert downsample_scatter(columns([1.04], [2.06], [3]), 10) == [
+        {"attendance": 1.0, "attention": 2.1, "grade": 3.0}
+    ]
@@ -0,0 +1,57 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from models.schemas import SeriesPoint
+from utils.downsample import downsample_rows, downsample_series, lttb_indices
+
+
+def test_short_series_are_kept_whole():
+    assert lttb_indices([0, 1, 2], [5, 6, 7], 10) == [0, 1, 2]
+    assert lttb_indices([0, 1], [5, 6], 1) == [0, 1]
+
+
+def test_tiny_budgets_keep_the_endpoints():
+    assert lttb_indices(range(10), range(10), 2) == [0, 9]
+    assert lttb_indices(range(10), range(10), 1) == [0]
+
+
+def test_indices_are_sorted_unique_and_within_budget():
+    rng = np.random.default_rng(0)
+    y = rng.normal(size=1000).cumsum()
+    keep = lttb_indices(range(1000), y, 50)
+
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert keep == sorted(set(keep))
+
+
+def test_spikes_survive_downsampling():
+    y = np.zeros(1000)
+    y[137] = 50.0
+    y[612] = -40.0
+    keep = lttb_indices(range(1000), y, 20)
+
+    assert 137 in keep
+    assert 612 in keep
+
+
+def test_downsample_rows_uses_value_key_and_leaves_small_inputs_alone():
+    rows = [{"time_period": i, "avg_attendance": 100.0 if i == 40 else 1.0} for i in range(100)]
+
+    assert downsample_rows(rows, "avg_attendance", None) is rows
+    assert downsample_rows(rows, "avg_attendance", 200) is rows
+
+    kept = downsample_rows(rows, "avg_attendance", 10)
+    assert len(kept) == 10
+    assert {"time_period": 40, "avg_attendance": 100.0} in kept
+
+
+def test_downsample_series_uses_point_times():
+    start = date(2024, 1, 1)
+    points = [SeriesPoint(t=start + timedelta(days=i), v=float(i % 7)) for i in range(60)]
+
+    kept = downsample_series(points, 12)
+    assert len(kept) == 12
+    assert kept[0] == points[0] and kept[-1] == points[-1]
+    assert [p.t for p in kept] == sorted(p.t for p in kept)
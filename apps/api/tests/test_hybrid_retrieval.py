@@ -0,0 +1,140 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from utils.hybrid_retrieval import (
+    LexicalReranker,
+    build_reranker,
+    ensure_rag_search_indexes,
+    lexical_tsquery,
+    metadata_filter_sql,
+    query_terms,
+    rag_search_index_definitions,
+    reciprocal_rank_fusion
+)
+
+
+class FakeIndexCatalog:
+    """Pool over {index name: indisvalid} that records DDL and the advisory lock."""
+
+    def __init__(self, indexes=None, locked=False):
+        self.indexes = dict(indexes or {})
+        self.locked = locked
+        self.ddl = []
+
+    async def fetchval(self, query, arg):
+        if "pg_try_advisory_lock" in query:
+            if self.locked:
+                return False
+            self.locked = True
+            return True
+        return self.indexes.get(arg)
+
+    async def execute(self, query, *args):
+        if "pg_advisory_unlock" in query:
+            self.locked = False
+            return
+        self.ddl.append(query)
+        name = query.split()[-1] if query.startswith("DROP") else query.split()[6]
+        if query.startswith("DROP"):
+            del self.indexes[name]
+        else:
+            self.indexes.setdefault(name, True)
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+
+def test_rrf_sums_reciprocal_ranks_across_lists():
+    scores = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=60)
+
+    assert scores["a"] == pytest.approx(1 / 61 + 1 / 62)
+    assert scores["b"] == pytest.approx(1 / 62)
+    assert scores["c"] == pytest.approx(1 / 63 + 1 / 61)
+    assert sorted(scores, key=scores.get, reverse=True) == ["a", "c", "b"]
+
+
+def test_rrf_rewards_agreement_over_a_single_top_rank():
+    scores = reciprocal_rank_fusion([["x", "both"], ["y", "both"]], k=60)
+    assert scores["both"] > scores["x"] == scores["y"]
+
+
+def test_rrf_of_nothing_is_empty():
+    assert reciprocal_rank_fusion([]) == {}
+    assert reciprocal_rank_fusion([[], []]) == {}
+
+
+def test_query_terms_drop_stopwords_and_punctuation():
+    assert query_terms("How is Salma Hasan doing in Python?") == ["salma", "hasan", "doing", "python"]
+
+
+def test_lexical_tsquery_ors_unique_terms():
+    assert lexical_tsquery("grades grades for Python") == "grades | python"
+    assert lexical_tsquery("what is it?") is None
+
+
+def test_metadata_filter_sql_binds_values_as_text_arrays():
+    sql, params = metadata_filter_sql({"bootcamp_id": [1, 2], "student_id": 7}, first_param=3)
+
+    assert sql == (
+        " AND (metadata::jsonb ->> 'bootcamp_id') = ANY($3::text[])"
+        " AND (metadata::jsonb ->> 'student_id') = ANY($4::text[])"
+    )
+    assert params == [["1", "2"], ["7"]]
+    assert metadata_filter_sql(None, 1) == ("", [])
+
+
+def test_metadata_filter_sql_rejects_unsafe_keys():
+    with pytest.raises(ValueError):
+        metadata_filter_sql({"bootcamp_id') OR true --": [1]}, 1)
+
+
+def test_lexical_reranker_prefers_the_full_name():
+    texts = [
+        "Student Salma Ali has an average grade of 71.",
+        "Student Salma Hasan has an average grade of 88.",
+        "Unit Python Programming has 40 students.",
+    ]
+    scores = LexicalReranker().score("How is Salma Hasan doing?", texts)
+
+    assert max(range(3), key=scores.__getitem__) == 1
+    assert all(0.0 <= s <= 1.0 for s in scores)
+    assert LexicalReranker().score("the", texts) == [0.0, 0.0, 0.0]
+
+
+def test_build_reranker_by_name():
+    assert build_reranker("none") is None
+    assert isinstance(build_reranker("lexical"), LexicalReranker)
+
+
+def test_search_indexes_are_created_then_left_alone():
+    catalog = FakeIndexCatalog()
+    assert asyncio.run(ensure_rag_search_indexes(catalog, "rag_chunks"))
+    assert len(catalog.ddl) == len(rag_search_index_definitions("rag_chunks"))
+    assert all(s.startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS") for s in catalog.ddl)
+    assert not catalog.locked
+
+    catalog.ddl.clear()
+    assert asyncio.run(ensure_rag_search_indexes(catalog, "rag_chunks"))
+    assert catalog.ddl == []
+
+
+def test_invalid_search_index_is_dropped_and_rebuilt():
+    names = list(rag_search_index_definitions("rag_chunks"))
+    catalog = FakeIndexCatalog({name: True for name in names})
+    # Left behind by a CREATE INDEX CONCURRENTLY that failed or was cancelled
+    catalog.indexes["rag_chunks_chunk_text_fts_idx"] = False
+
+    assert asyncio.run(ensure_rag_search_indexes(catalog, "rag_chunks"))
+    assert catalog.ddl[0] == "DROP INDEX CONCURRENTLY IF EXISTS rag_chunks_chunk_text_fts_idx"
+    assert catalog.ddl[1].startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS rag_chunks_chunk_text_fts_idx ON")
+    assert len(catalog.ddl) == 2
+    assert catalog.indexes["rag_chunks_chunk_text_fts_idx"] is True
+
+
+def test_only_one_worker_builds_search_indexes():
+    catalog = FakeIndexCatalog(locked=True)
+    assert not asyncio.run(ensure_rag_search_indexes(catalog, "rag_chunks"))
+    assert catalog.ddl == []
@@ -0,0 +1,54 @@
+import asyncio
+import json
+from datetime import date
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from utils.response_cache import RedisCacheBackend
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+
+class Widget(BaseModel):
+    avg_score: float
+    label: str
+
+
+def redis_backend():
+    backend = RedisCacheBackend.__new__(RedisCacheBackend)
+    backend._client = FakeRedis()
+    backend._ttl = 60
+    return backend
+
+
+def test_redis_round_trip_matches_the_uncached_response():
+    response = {
+        "avg_score": Decimal("71.5"),
+        "session_count": Decimal("12"),
+        "series": [{"t": date(2024, 3, 4), "v": Decimal("0.25")}],
+        "widget": Widget(avg_score=3.5, label="x"),
+    }
+    backend = redis_backend()
+    asyncio.run(backend.set("k", response))
+    cached = asyncio.run(backend.get("k"))
+
+    # What FastAPI would have sent on a cache miss
+    assert cached == json.loads(json.dumps(jsonable_encoder(response)))
+    assert cached["avg_score"] == 71.5
+    assert isinstance(cached["series"][0]["v"], float)
+    assert cached["widget"] == {"avg_score": 3.5, "label": "x"}
+
+
+def test_redis_miss_returns_none():
+    assert asyncio.run(redis_backend().get("missing")) is None
@@ -0,0 +1,115 @@
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
+
+import pytest
+
+from db import rollups
+from db.rollups import FOLDED_TABLE, ROLLUP_TIERS, refresh_rollups
+
+
+class FakeDatabase:
+    """
+    The handful of statements refresh_rollups issues, over in-memory state.
+
+    `visible` holds the class_samples rows committed so far (id -> bootcamp);
+    a test commits rows out of id order by adding them late.
+    """
+
+    def __init__(self):
+        self.visible = {}
+        self.state = {"last_sample_id": 0, "scanned_id": 0, "last_batch": 0}
+        self.folded = {}
+        self.tier_ids = {tier: Counter() for tier in ROLLUP_TIERS}
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def fetchrow(self, query, *args):
+        assert "FOR UPDATE" in query
+        return dict(self.state)
+
+    async def fetch(self, query, low, high, batch):
+        assert f"INSERT INTO {FOLDED_TABLE}" in query
+        ids = sorted(i for i in self.visible if low < i <= high and i not in self.folded)
+        for i in ids:
+            self.folded[i] = (self.visible[i], batch)
+        return [{"id": i} for i in ids]
+
+    async def fetchval(self, query, high):
+        assert "MIN(id) FROM class_samples" in query
+        return min((i for i in self.visible if i > high), default=None)
+
+    async def execute(self, query, *args):
+        if query.startswith(f"DELETE FROM {FOLDED_TABLE}"):
+            self.folded = {i: v for i, v in self.folded.items() if i > args[0]}
+        elif "UPDATE class_samples_rollup_state" in query:
+            self.state.update(last_sample_id=args[0], scanned_id=args[1], last_batch=args[2])
+        else:
+            tier = next(t for t, (table, _) in ROLLUP_TIERS.items() if f"INSERT INTO {table} " in query)
+            self.tier_ids[tier].update(args[0])
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(rollups, "_rollups_ready", True)
+    return FakeDatabase()
+
+
+def refresh(db, batch_size=10, recheck_ids=100):
+    return asyncio.run(refresh_rollups(db, batch_size, recheck_ids))
+
+
+def assert_each_folded_once(db, ids):
+    for counts in db.tier_ids.values():
+        assert counts == Counter(ids)
+
+
+def test_rows_committing_out_of_id_order_are_folded_once(db):
+    # id 3 is still in flight while 4 and 5 commit
+    db.visible.update({1: 10, 2: 10, 4: 11, 5: 11})
+    assert refresh(db) == 4
+    assert db.state["scanned_id"] == 5
+
+    db.visible.update({3: 12, 6: 10})
+    assert refresh(db) == 2
+    assert_each_folded_once(db, [1, 2, 3, 4, 5, 6])
+
+    # Nothing new: nothing folded twice
+    assert refresh(db) == 0
+    assert_each_folded_once(db, [1, 2, 3, 4, 5, 6])
+
+
+def test_watermark_trails_the_scan_by_the_recheck_window(db):
+    db.visible.update({i: 1 for i in range(1, 31)})
+    refresh(db, batch_size=8, recheck_ids=5)
+
+    assert db.state["scanned_id"] == 30
+    assert db.state["last_sample_id"] == 25
+    # Only ids above the watermark stay in the ledger
+    assert sorted(db.folded) == [26, 27, 28, 29, 30]
+    assert_each_folded_once(db, range(1, 31))
+
+
+def test_scan_jumps_id_gaps_wider_than_a_batch(db):
+    db.visible.update({1: 1, 500: 2, 501: 2})
+    assert refresh(db, batch_size=10) == 3
+    assert_each_folded_once(db, [1, 500, 501])
+
+
+def test_each_folding_pass_gets_a_batch_number(db):
+    db.visible.update({1: 1})
+    refresh(db)
+    first = db.state["last_batch"]
+    refresh(db)
+    assert db.state["last_batch"] == first
+
+    db.visible.update({2: 7})
+    refresh(db)
+    assert db.state["last_batch"] == first + 1
+    assert db.folded[2] == (7, first + 1)
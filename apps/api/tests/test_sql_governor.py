@@ -0,0 +1,47 @@
+from utils.sql_governor import SqlCostStats, cap_limit, plan_summary
+
+
+def test_cap_limit_lowers_a_larger_trailing_limit():
+    assert cap_limit("SELECT * FROM grades LIMIT 5000;", 200) == "SELECT * FROM grades LIMIT 200"
+    assert cap_limit("select * from grades limit 900 ", 200) == "select * from grades LIMIT 200"
+
+
+def test_cap_limit_keeps_a_smaller_limit():
+    assert cap_limit("SELECT * FROM grades LIMIT 10;", 200) == "SELECT * FROM grades LIMIT 10"
+
+
+def test_cap_limit_wraps_queries_without_an_outer_limit():
+    assert cap_limit("SELECT a FROM t", 50) == "SELECT * FROM (\nSELECT a FROM t\n) AS governed LIMIT 50"
+    # A LIMIT inside a subquery does not bound the outer result
+    inner = "SELECT * FROM (SELECT a FROM t LIMIT 5) s, u"
+    assert cap_limit(inner, 50).endswith(") AS governed LIMIT 50")
+
+
+def test_plan_summary_reads_the_top_node():
+    plan = [{"Plan": {"Node Type": "Limit", "Total Cost": 12.5, "Plan Rows": 200, "Plans": []}}]
+    assert plan_summary(plan) == {"cost": 12.5, "rows": 200.0}
+
+
+def test_stats_window_and_counters():
+    stats = SqlCostStats(maxsize=3)
+    for i in range(4):
+        stats.record(float(i * 100), 10.0, rows=i, elapsed_ms=float(i))
+    stats.record(9e9, 1e6, rejected=True)
+    stats.record(50.0, 300.0, rows=200, elapsed_ms=7.0, rewritten=True, truncated=True)
+
+    snap = stats.snapshot(recent=2)
+    assert (snap["queries"], snap["rejected"], snap["rewritten"], snap["truncated"]) == (6, 1, 1, 1)
+    assert snap["window"] == 3
+    # Rejected queries count toward cost percentiles but never ran
+    assert snap["estimated_cost_p95"] == 9e9
+    assert snap["elapsed_ms_p50"] == 7.0
+    assert snap["mean_rows"] == 101.5
+    assert [r["rejected"] for r in snap["recent"]] == [True, False]
+
+
+def test_empty_stats():
+    snap = SqlCostStats().snapshot()
+    assert snap["queries"] == 0
+    assert snap["estimated_cost_p50"] is None
+    assert snap["mean_rows"] is None
+    assert snap["recent"] == []
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from utils import sql_rag
+from utils.sql_rag import check_scoped_calls, scope_sql
+
+
+class FakeConn:
+    async def fetch(self, query, *args):
+        return [{"nspname": name} for name in ("public", "pg_catalog", "information_schema", "archive")]
+
+
+SCHEMA_ENTRIES = {
+    "students": {"columns": [("student_id", "integer"), ("bootcamp_id", "integer"), ("full_name", "text")]},
+    "grades": {"columns": [("grade_id", "integer"), ("student_id", "integer"), ("score", "numeric")]},
+    "assessments": {"columns": [("assessment_id", "integer"), ("unit_id", "integer")]},
+    "lookup": {"columns": [("code", "text")]},
+}
+
+
+@pytest.fixture
+def schema(monkeypatch):
+    async def refresh():
+        return SCHEMA_ENTRIES
+    monkeypatch.setattr(sql_rag.schema_service, "refresh", refresh)
+
+
+def scoped(sql, param=1):
+    return asyncio.run(scope_sql(FakeConn(), sql, param))
+
+
+def test_tables_are_shadowed_by_scoped_ctes(schema):
+    out = scoped("SELECT full_name, avg(score) FROM students JOIN grades USING (student_id) GROUP BY 1", param=2)
+
+    assert out.startswith("WITH ")
+    assert 'students AS (SELECT * FROM public."students" WHERE bootcamp_id = ANY($2::int[]))' in out
+    assert 'grades AS (SELECT * FROM public."grades" WHERE student_id IN (SELECT student_id FROM public.students WHERE bootcamp_id = ANY($2::int[])))' in out
+    assert 'assessments AS (SELECT * FROM public."assessments" WHERE unit_id IN' in out
+    # Tables without a bootcamp link are not shadowed, so they stay unreachable
+    assert "lookup AS" not in out
+    assert out.endswith("SELECT full_name, avg(score) FROM students JOIN grades USING (student_id) GROUP BY 1")
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM public.students",
+    'SELECT * FROM "public"."students"',
+    "SELECT * FROM archive . students",
+    "SELECT * FROM pg_user",
+    "SELECT relname FROM pg_class",
+])
+def test_qualified_and_system_references_are_rejected(schema, sql):
+    with pytest.raises(ValueError):
+        scoped(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    # Dynamic SQL: the table name only exists at runtime
+    "SELECT query_to_xml('select * from ' || 'pub' || 'lic.students', true, false, '')",
+    "SELECT QUERY_TO_XML_AND_XMLSCHEMA('select 1', true, false, '')",
+    "SELECT table_to_xml('students'::regclass, true, false, '')",
+    "SELECT cursor_to_xml('c', 10, true, false, '')",
+    "SELECT * FROM dblink('dbname=x', 'select * from students') AS t(id int)",
+    "SELECT set_config('search_path', 'public', true)",
+    "SELECT current_setting('data_directory')",
+    # Spelling tricks around the same call
+    'SELECT "query_to_xml"(\'select 1\', true, false, \'\')',
+    "SELECT query_to_xml\n-- comment\n('select 1', true, false, '')",
+    # Escape strings must not desynchronize literal tracking
+    "SELECT E'\\'', query_to_xml('select 1', true, false, ''), ''''",
+    # Unscannable syntax is rejected rather than guessed at
+    "SELECT 1 /* /* */ ' */, query_to_xml('select 1', true, false, '') --'",
+    "SELECT $q$ x $q$",
+    'SELECT U&"\\0071uery_to_xml"(\'select 1\', true, false, \'\')',
+])
+def test_calls_outside_the_allowlist_are_rejected(schema, sql):
+    with pytest.raises(ValueError):
+        scoped(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT count(*), round(avg(score)::numeric, 2) FROM grades WHERE student_id IN (SELECT student_id FROM students)",
+    "SELECT date_trunc('week', created_at), sum(x) FILTER (WHERE y) OVER (PARTITION BY z) FROM t",
+    "SELECT full_name FROM students WHERE full_name = 'query_to_xml(' -- dblink(\nLIMIT 5",
+    "SELECT coalesce(nullif(a, ''), 'n/a'), CAST(b AS varchar(20)) FROM t WHERE c = ANY($1::int[])",
+    "WITH top AS (SELECT * FROM grades ORDER BY score DESC LIMIT 10) SELECT * FROM top",
+])
+def test_ordinary_analytics_queries_pass(sql):
+    check_scoped_calls(sql)
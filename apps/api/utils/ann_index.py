@@ -0,0 +1,390 @@
+import asyncio
+import asyncpg
+import json
+import logging
+import os
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# In-process nearest-neighbour index over RAG chunk embeddings.
+#
+# Vectors live in a float32 file that is memory-mapped, so the OS pages the
+# matrix in on demand and a restarted worker reuses it without reloading
+# from Postgres. Chunk ids are kept in ascending order next to it; new
+# chunks are appended from an id watermark, the same way rollups fold in
+# class_samples. Scores are inner products, matching pgvector's `<#>`.
+#
+# With nlist > 0 the vectors are also partitioned IVF-style: spherical
+# k-means centroids, and a search only scans the `nprobe` closest lists.
+#
+# Each vector also carries a partition label (the chunk's bootcamp id, -1
+# for none). A search restricted to some partitions only scores their rows,
+# so a caller scoped to two bootcamps never touches the others.
+#
+# The index is append-only, so chunks deleted from the table (including
+# changed chunks, which the ingestor deletes and re-inserts under a new id)
+# are tombstoned: their rows stay in the file but are skipped by searches.
+# Once tombstones make up too much of the index it is rebuilt.
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k largest scores per row, best first."""
+    if scores.shape[1] > k:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+class ANNIndex:
+    """
+    Flat or IVF inner-product index backed by a memory-mapped float32 matrix.
+
+    Args:
+        directory: Where vectors.f32, ids.npy, labels.npy, tombstones.npy and meta.json are kept
+        nlist: IVF partitions (0 = exact flat scan)
+        nprobe: Partitions scanned per query when nlist > 0
+        block_rows: Rows per matmul block during flat scans
+    """
+
+    def __init__(self, directory: str, nlist: int = 0, nprobe: int = 8, block_rows: int = 65536):
+        self.directory = directory
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.block_rows = block_rows
+        self.dim: Optional[int] = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.labels = np.empty(0, dtype=np.int64)
+        # Rows whose chunk was deleted from the table
+        self.dead = np.zeros(0, dtype=bool)
+        self.vectors: Optional[np.ndarray] = None
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._trained_size = 0
+        # partition label -> row numbers, ascending
+        self._partitions: Dict[int, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    @property
+    def live_size(self) -> int:
+        """Indexed chunks not tombstoned."""
+        return self.size - int(self.dead.sum())
+
+    def live_ids(self) -> np.ndarray:
+        return self.ids[~self.dead]
+
+    @property
+    def watermark(self) -> int:
+        """Highest chunk id indexed (ids are appended in ascending order)."""
+        return int(self.ids[-1]) if self.size else 0
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def load(self) -> bool:
+        """Reopen a previously persisted index. Returns whether one was found."""
+        try:
+            with open(self._path("meta.json")) as f:
+                meta = json.load(f)
+            ids = np.load(self._path("ids.npy"))
+        except (OSError, ValueError):
+            return False
+        try:
+            labels = np.load(self._path("labels.npy"))
+        except (OSError, ValueError):
+            # Written before partition labels existed; rebuild from the table
+            self.reset()
+            return False
+        try:
+            tombstones = np.load(self._path("tombstones.npy"))
+        except (OSError, ValueError):
+            tombstones = np.empty(0, dtype=np.int64)
+
+        with self._lock:
+            self.dim = meta["dim"]
+            self.ids = ids
+            self.labels = labels
+            self.dead = np.isin(ids, tombstones)
+            self._rebuild_partitions()
+            self.vectors = self._map(len(ids))
+            self.centroids = None
+            if self.nlist and self.size:
+                self._train()
+        return True
+
+    def reset(self) -> None:
+        """Drop all vectors (memory and disk)."""
+        with self._lock:
+            for name in ("vectors.f32", "ids.npy", "labels.npy", "tombstones.npy", "meta.json"):
+                try:
+                    os.remove(self._path(name))
+                except FileNotFoundError:
+                    pass
+            self.dim = None
+            self.ids = np.empty(0, dtype=np.int64)
+            self.labels = np.empty(0, dtype=np.int64)
+            self.dead = np.zeros(0, dtype=bool)
+            self._partitions = {}
+            self.vectors = None
+            self.centroids = None
+            self._lists = []
+            self._assignments = np.empty(0, dtype=np.int32)
+            self._trained_size = 0
+
+    def _map(self, rows: int) -> Optional[np.ndarray]:
+        if rows == 0:
+            return None
+        return np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray, labels: Optional[np.ndarray] = None) -> None:
+        """Append vectors (with optional partition labels) for chunk ids greater than the current watermark."""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        labels = np.full(len(ids), -1, dtype=np.int64) if labels is None else np.asarray(labels, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        if self.size and ids[0] <= self.watermark:
+            raise ValueError("ANN index ids must be appended in ascending order")
+
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self._path("meta.json"), "w") as f:
+                    json.dump({"dim": self.dim}, f)
+            start = self.size
+            with open(self._path("vectors.f32"), "ab") as f:
+                f.write(vectors.tobytes())
+            self.ids = np.concatenate([self.ids, ids])
+            self.labels = np.concatenate([self.labels, labels])
+            self.dead = np.concatenate([self.dead, np.zeros(len(ids), dtype=bool)])
+            np.save(self._path("ids.npy"), self.ids)
+            np.save(self._path("labels.npy"), self.labels)
+            self._rebuild_partitions()
+            self.vectors = self._map(self.size)
+
+            if self.nlist:
+                # Retrain once the index has doubled; otherwise just route new rows
+                if self.centroids is None or self.size >= 2 * self._trained_size:
+                    self._train()
+                else:
+                    self._assignments = np.concatenate([self._assignments, self._assign(start, self.size)])
+                    self._rebuild_lists()
+
+    def remove(self, ids: np.ndarray) -> int:
+        """Tombstone indexed chunk ids so searches skip them. Returns how many were newly removed."""
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._lock:
+            rows = np.searchsorted(self.ids, ids)
+            found = rows < self.size
+            rows = rows[found][self.ids[rows[found]] == ids[found]]
+            newly = int((~self.dead[rows]).sum())
+            self.dead[rows] = True
+            np.save(self._path("tombstones.npy"), self.ids[self.dead])
+        return newly
+
+    def _train(self, iterations: int = 10) -> None:
+        """Spherical k-means on a sample, then route every row to its nearest centroid."""
+        rng = np.random.default_rng(0)
+        nlist = min(self.nlist, self.size)
+        sample = np.asarray(self.vectors[np.sort(rng.choice(self.size, min(self.size, nlist * 64), replace=False))])
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids /= np.where(norms == 0, 1, norms)
+
+        self.centroids = centroids
+        self._assignments = self._assign(0, self.size)
+        self._trained_size = self.size
+        self._rebuild_lists()
+
+    def _assign(self, start: int, end: int) -> np.ndarray:
+        parts = [
+            np.argmax(np.asarray(self.vectors[s:min(s + self.block_rows, end)]) @ self.centroids.T, axis=1)
+            for s in range(start, end, self.block_rows)
+        ]
+        return np.concatenate(parts).astype(np.int32) if parts else np.empty(0, dtype=np.int32)
+
+    def _rebuild_partitions(self) -> None:
+        order = np.argsort(self.labels, kind="stable")
+        values, starts = np.unique(self.labels[order], return_index=True)
+        self._partitions = dict(zip(values.tolist(), np.split(order, starts[1:])))
+
+    def _rows_in(self, partitions: Sequence[int]) -> np.ndarray:
+        parts = [self._partitions[p] for p in set(partitions) if p in self._partitions]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+    def _rebuild_lists(self) -> None:
+        order = np.argsort(self._assignments, kind="stable")
+        counts = np.bincount(self._assignments, minlength=len(self.centroids))
+        self._lists = np.split(order, np.cumsum(counts)[:-1])
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        partitions: Optional[Sequence[int]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (chunk ids, scores) for one query vector, best first, optionally within some partitions."""
+        return self.search_many(np.asarray(query, dtype=np.float32)[None, :], k, partitions)[0]
+
+    def search_many(
+        self,
+        queries: np.ndarray,
+        k: int,
+        partitions: Optional[Sequence[int]] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Top-k (chunk ids, scores) for each row of `queries`, optionally within some partitions."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        with self._lock:
+            if self.size == 0:
+                return [empty for _ in queries]
+            rows = self._rows_in(partitions) if partitions is not None else None
+            if self.dead.any():
+                rows = np.flatnonzero(~self.dead) if rows is None else rows[~self.dead[rows]]
+            if rows is not None:
+                if len(rows) == 0:
+                    return [empty for _ in queries]
+                if self.centroids is None:
+                    return self._search_rows(queries, rows, min(k, len(rows)))
+                return [self._search_ivf(query, k, rows) for query in queries]
+            k = min(k, self.size)
+            if self.centroids is None:
+                return self._search_flat(queries, k)
+            return [self._search_ivf(query, k) for query in queries]
+
+    def _search_flat(self, queries: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, self.size, self.block_rows):
+            block = np.asarray(self.vectors[start:start + self.block_rows])
+            scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, start + len(block)), (len(queries), len(block)))], axis=1)
+            top = _top_k(scores, k)
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_rows = np.take_along_axis(rows, top, axis=1)
+        return [(self.ids[r], s) for r, s in zip(best_rows, best_scores)]
+
+    def _search_rows(self, queries: np.ndarray, rows: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Exact top-k over the given (ascending) row numbers only."""
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(rows), self.block_rows):
+            block_rows = rows[start:start + self.block_rows]
+            scores = np.concatenate([best_scores, queries @ np.asarray(self.vectors[block_rows]).T], axis=1)
+            candidates = np.concatenate([best_rows, np.broadcast_to(block_rows, (len(queries), len(block_rows)))], axis=1)
+            top = _top_k(scores, k)
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_rows = np.take_along_axis(candidates, top, axis=1)
+        return [(self.ids[r], s) for r, s in zip(best_rows, best_scores)]
+
+    def _search_ivf(self, query: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        probe = np.argsort(-(self.centroids @ query))[:self.nprobe]
+        candidates = np.sort(np.concatenate([self._lists[p] for p in probe]))
+        if rows is not None:
+            candidates = np.intersect1d(candidates, rows, assume_unique=True)
+        if len(candidates) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = (np.asarray(self.vectors[candidates]) @ query)[None, :]
+        top = _top_k(scores, min(k, len(candidates)))[0]
+        return self.ids[candidates[top]], scores[0, top]
+
+
+async def refresh_ann_index(
+    index: ANNIndex,
+    pool: asyncpg.Pool,
+    table: str,
+    batch_size: int = 5000,
+    max_dead_fraction: float = 0.2
+) -> int:
+    """
+    Append chunks above the index watermark. Returns the number added.
+
+    Indexed chunks that no longer exist in the table are tombstoned. The
+    index is rebuilt from scratch when the max id went backwards, when rows
+    appeared below the watermark, or when more than `max_dead_fraction` of
+    it is tombstones.
+    """
+    stats = await pool.fetchrow(f"""
+        SELECT COUNT(*) FILTER (WHERE id <= $1) AS indexed, COALESCE(MAX(id), 0) AS max_id
+        FROM {table}
+    """, index.watermark)
+    if stats["max_id"] < index.watermark:
+        logger.info(f"{table} shrank; rebuilding ANN index")
+        await asyncio.to_thread(index.reset)
+    elif stats["indexed"] != index.live_size:
+        gone = await pool.fetch(f"""
+            SELECT t.id
+            FROM unnest($1::bigint[]) AS t(id)
+            WHERE NOT EXISTS (SELECT 1 FROM {table} r WHERE r.id = t.id)
+        """, index.live_ids().tolist())
+        removed = await asyncio.to_thread(index.remove, np.array([row["id"] for row in gone], dtype=np.int64))
+        if removed:
+            logger.info(f"Tombstoned {removed} deleted {table} chunks in ANN index")
+        if stats["indexed"] != index.live_size or index.size - index.live_size > max_dead_fraction * index.size:
+            logger.info(f"Rebuilding ANN index over {table}")
+            await asyncio.to_thread(index.reset)
+
+    added = 0
+    while True:
+        rows = await pool.fetch(f"""
+            SELECT
+                id,
+                embedding::real[] AS embedding,
+                CASE WHEN metadata::jsonb ->> 'bootcamp_id' ~ '^-?[0-9]+$'
+                     THEN (metadata::jsonb ->> 'bootcamp_id')::bigint ELSE -1 END AS bootcamp_id
+            FROM {table}
+            WHERE id > $1
+            ORDER BY id
+            LIMIT $2
+        """, index.watermark, batch_size)
+        if not rows:
+            break
+        ids = np.fromiter((row["id"] for row in rows), dtype=np.int64, count=len(rows))
+        vectors = np.array([row["embedding"] for row in rows], dtype=np.float32)
+        labels = np.fromiter((row["bootcamp_id"] for row in rows), dtype=np.int64, count=len(rows))
+        await asyncio.to_thread(index.add, ids, vectors, labels)
+        added += len(rows)
+    return added
+
+
+async def ann_refresh_loop(
+    index: ANNIndex,
+    pool: asyncpg.Pool,
+    table: str,
+    interval_seconds: float,
+    batch_size: int = 5000
+) -> None:
+    """Background task: fold new chunks into the index every `interval_seconds` until cancelled."""
+    while True:
+        try:
+            added = await refresh_ann_index(index, pool, table, batch_size)
+            if added:
+                logger.info(f"Added {added} {table} chunks to ANN index ({index.size} total)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"ANN index refresh failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+# Shared index for the assistant's chunk retrieval (used when retriever_backend == "ann")
+chunk_index = ANNIndex(settings.ann_index_dir, nlist=settings.ann_nlist, nprobe=settings.ann_nprobe)
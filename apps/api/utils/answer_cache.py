@@ -0,0 +1,110 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from core.settings import settings
+from utils.response_cache import get_data_versions, get_global_data_version
+
+logger = logging.getLogger(__name__)
+
+# Semantic answer cache for the assistant.
+#
+# Entries are (question embedding, scope, data versions) -> reply. A lookup
+# only considers entries with the same scope and returns the most similar
+# one if its cosine similarity clears the threshold. Entries whose data
+# versions no longer match (grades edited, new class_samples folded in)
+# are dropped on sight, so stale answers are never served.
+
+
+class SemanticAnswerCache:
+    """
+    Bounded in-process cache of assistant replies keyed by meaning.
+
+    Embeddings must be unit-normalized so a dot product is the cosine.
+    Oldest entries are evicted first once `maxsize` is reached, and entries
+    are ignored after `ttl` seconds. Not shared across workers.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 3600.0, threshold: float = 0.95):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.threshold = threshold
+        # entry id -> (scope, expires_at, versions, embedding, reply)
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        # scope -> entry ids, for scanning only comparable entries
+        self._by_scope: Dict[Hashable, List[int]] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, scope: Hashable, versions: Tuple[int, ...], embedding: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Best cached reply for this scope and data version, if similar enough."""
+        now = time.monotonic()
+        live: List[int] = []
+        for entry_id in self._by_scope.get(scope, []):
+            _, expires_at, entry_versions, _, _ = self._entries[entry_id]
+            if expires_at < now or entry_versions != versions:
+                del self._entries[entry_id]
+            else:
+                live.append(entry_id)
+        self._set_scope(scope, live)
+
+        if live:
+            matrix = np.stack([self._entries[entry_id][3] for entry_id in live])
+            similarities = matrix @ np.asarray(embedding, dtype=np.float32)
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                self._entries.move_to_end(live[best])
+                self.hits += 1
+                return self._entries[live[best]][4]
+
+        self.misses += 1
+        return None
+
+    def store(self, scope: Hashable, versions: Tuple[int, ...], embedding: np.ndarray, reply: Dict[str, Any]) -> None:
+        """Cache a reply, evicting the least recently used entry if full."""
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (
+            scope,
+            time.monotonic() + self.ttl,
+            versions,
+            np.asarray(embedding, dtype=np.float32),
+            reply
+        )
+        self._by_scope.setdefault(scope, []).append(entry_id)
+
+        while len(self._entries) > self.maxsize:
+            old_id, (old_scope, *_) = self._entries.popitem(last=False)
+            self._set_scope(old_scope, [i for i in self._by_scope.get(old_scope, []) if i != old_id])
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        self._entries.clear()
+        self._by_scope.clear()
+
+    def _set_scope(self, scope: Hashable, entry_ids: List[int]) -> None:
+        if entry_ids:
+            self._by_scope[scope] = entry_ids
+        else:
+            self._by_scope.pop(scope, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+answer_cache = SemanticAnswerCache(
+    maxsize=settings.answer_cache_size,
+    ttl=settings.answer_cache_ttl_seconds,
+    threshold=settings.answer_cache_threshold
+)
+
+
+async def current_versions(bootcamp_ids: Optional[List[int]]) -> Tuple[int, ...]:
+    """Data versions for a scope; None means every bootcamp."""
+    if not bootcamp_ids:
+        return (await get_global_data_version(),)
+    return tuple(await get_data_versions(sorted(set(bootcamp_ids))))
@@ -0,0 +1,529 @@
+import asyncio
+import asyncpg
+import hashlib
+import json
+import logging
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from db.pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+# Builds and incrementally refreshes the RAG chunk table.
+#
+# Chunks are rendered straight from the relational tables (bootcamps,
+# students, units + assessments + grades, class_samples), each under a
+# stable key such as "grades:12:3" (student 12, unit 3). A chunk's content
+# hash (text + metadata + embedding model) is compared with the hash stored
+# in STATE_TABLE, and only new or changed chunks are embedded, in batches.
+# A changed chunk is deleted and re-inserted rather than updated, so it
+# gets a new id above the ANN index watermark; the next index refresh
+# tombstones the old id (see utils/ann_index.py). Rows are written with COPY
+# into a staging table, one transaction per batch together with their
+# state rows, which makes every committed batch a checkpoint: a job that
+# dies part way is resumed by simply running again.
+
+STATE_TABLE = "rag_chunk_state"
+JOBS_TABLE = "rag_ingest_jobs"
+
+# Only one worker ingests at a time (pg_try_advisory_lock key)
+_ADVISORY_LOCK_KEY = 74210
+# Serializes the CREATE statements below (pg_advisory_xact_lock key)
+_SCHEMA_LOCK_KEY = 74211
+
+# (key, chunk_text, metadata)
+Chunk = Tuple[str, str, Dict[str, Any]]
+
+
+def _pct(value: Optional[float]) -> str:
+    return "n/a" if value is None else f"{value:.1f}%"
+
+
+async def _render_bootcamps(conn: asyncpg.Connection) -> List[Chunk]:
+    rows = await conn.fetch("""
+        SELECT
+            b.bootcamp_id,
+            b.bootcamp_name,
+            b.start_date,
+            b.end_date,
+            b.description,
+            (SELECT COUNT(*) FROM students s WHERE s.bootcamp_id = b.bootcamp_id) AS student_count,
+            (SELECT string_agg(u.unit_title, ', ' ORDER BY u.unit_id)
+             FROM units u WHERE u.bootcamp_id = b.bootcamp_id) AS unit_titles
+        FROM bootcamps b
+        ORDER BY b.bootcamp_id
+    """)
+    chunks = []
+    for row in rows:
+        text = f"Bootcamp {row['bootcamp_name']}"
+        if row["start_date"]:
+            text += f" runs from {row['start_date']} to {row['end_date'] or 'an open end date'} and"
+        text += f" has {row['student_count']} enrolled students."
+        if row["description"] and row["description"].strip():
+            text += f" {row['description'].strip().rstrip('.')}."
+        if row["unit_titles"]:
+            text += f" Units: {row['unit_titles']}."
+        chunks.append((
+            f"bootcamp:{row['bootcamp_id']}",
+            text,
+            {"source": "bootcamp", "bootcamp_id": row["bootcamp_id"]}
+        ))
+    return chunks
+
+
+async def _render_students(conn: asyncpg.Connection) -> List[Chunk]:
+    rows = await conn.fetch("""
+        SELECT
+            s.student_id,
+            s.full_name,
+            s.bootcamp_id,
+            b.bootcamp_name,
+            COUNT(g.grade_id) AS graded,
+            AVG(g.score::float / NULLIF(a.max_score, 0) * 100) AS avg_pct
+        FROM students s
+        LEFT JOIN bootcamps b ON b.bootcamp_id = s.bootcamp_id
+        LEFT JOIN grades g ON g.student_id = s.student_id
+        LEFT JOIN assessments a ON a.assessment_id = g.assessment_id
+        GROUP BY s.student_id, s.full_name, s.bootcamp_id, b.bootcamp_name
+        ORDER BY s.student_id
+    """)
+    chunks = []
+    for row in rows:
+        text = f"Student {row['full_name']} is enrolled in bootcamp {row['bootcamp_name']}."
+        if row["graded"]:
+            text += f" Average grade {_pct(row['avg_pct'])} across {row['graded']} graded assessments."
+        else:
+            text += " No graded assessments yet."
+        chunks.append((
+            f"student:{row['student_id']}",
+            text,
+            {"source": "student", "bootcamp_id": row["bootcamp_id"], "student_id": row["student_id"]}
+        ))
+    return chunks
+
+
+async def _render_units(conn: asyncpg.Connection) -> List[Chunk]:
+    rows = await conn.fetch("""
+        SELECT
+            u.unit_id,
+            u.unit_title,
+            u.bootcamp_id,
+            b.bootcamp_name,
+            COUNT(DISTINCT a.assessment_id) AS assessments,
+            COUNT(DISTINCT g.student_id) AS students_graded,
+            AVG(g.score::float / NULLIF(a.max_score, 0) * 100) AS avg_pct
+        FROM units u
+        LEFT JOIN bootcamps b ON b.bootcamp_id = u.bootcamp_id
+        LEFT JOIN assessments a ON a.unit_id = u.unit_id
+        LEFT JOIN grades g ON g.assessment_id = a.assessment_id
+        GROUP BY u.unit_id, u.unit_title, u.bootcamp_id, b.bootcamp_name
+        ORDER BY u.unit_id
+    """)
+    return [
+        (
+            f"unit:{row['unit_id']}",
+            f"Unit {row['unit_title']} in bootcamp {row['bootcamp_name']} has {row['assessments']} assessments;"
+            f" {row['students_graded']} students graded, class average {_pct(row['avg_pct'])}.",
+            {"source": "unit", "bootcamp_id": row["bootcamp_id"], "unit_id": row["unit_id"]}
+        )
+        for row in rows
+    ]
+
+
+async def _render_grades(conn: asyncpg.Connection) -> List[Chunk]:
+    """One chunk per (student, unit) listing every graded assessment."""
+    rows = await conn.fetch("""
+        SELECT
+            s.student_id,
+            s.full_name,
+            u.unit_id,
+            u.unit_title,
+            u.bootcamp_id,
+            a.title,
+            g.score,
+            a.max_score,
+            a.due_date
+        FROM grades g
+        JOIN students s ON s.student_id = g.student_id
+        JOIN assessments a ON a.assessment_id = g.assessment_id
+        JOIN units u ON u.unit_id = a.unit_id
+        ORDER BY s.student_id, u.unit_id, a.due_date NULLS LAST, a.assessment_id
+    """)
+    groups: "OrderedDict[Tuple[Any, Any], List[asyncpg.Record]]" = OrderedDict()
+    for row in rows:
+        groups.setdefault((row["student_id"], row["unit_id"]), []).append(row)
+
+    chunks = []
+    for (student_id, unit_id), grades in groups.items():
+        first = grades[0]
+        parts, pcts = [], []
+        for g in grades:
+            pct = float(g["score"]) / float(g["max_score"]) * 100 if g["max_score"] else None
+            if pct is not None:
+                pcts.append(pct)
+            due = f", due {g['due_date']}" if g["due_date"] else ""
+            parts.append(f"{g['title']} {g['score']}/{g['max_score']} ({_pct(pct)}{due})")
+        average = sum(pcts) / len(pcts) if pcts else None
+        chunks.append((
+            f"grades:{student_id}:{unit_id}",
+            f"Grades for {first['full_name']} in unit {first['unit_title']}: {'; '.join(parts)}."
+            f" Unit average {_pct(average)}.",
+            {"source": "grades", "bootcamp_id": first["bootcamp_id"], "student_id": student_id, "unit_id": unit_id}
+        ))
+    return chunks
+
+
+async def _render_attendance(conn: asyncpg.Connection) -> List[Chunk]:
+    """Weekly class_samples summaries per bootcamp."""
+    rows = await conn.fetch("""
+        SELECT
+            cs.bootcamp_id,
+            b.bootcamp_name,
+            DATE_TRUNC('week', cs.date)::date AS week_start,
+            COUNT(*) AS sessions,
+            AVG(cs.attendance_pct)::float AS attendance,
+            AVG(cs.avg_attention_rate)::float AS attention,
+            AVG(cs.avg_distraction_rate)::float AS distraction
+        FROM class_samples cs
+        JOIN bootcamps b ON b.bootcamp_id = cs.bootcamp_id
+        GROUP BY cs.bootcamp_id, b.bootcamp_name, DATE_TRUNC('week', cs.date)::date
+        ORDER BY cs.bootcamp_id, week_start
+    """)
+    return [
+        (
+            f"attendance:{row['bootcamp_id']}:{row['week_start']}",
+            f"Attendance for bootcamp {row['bootcamp_name']}, week of {row['week_start']}:"
+            f" {row['sessions']} class samples, average attendance {_pct(row['attendance'])},"
+            f" attention {_pct(row['attention'])}, distraction {_pct(row['distraction'])}.",
+            {"source": "attendance", "bootcamp_id": row["bootcamp_id"], "week_start": str(row["week_start"])}
+        )
+        for row in rows
+    ]
+
+
+# source name -> renderer; every chunk key starts with a unique prefix
+CHUNK_RENDERERS: Dict[str, Callable[[asyncpg.Connection], Awaitable[List[Chunk]]]] = {
+    "bootcamp": _render_bootcamps,
+    "student": _render_students,
+    "unit": _render_units,
+    "grades": _render_grades,
+    "attendance": _render_attendance,
+}
+
+
+def content_hash(model: str, text: str, metadata: Dict[str, Any]) -> str:
+    """Hash deciding whether a chunk must be re-embedded and rewritten."""
+    payload = f"{model}\0{text}\0{json.dumps(metadata, sort_keys=True, default=str)}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def ensure_chunk_ingest_tables(pool: asyncpg.Pool, rag_table: str) -> bool:
+    """
+    Create the chunk table (if missing), chunk state and job tables. Returns readiness.
+
+    Needs rights to create the vector extension and the tables, so it runs
+    from `python -m db.rag_schema` as the schema owner, or at startup only
+    with settings.rag_schema_at_startup.
+    """
+    try:
+        async with pool.acquire() as conn, conn.transaction():
+            # Concurrent CREATE ... IF NOT EXISTS can still collide in the catalogs
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", _SCHEMA_LOCK_KEY)
+            await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+            await conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {rag_table} (
+                    id BIGSERIAL PRIMARY KEY,
+                    chunk_text TEXT NOT NULL,
+                    metadata JSONB NOT NULL DEFAULT '{{}}',
+                    embedding vector NOT NULL
+                )
+            """)
+            await conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+                    chunk_key TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    chunk_id BIGINT NOT NULL,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+            """)
+            await conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {JOBS_TABLE} (
+                    job_id BIGSERIAL PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    total_chunks INTEGER NOT NULL DEFAULT 0,
+                    changed_chunks INTEGER NOT NULL DEFAULT 0,
+                    embedded_chunks INTEGER NOT NULL DEFAULT 0,
+                    deleted_chunks INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    finished_at TIMESTAMPTZ
+                )
+            """)
+        return True
+    except Exception as e:
+        logger.warning(f"Chunk ingestion disabled: {e}")
+        return False
+
+
+async def chunk_ingest_tables_exist(pool: asyncpg.Pool, rag_table: str) -> bool:
+    """Check, without any DDL, that the tables ensure_chunk_ingest_tables creates exist."""
+    tables = [rag_table, STATE_TABLE, JOBS_TABLE]
+    try:
+        missing = await pool.fetchval(
+            "SELECT array_agg(t) FROM unnest($1::text[]) AS t WHERE to_regclass(t) IS NULL",
+            tables
+        )
+    except Exception as e:
+        logger.warning(f"Chunk ingestion disabled: {e}")
+        return False
+    if missing:
+        logger.warning(
+            f"Chunk ingestion disabled, missing tables {', '.join(missing)}: "
+            f"run `python -m db.rag_schema` as the schema owner"
+        )
+        return False
+    return True
+
+
+class ChunkIngestor:
+    """
+    Renders, diffs, embeds and writes RAG chunks.
+
+    Args:
+        embedder: Object with `model` and async `embed(texts)`, e.g.
+            OpenAIEmbedder or FakeEmbedder
+        rag_table: Chunk table (id, chunk_text, metadata, embedding)
+        batch_size: Chunks per embedding call and write transaction
+        pool_getter: Pool used for reads and writes
+    """
+
+    def __init__(
+        self,
+        embedder,
+        rag_table: str,
+        batch_size: int = 128,
+        pool_getter: Callable[[], asyncpg.Pool] = get_pool
+    ):
+        self.embedder = embedder
+        self.rag_table = rag_table
+        self.batch_size = max(1, batch_size)
+        self._pool_getter = pool_getter
+        self._lock = asyncio.Lock()
+        self.progress: Dict[str, Any] = {"status": "idle"}
+
+    async def render(self, conn: asyncpg.Connection) -> Dict[str, Chunk]:
+        """Every chunk the tables currently describe, by key."""
+        chunks: Dict[str, Chunk] = {}
+        for renderer in CHUNK_RENDERERS.values():
+            for key, text, metadata in await renderer(conn):
+                chunks[key] = (key, text, {**metadata, "chunk_key": key})
+        return chunks
+
+    async def run(self, prune_untracked: bool = False) -> Dict[str, Any]:
+        """
+        Bring the chunk table up to date with the source tables.
+
+        Resumes the last interrupted or failed job if there is one. With
+        `prune_untracked`, rows this pipeline did not write (e.g. from an
+        older manual build) are deleted at the end.
+
+        Returns:
+            Final progress; status "busy" if another worker holds the job lock
+        """
+        async with self._lock:
+            pool = self._pool_getter()
+            async with pool.acquire() as lock_conn:
+                if not await lock_conn.fetchval("SELECT pg_try_advisory_lock($1)", _ADVISORY_LOCK_KEY):
+                    return {"status": "busy"}
+                try:
+                    return await self._run(pool, prune_untracked)
+                finally:
+                    await lock_conn.execute("SELECT pg_advisory_unlock($1)", _ADVISORY_LOCK_KEY)
+
+    async def _run(self, pool: asyncpg.Pool, prune_untracked: bool) -> Dict[str, Any]:
+        # With the lock held, a "running" job belongs to a worker that died
+        await pool.execute(f"UPDATE {JOBS_TABLE} SET status = 'interrupted' WHERE status = 'running'")
+        job = await pool.fetchrow(f"""
+            UPDATE {JOBS_TABLE} SET status = 'running', error = NULL, updated_at = NOW()
+            WHERE job_id = (
+                SELECT job_id FROM {JOBS_TABLE}
+                WHERE status IN ('interrupted', 'failed')
+                ORDER BY job_id DESC LIMIT 1
+            )
+            RETURNING job_id, embedded_chunks, deleted_chunks
+        """)
+        if job is None:
+            job = await pool.fetchrow(
+                f"INSERT INTO {JOBS_TABLE} (status) VALUES ('running') RETURNING job_id, embedded_chunks, deleted_chunks"
+            )
+        self.progress = {
+            "job_id": job["job_id"],
+            "status": "running",
+            "resumed": job["embedded_chunks"] > 0 or job["deleted_chunks"] > 0,
+            "total_chunks": 0,
+            "changed_chunks": 0,
+            "embedded_chunks": job["embedded_chunks"],
+            "deleted_chunks": job["deleted_chunks"],
+        }
+
+        try:
+            async with pool.acquire() as conn:
+                chunks = await self.render(conn)
+                stored = {
+                    row["chunk_key"]: row["content_hash"]
+                    for row in await conn.fetch(f"SELECT chunk_key, content_hash FROM {STATE_TABLE}")
+                }
+
+            model = self.embedder.model
+            hashes = {key: content_hash(model, text, metadata) for key, (_, text, metadata) in chunks.items()}
+            changed = sorted(key for key, h in hashes.items() if stored.get(key) != h)
+            removed = sorted(set(stored) - set(chunks))
+            # On resume, chunks embedded before the interruption still count as changed
+            self.progress.update(total_chunks=len(chunks), changed_chunks=len(changed) + job["embedded_chunks"])
+            await self._save_progress(pool)
+            logger.info(f"Chunk ingest job {job['job_id']}: {len(changed)} of {len(chunks)} chunks to embed, {len(removed)} to delete")
+
+            batches = [changed[i:i + self.batch_size] for i in range(0, len(changed), self.batch_size)]
+            await self._write_batches(pool, [[chunks[key] for key in batch] for batch in batches], hashes)
+
+            for i in range(0, len(removed), self.batch_size):
+                self.progress["deleted_chunks"] += await self._delete_keys(pool, removed[i:i + self.batch_size])
+                await self._save_progress(pool)
+
+            if prune_untracked:
+                status = await pool.execute(f"""
+                    DELETE FROM {self.rag_table} r
+                    WHERE NOT EXISTS (SELECT 1 FROM {STATE_TABLE} st WHERE st.chunk_id = r.id)
+                """)
+                self.progress["deleted_chunks"] += int(status.split()[-1])
+
+            self.progress["status"] = "completed"
+        except asyncio.CancelledError:
+            self.progress["status"] = "interrupted"
+            raise
+        except Exception as e:
+            logger.error(f"Chunk ingest job {job['job_id']} failed: {e}")
+            self.progress.update(status="failed", error=str(e))
+        finally:
+            try:
+                await self._save_progress(pool, final=self.progress["status"] != "running")
+            except Exception as e:
+                logger.warning(f"Could not save chunk ingest progress: {e}")
+        return dict(self.progress)
+
+    async def _embed(self, batch: List[Chunk]) -> np.ndarray:
+        vectors = np.asarray(await self.embedder.embed([text for _, text, _ in batch]), dtype=np.float32)
+        # Unit length, so pgvector's inner product (<#>) ranks by cosine
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    async def _write_batches(self, pool: asyncpg.Pool, batches: List[List[Chunk]], hashes: Dict[str, str]) -> None:
+        """Embed and write batches, embedding the next batch while the current one is written."""
+        if not batches:
+            return
+        pending = asyncio.create_task(self._embed(batches[0]))
+        try:
+            for i, batch in enumerate(batches):
+                vectors = await pending
+                if i + 1 < len(batches):
+                    pending = asyncio.create_task(self._embed(batches[i + 1]))
+                await self._write_batch(pool, batch, vectors, hashes)
+                self.progress["embedded_chunks"] += len(batch)
+                await self._save_progress(pool)
+        finally:
+            if not pending.done():
+                pending.cancel()
+
+    async def _write_batch(
+        self,
+        pool: asyncpg.Pool,
+        batch: List[Chunk],
+        vectors: np.ndarray,
+        hashes: Dict[str, str]
+    ) -> None:
+        keys = [key for key, _, _ in batch]
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    CREATE TEMP TABLE rag_ingest_stage (
+                        chunk_text TEXT,
+                        metadata TEXT,
+                        embedding REAL[]
+                    ) ON COMMIT DROP
+                """)
+                await conn.copy_records_to_table(
+                    "rag_ingest_stage",
+                    records=[
+                        (text, json.dumps(metadata, default=str), vector.tolist())
+                        for (_, text, metadata), vector in zip(batch, vectors)
+                    ],
+                    columns=["chunk_text", "metadata", "embedding"]
+                )
+                await conn.execute(f"""
+                    DELETE FROM {self.rag_table}
+                    WHERE id IN (SELECT chunk_id FROM {STATE_TABLE} WHERE chunk_key = ANY($1::text[]))
+                """, keys)
+                inserted = await conn.fetch(f"""
+                    INSERT INTO {self.rag_table} (chunk_text, metadata, embedding)
+                    SELECT chunk_text, metadata::jsonb, embedding::vector
+                    FROM rag_ingest_stage
+                    RETURNING id, metadata ->> 'chunk_key' AS chunk_key
+                """)
+                ids = {row["chunk_key"]: row["id"] for row in inserted}
+                await conn.execute(f"""
+                    INSERT INTO {STATE_TABLE} (chunk_key, content_hash, chunk_id, updated_at)
+                    SELECT chunk_key, content_hash, chunk_id, NOW()
+                    FROM unnest($1::text[], $2::text[], $3::bigint[]) AS t(chunk_key, content_hash, chunk_id)
+                    ON CONFLICT (chunk_key) DO UPDATE
+                    SET content_hash = EXCLUDED.content_hash,
+                        chunk_id = EXCLUDED.chunk_id,
+                        updated_at = EXCLUDED.updated_at
+                """, keys, [hashes[key] for key in keys], [ids[key] for key in keys])
+
+    async def _delete_keys(self, pool: asyncpg.Pool, keys: List[str]) -> int:
+        """Delete chunks whose source rows are gone. Returns rows deleted."""
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                status = await conn.execute(f"""
+                    DELETE FROM {self.rag_table}
+                    WHERE id IN (SELECT chunk_id FROM {STATE_TABLE} WHERE chunk_key = ANY($1::text[]))
+                """, keys)
+                await conn.execute(f"DELETE FROM {STATE_TABLE} WHERE chunk_key = ANY($1::text[])", keys)
+        return int(status.split()[-1])
+
+    async def _save_progress(self, pool: asyncpg.Pool, final: bool = False) -> None:
+        p = self.progress
+        await pool.execute(f"""
+            UPDATE {JOBS_TABLE}
+            SET status = $2, total_chunks = $3, changed_chunks = $4, embedded_chunks = $5,
+                deleted_chunks = $6, error = $7, updated_at = NOW(),
+                finished_at = CASE WHEN $8 THEN NOW() ELSE finished_at END
+            WHERE job_id = $1
+        """, p["job_id"], p["status"], p["total_chunks"], p["changed_chunks"], p["embedded_chunks"],
+            p["deleted_chunks"], p.get("error"), final)
+
+
+async def get_ingest_job(pool: asyncpg.Pool, job_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """A job's persisted progress (the latest job when `job_id` is None)."""
+    if job_id is None:
+        row = await pool.fetchrow(f"SELECT * FROM {JOBS_TABLE} ORDER BY job_id DESC LIMIT 1")
+    else:
+        row = await pool.fetchrow(f"SELECT * FROM {JOBS_TABLE} WHERE job_id = $1", job_id)
+    return dict(row) if row else None
+
+
+async def chunk_ingest_loop(ingestor: ChunkIngestor, interval_seconds: float) -> None:
+    """Background task: re-run ingestion every `interval_seconds` until cancelled."""
+    while True:
+        try:
+            progress = await ingestor.run()
+            if progress.get("embedded_chunks") or progress.get("deleted_chunks"):
+                logger.info(f"Chunk ingest: {progress}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Chunk ingest failed: {e}")
+        await asyncio.sleep(interval_seconds)
@@ -0,0 +1,82 @@
+import asyncio
+from typing import Dict, Any, Awaitable, Callable, Optional, Tuple
+
+
+async def gather_limited(
+    tasks: Dict[str, Callable[[], Awaitable[Any]]],
+    limit: int = 4,
+    timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Run independent coroutines concurrently with a concurrency cap and one overall deadline.
+    
+    Args:
+        tasks: Mapping of name -> zero-arg callable returning an awaitable.
+               Callables are only invoked once a slot is free, so each
+               query checks out its pool connection when it actually runs.
+        limit: Maximum number of tasks in flight at once
+        timeout: Overall deadline in seconds for the whole batch (None = no deadline)
+        
+    Returns:
+        Dict of name -> result, in the same order as `tasks`
+        
+    Raises:
+        asyncio.TimeoutError: If the batch does not finish before the deadline.
+        Exception: The first exception raised by any task.
+        
+        Either way, the other tasks are cancelled and awaited before this
+        returns, so none keeps holding a pool connection.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def _run(factory: Callable[[], Awaitable[Any]]) -> Any:
+        async with semaphore:
+            return await factory()
+
+    names = list(tasks.keys())
+    running = [asyncio.ensure_future(_run(tasks[name])) for name in names]
+    try:
+        results = await asyncio.wait_for(asyncio.gather(*running), timeout=timeout)
+    finally:
+        # gather does not cancel the siblings of a task that raised
+        pending = [task for task in running if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    return dict(zip(names, results))
+
+
+async def gather_settled(
+    tasks: Dict[str, Callable[[], Awaitable[Any]]],
+    limit: int = 4,
+    timeout: Optional[float] = None
+) -> Dict[str, Tuple[bool, Any]]:
+    """
+    Like gather_limited, but one failure never sinks the batch.
+    
+    Every task gets whatever is left of the shared deadline when it starts;
+    tasks that raise or run out of time are reported instead of propagated.
+    
+    Returns:
+        Dict of name -> (True, result) or (False, exception)
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout is not None else None
+
+    async def _run(factory: Callable[[], Awaitable[Any]]) -> Tuple[bool, Any]:
+        async with semaphore:
+            try:
+                if deadline is None:
+                    return True, await factory()
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                return True, await asyncio.wait_for(factory(), timeout=remaining)
+            except Exception as e:
+                return False, e
+
+    names = list(tasks.keys())
+    results = await asyncio.gather(*(_run(tasks[name]) for name in names))
+    return dict(zip(names, results))
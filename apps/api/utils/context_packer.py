@@ -0,0 +1,86 @@
+from typing import Any, List, Sequence, Set, Tuple
+
+from utils.embedding_cache import normalize_text
+from utils.tokens import estimate_tokens
+
+# (chunk_text, metadata, score) as returned by retrieval; higher score = more relevant
+ScoredChunk = Tuple[str, Any, float]
+
+
+def _shingles(text: str, size: int = 3) -> Set[Tuple[str, ...]]:
+    words = normalize_text(text).split()
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _jaccard(a: Set, b: Set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def dedupe_chunks(chunks: Sequence[ScoredChunk], threshold: float = 0.8) -> List[ScoredChunk]:
+    """
+    Drop near-duplicate chunks, keeping the higher-scored copy.
+
+    Two chunks are duplicates when the Jaccard similarity of their word
+    3-gram sets reaches `threshold`.
+    """
+    kept: List[ScoredChunk] = []
+    kept_shingles: List[Set] = []
+    for chunk in sorted(chunks, key=lambda c: c[2], reverse=True):
+        shingles = _shingles(chunk[0])
+        if all(_jaccard(shingles, other) < threshold for other in kept_shingles):
+            kept.append(chunk)
+            kept_shingles.append(shingles)
+    return kept
+
+
+def pack_chunks(
+    chunks: Sequence[ScoredChunk],
+    max_tokens: int,
+    dedupe_threshold: float = 0.8
+) -> Tuple[List[ScoredChunk], int]:
+    """
+    Pick the best chunks that fit in `max_tokens` of prompt context.
+
+    Chunks are deduplicated and taken in score order; one that does not fit
+    is skipped so smaller, lower-ranked chunks can still use the space. If
+    not even the best chunk fits, it is truncated to the budget.
+
+    Returns:
+        (packed chunks in score order, estimated tokens used)
+    """
+    packed: List[ScoredChunk] = []
+    used = 0
+    ranked = dedupe_chunks(chunks, dedupe_threshold)
+    for chunk in ranked:
+        cost = estimate_tokens(f"- {chunk[0]}") + 1
+        if used + cost <= max_tokens:
+            packed.append(chunk)
+            used += cost
+
+    if not packed and ranked and max_tokens > 0:
+        text, metadata, score = ranked[0]
+        # ~4 characters per token, trimmed until the estimate fits
+        limit = max_tokens * 4
+        while limit > 0 and estimate_tokens(f"- {text[:limit]}") + 1 > max_tokens:
+            limit = int(limit * 0.9)
+        packed.append((text[:limit], metadata, score))
+        used = estimate_tokens(f"- {text[:limit]}") + 1
+    return packed, used
+
+
+def pack_history(turns: Sequence[Tuple[str, str]], max_tokens: int, max_turns: int = 5) -> List[Tuple[str, str]]:
+    """Most recent (question, answer) turns that fit in `max_tokens`, oldest first."""
+    packed: List[Tuple[str, str]] = []
+    used = 0
+    for question, answer in reversed(list(turns)[-max_turns:]):
+        cost = estimate_tokens(f"Q: {question}\nA: {answer}") + 1
+        if used + cost > max_tokens:
+            break
+        packed.append((question, answer))
+        used += cost
+    packed.reverse()
+    return packed
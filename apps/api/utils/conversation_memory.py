@@ -0,0 +1,152 @@
+import asyncio
+import asyncpg
+import logging
+import os
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+from core.settings import settings
+from db.pool import get_pool
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Per-session conversation memory for the assistant.
+#
+# Each chat session keeps its last `max_turns` (question, answer) pairs,
+# loaded lazily from chat_messages the first time the session is seen in
+# this worker. Idle sessions age out and the least recently used ones are
+# evicted first, so memory stays flat however many sessions there are.
+# Optionally, turns that fall off the window are folded into a short
+# rolling summary by the LLM, in the background.
+
+Turn = Tuple[str, str]
+Summarizer = Callable[[str, List[Turn]], Awaitable[str]]
+
+
+class SessionMemory:
+    """Recent turns plus a rolling summary of older ones."""
+
+    def __init__(self, turns: Optional[List[Turn]] = None, summary: str = ""):
+        self.turns: List[Turn] = list(turns or [])
+        self.summary = summary
+
+
+_summary_client = None
+
+
+async def llm_summarize(summary: str, turns: List[Turn]) -> str:
+    """Fold `turns` into `summary` with a short LLM call."""
+    from openai import AsyncOpenAI
+
+    global _summary_client
+    if _summary_client is None:
+        _summary_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=1)
+
+    exchange = "\n".join(f"Q: {q}\nA: {a}" for q, a in turns)
+    response = await _summary_client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": "Maintain a running summary of a conversation about bootcamp analytics. Keep names, units, bootcamps and figures the user may refer back to. Reply with the updated summary only, under 80 words."},
+            {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\nNew exchange:\n{exchange}"}
+        ],
+        timeout=settings.llm_timeout_seconds
+    )
+    return response.choices[0].message.content.strip()
+
+
+class ConversationMemory:
+    """
+    Bounded store of SessionMemory keyed by chat_sessions.id.
+
+    Args:
+        max_sessions: Sessions kept in this worker (LRU beyond that)
+        max_turns: Turns kept verbatim per session
+        idle_ttl: Seconds a session may go unused before it is dropped
+        summarizer: Optional async (summary, dropped turns) -> summary
+        pool_getter: Pool used to lazily load chat_messages
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        max_turns: int = 5,
+        idle_ttl: float = 1800.0,
+        summarizer: Optional[Summarizer] = None,
+        pool_getter: Callable[[], asyncpg.Pool] = get_pool
+    ):
+        self.max_turns = max_turns
+        self.summarizer = summarizer
+        self._pool_getter = pool_getter
+        self._sessions = TTLCache(maxsize=max_sessions, ttl=idle_ttl)
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def context(self, session_id: Any) -> Tuple[str, List[Turn]]:
+        """(summary, recent turns oldest first) for a session; empty without a session."""
+        if session_id is None:
+            return "", []
+        memory = await self._get_or_load(session_id)
+        return memory.summary, list(memory.turns)
+
+    async def record(self, session_id: Any, question: str, answer: str) -> None:
+        """Append a finished turn, summarizing whatever falls out of the window."""
+        if session_id is None:
+            return
+        memory = await self._get_or_load(session_id)
+        memory.turns.append((question, answer))
+        overflow = memory.turns[:-self.max_turns] if len(memory.turns) > self.max_turns else []
+        if overflow:
+            memory.turns = memory.turns[-self.max_turns:]
+            if self.summarizer is not None:
+                task = asyncio.create_task(self._summarize(memory, overflow))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    def forget(self, session_id: Any) -> None:
+        self._sessions.pop(str(session_id))
+
+    async def _get_or_load(self, session_id: Any) -> SessionMemory:
+        key = str(session_id)
+        memory = self._sessions.get(key)
+        if memory is None:
+            memory = SessionMemory(await self._load_turns(session_id))
+        # (Re)setting refreshes the idle expiry and LRU position
+        self._sessions.set(key, memory)
+        return memory
+
+    async def _load_turns(self, session_id: Any) -> List[Turn]:
+        try:
+            rows = await self._pool_getter().fetch("""
+                SELECT role, content
+                FROM chat_messages
+                WHERE session_id = $1
+                ORDER BY created_at DESC
+                LIMIT $2
+            """, session_id, self.max_turns * 2 + 1)
+        except Exception as e:
+            logger.warning(f"Could not load chat history for session {session_id}: {e}")
+            return []
+
+        # Pair each user message with the assistant reply that follows it
+        turns: List[Turn] = []
+        pending_question = None
+        for row in reversed(rows):
+            if row["role"] == "user":
+                pending_question = row["content"]
+            elif row["role"] == "assistant" and pending_question is not None:
+                turns.append((pending_question, row["content"]))
+                pending_question = None
+        return turns[-self.max_turns:]
+
+    async def _summarize(self, memory: SessionMemory, dropped: List[Turn]) -> None:
+        try:
+            memory.summary = await self.summarizer(memory.summary, dropped)
+        except Exception as e:
+            logger.warning(f"Conversation summary update failed: {e}")
+
+
+conversation_memory = ConversationMemory(
+    max_sessions=settings.conversation_max_sessions,
+    max_turns=settings.conversation_max_turns,
+    idle_ttl=settings.conversation_idle_ttl_seconds,
+    summarizer=llm_summarize if settings.conversation_summary_enabled else None
+)
@@ -0,0 +1,160 @@
+import asyncpg
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+# Variables analysed, in matrix order
+CORRELATION_VARIABLES = ["attendance", "attention", "grade"]
+
+# Pairs reported in the response (keys match the original endpoint)
+CORRELATION_PAIRS = {
+    "attendance_attention": ("attendance", "attention"),
+    "attendance_grades": ("attendance", "grade"),
+    "attention_grades": ("attention", "grade"),
+}
+
+
+async def fetch_correlation_columns(
+    conn: asyncpg.Connection,
+    allowed_bootcamps: List[int],
+    date_start: Optional[str] = None,
+    date_end: Optional[str] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Fetch attendance, attention and bootcamp grade average per class sample as columns.
+
+    Grades are averaged once per bootcamp and joined by bootcamp_id, rather
+    than joining every sample to every student's grades. Arrays come back
+    from a single array_agg row instead of one record per sample.
+
+    Returns:
+        Dict of variable -> float64 array (NaN where grade is missing),
+        sorted by attendance
+    """
+    params: List[Any] = [allowed_bootcamps]
+    date_filter = ""
+    if date_start:
+        params.append(date_start)
+        date_filter += f" AND cs.date >= ${len(params)}"
+    if date_end:
+        params.append(date_end)
+        date_filter += f" AND cs.date <= ${len(params)}"
+
+    query = f"""
+        WITH bootcamp_grades AS (
+            SELECT s.bootcamp_id, AVG(g.score)::float8 as avg_grade
+            FROM grades g
+            JOIN students s ON g.student_id = s.student_id
+            WHERE s.bootcamp_id = ANY($1)
+            GROUP BY s.bootcamp_id
+        )
+        SELECT
+            array_agg(cs.attendance_pct::float8 ORDER BY cs.attendance_pct) as attendance,
+            array_agg(cs.avg_attention_rate::float8 ORDER BY cs.attendance_pct) as attention,
+            array_agg(bg.avg_grade ORDER BY cs.attendance_pct) as grade
+        FROM class_samples cs
+        LEFT JOIN bootcamp_grades bg ON bg.bootcamp_id = cs.bootcamp_id
+        WHERE cs.bootcamp_id = ANY($1) {date_filter}
+        AND cs.attendance_pct IS NOT NULL
+        AND cs.avg_attention_rate IS NOT NULL
+    """
+
+    row = await conn.fetchrow(query, *params)
+    return {
+        name: np.array(
+            [np.nan if v is None else v for v in (row[name] or [])] if row else [],
+            dtype=np.float64
+        )
+        for name in CORRELATION_VARIABLES
+    }
+
+
+def _rank(values: np.ndarray) -> np.ndarray:
+    """Average ranks (ties share the mean of their positions), like scipy's rankdata."""
+    order = np.argsort(values, kind="mergesort")
+    sorted_values = values[order]
+    ranks = np.empty(len(values), dtype=np.float64)
+
+    # Boundaries of runs of equal values
+    boundaries = np.flatnonzero(np.diff(sorted_values)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(values)]))
+    run_ranks = (starts + ends - 1) / 2.0 + 1
+    ranks[order] = np.repeat(run_ranks, ends - starts)
+    return ranks
+
+
+def _pearson(x: np.ndarray, y: np.ndarray) -> float:
+    if len(x) < 2:
+        return 0.0
+    x = x - x.mean()
+    y = y - y.mean()
+    denominator = np.sqrt((x * x).sum() * (y * y).sum())
+    return float((x * y).sum() / denominator) if denominator != 0 else 0.0
+
+
+def _fisher_interval(r: float, n: int, z_crit: float = 1.959964) -> Tuple[float, float]:
+    """Approximate 95% confidence interval for a correlation via Fisher's z."""
+    if n <= 3 or abs(r) >= 1:
+        return (r, r)
+    z = np.arctanh(r)
+    margin = z_crit / np.sqrt(n - 3)
+    return (float(np.tanh(z - margin)), float(np.tanh(z + margin)))
+
+
+def compute_correlations(columns: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """
+    Pearson and Spearman correlations with 95% CIs for every reported pair.
+
+    Pairs use complete cases only (rows where both values are present).
+    """
+    pearson: Dict[str, float] = {}
+    spearman: Dict[str, float] = {}
+    intervals: Dict[str, Dict[str, List[float]]] = {}
+    sample_sizes: Dict[str, int] = {}
+
+    for key, (a, b) in CORRELATION_PAIRS.items():
+        x, y = columns[a], columns[b]
+        mask = ~(np.isnan(x) | np.isnan(y))
+        x, y = x[mask], y[mask]
+        n = int(mask.sum())
+
+        r = _pearson(x, y)
+        rho = _pearson(_rank(x), _rank(y)) if n >= 2 else 0.0
+
+        pearson[key] = round(r, 3)
+        spearman[key] = round(rho, 3)
+        intervals[key] = {
+            "pearson": [round(v, 3) for v in _fisher_interval(r, n)],
+            "spearman": [round(v, 3) for v in _fisher_interval(rho, n)],
+        }
+        sample_sizes[key] = n
+
+    return {
+        "correlations": pearson,
+        "spearman": spearman,
+        "confidence_intervals": intervals,
+        "sample_sizes": sample_sizes,
+    }
+
+
+def downsample_scatter(columns: Dict[str, np.ndarray], max_points: int) -> List[Dict[str, float]]:
+    """
+    Pick at most `max_points` scatter points, evenly spaced over the
+    attendance-sorted samples so the full range stays represented.
+    """
+    total = len(columns["attendance"])
+    if total == 0 or max_points <= 0:
+        return []
+    if total > max_points:
+        indices = np.unique(np.linspace(0, total - 1, max_points).round().astype(int))
+    else:
+        indices = np.arange(total)
+
+    attendance = np.round(columns["attendance"][indices], 1)
+    attention = np.round(columns["attention"][indices], 1)
+    grade = np.round(np.nan_to_num(columns["grade"][indices], nan=0.0), 1)
+
+    return [
+        {"attendance": float(a), "attention": float(t), "grade": float(g)}
+        for a, t, g in zip(attendance, attention, grade)
+    ]
@@ -0,0 +1,98 @@
+import numpy as np
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from models.schemas import SeriesPoint
+
+
+def lttb_indices(x: Sequence[float], y: Sequence[float], max_points: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets: pick `max_points` indices that keep the visual shape.
+
+    The first and last points are always kept. The points in between are
+    split into equal buckets; from each bucket the point forming the largest
+    triangle with the previously kept point and the next bucket's average
+    is kept, which preserves peaks and troughs that plain striding drops.
+
+    Args:
+        x: Monotonic x values (time or position)
+        y: Values
+        max_points: Target number of points
+
+    Returns:
+        Sorted list of indices into x/y
+    """
+    n = len(y)
+    if max_points >= n or n <= 2:
+        return list(range(n))
+    if max_points < 3:
+        return [0, n - 1][:max(max_points, 1)]
+
+    xs = np.asarray(x, dtype=np.float64)
+    ys = np.asarray(y, dtype=np.float64)
+
+    # Bucket boundaries over the interior points 1..n-2
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    indices = [0]
+    previous = 0
+
+    for b in range(max_points - 2):
+        start, end = int(edges[b]), int(edges[b + 1])
+        if end <= start:
+            continue
+
+        # Average of the next bucket (or the last point for the final bucket)
+        if b + 2 < len(edges):
+            next_start, next_end = edges[b + 1], edges[b + 2]
+            next_x = xs[next_start:next_end].mean() if next_end > next_start else xs[-1]
+            next_y = ys[next_start:next_end].mean() if next_end > next_start else ys[-1]
+        else:
+            next_x, next_y = xs[-1], ys[-1]
+
+        px, py = xs[previous], ys[previous]
+        areas = np.abs(
+            (px - next_x) * (ys[start:end] - py) - (px - xs[start:end]) * (next_y - py)
+        )
+        previous = start + int(np.argmax(areas))
+        indices.append(previous)
+
+    indices.append(n - 1)
+    return indices
+
+
+def downsample_rows(
+    rows: List[Dict[str, Any]],
+    value_key: str,
+    max_points: Optional[int]
+) -> List[Dict[str, Any]]:
+    """
+    LTTB over chart rows, using row position as x and `value_key` as y.
+
+    Rows must already be in time order. Returns rows unchanged when no
+    budget is given or the series already fits.
+    """
+    if not max_points or len(rows) <= max_points:
+        return rows
+    values = [float(row.get(value_key) or 0) for row in rows]
+    keep = lttb_indices(range(len(rows)), values, max_points)
+    return [rows[i] for i in keep]
+
+
+def _timestamp(t: Any) -> float:
+    if isinstance(t, datetime):
+        return t.timestamp()
+    if isinstance(t, date):
+        return float(t.toordinal() * 86400)
+    return float(t)
+
+
+def downsample_series(points: List[SeriesPoint], max_points: Optional[int]) -> List[SeriesPoint]:
+    """LTTB over SeriesPoint lists, using each point's time as x."""
+    if not max_points or len(points) <= max_points:
+        return points
+    keep = lttb_indices(
+        [_timestamp(p.t) for p in points],
+        [p.v for p in points],
+        max_points
+    )
+    return [points[i] for i in keep]
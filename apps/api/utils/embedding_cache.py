@@ -0,0 +1,215 @@
+import asyncpg
+import hashlib
+import logging
+import re
+import unicodedata
+import numpy as np
+from typing import Callable, Dict, List, Optional, Sequence
+
+from core.settings import settings
+from db.pool import get_pool
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Two-tier cache for text embeddings.
+#
+# Keys are sha256(model + normalized text), so the same question typed with
+# different casing or spacing shares one entry and switching models never
+# returns a stale vector. The first tier is an in-process LRU; the second is
+# a Postgres table holding float32 blobs (1536 dims = 6 KB per vector) that
+# survives restarts and is shared by every worker.
+
+CACHE_TABLE = "embedding_cache"
+
+# Whether ensure_embedding_cache_table() succeeded in this process
+_persistent_ready = False
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Casefold, collapse whitespace and drop trailing ?/!/. so trivially different questions share a key."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _WHITESPACE.sub(" ", text).strip().rstrip("?!. ")
+
+
+def embedding_key(model: str, text: str) -> str:
+    """Cache key for `text` embedded with `model`."""
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode()).hexdigest()
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    vec = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class OpenAIEmbedder:
+    """Embeds batches of text through an AsyncOpenAI client."""
+
+    def __init__(self, client, model: str, timeout: Optional[float] = None):
+        self.client = client
+        self.model = model
+        self.timeout = timeout
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        response = await self.client.embeddings.create(
+            model=self.model,
+            input=texts,
+            timeout=self.timeout
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+
+class FakeEmbedder:
+    """
+    Deterministic offline embedder for tests and local development.
+
+    Each normalized text seeds its own random unit vector, so equal texts
+    always map to the same vector and no network access is needed.
+    """
+
+    def __init__(self, dim: int = 1536, model: str = "fake-embedding"):
+        self.dim = dim
+        self.model = model
+        self.calls = 0
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(normalize_text(text).encode()).digest()[:8], "little")
+            vectors.append(np.random.default_rng(seed).standard_normal(self.dim).tolist())
+        return vectors
+
+
+def build_embedder(client, model: str):
+    """Embedder selected by settings.embedding_backend ("openai" or "fake")."""
+    if settings.embedding_backend == "fake":
+        return FakeEmbedder()
+    return OpenAIEmbedder(client, model, settings.embedding_timeout_seconds)
+
+
+async def ensure_embedding_cache_table(pool: asyncpg.Pool) -> bool:
+    """Create the persistent embedding table if missing. Returns readiness."""
+    global _persistent_ready
+    try:
+        await pool.execute(f"""
+            CREATE TABLE IF NOT EXISTS {CACHE_TABLE} (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BYTEA NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        """)
+        _persistent_ready = True
+    except Exception as e:
+        logger.warning(f"Persistent embedding cache disabled: {e}")
+        _persistent_ready = False
+    return _persistent_ready
+
+
+class EmbeddingCache:
+    """
+    Memory LRU in front of an optional Postgres tier in front of an embedder.
+
+    Vectors are unit-normalized float32 arrays. Persistent-tier errors are
+    logged and the lookup falls through to the embedder.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        maxsize: int = 4096,
+        ttl: float = 86400.0,
+        persistent: bool = True,
+        pool_getter: Callable[[], asyncpg.Pool] = get_pool
+    ):
+        self.embedder = embedder
+        self.persistent = persistent
+        self._pool_getter = pool_getter
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    @property
+    def model(self) -> str:
+        return self.embedder.model
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters since startup."""
+        return {
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+        }
+
+    async def get(self, text: str) -> np.ndarray:
+        """Embedding for a single text."""
+        return (await self.get_many([text]))[0]
+
+    async def get_many(self, texts: List[str]) -> List[np.ndarray]:
+        """Embeddings for `texts`, in order. Only cache misses reach the embedder, in one batch."""
+        keys = [embedding_key(self.model, text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+
+        for key in keys:
+            if key not in found:
+                vec = self._memory.get(key)
+                if vec is not None:
+                    found[key] = vec
+                    self.memory_hits += 1
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self._persistent_enabled():
+            stored = await self._load(missing)
+            for key, vec in stored.items():
+                self._memory.set(key, vec)
+                found[key] = vec
+            self.persistent_hits += len(stored)
+            missing = [key for key in missing if key not in stored]
+
+        if missing:
+            first_text = {}
+            for key, text in zip(keys, texts):
+                first_text.setdefault(key, text)
+            vectors = await self.embedder.embed([first_text[key] for key in missing])
+            fresh = {key: _unit(vec) for key, vec in zip(missing, vectors)}
+            for key, vec in fresh.items():
+                self._memory.set(key, vec)
+            found.update(fresh)
+            self.misses += len(fresh)
+            if self._persistent_enabled():
+                await self._store(fresh)
+
+        return [found[key] for key in keys]
+
+    def _persistent_enabled(self) -> bool:
+        return self.persistent and _persistent_ready
+
+    async def _load(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        try:
+            rows = await self._pool_getter().fetch(
+                f"SELECT key, vector FROM {CACHE_TABLE} WHERE key = ANY($1::text[])",
+                keys
+            )
+        except Exception as e:
+            logger.error(f"Embedding cache read failed: {e}")
+            return {}
+        return {row["key"]: np.frombuffer(row["vector"], dtype=np.float32) for row in rows}
+
+    async def _store(self, vectors: Dict[str, np.ndarray]) -> None:
+        keys = list(vectors)
+        try:
+            await self._pool_getter().execute(f"""
+                INSERT INTO {CACHE_TABLE} (key, model, dim, vector)
+                SELECT k, $2, $3, v
+                FROM unnest($1::text[], $4::bytea[]) AS t(k, v)
+                ON CONFLICT (key) DO NOTHING
+            """, keys, self.model, len(vectors[keys[0]]), [vectors[k].tobytes() for k in keys])
+        except Exception as e:
+            logger.error(f"Embedding cache write failed: {e}")
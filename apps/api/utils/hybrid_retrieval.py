@@ -0,0 +1,197 @@
+import asyncpg
+import logging
+import math
+import re
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Building blocks for hybrid (lexical + vector) chunk retrieval.
+#
+# Names such as "Salma Hasan" or "Python Programming" are exact-match
+# lookups that embedding similarity alone often ranks poorly. Postgres
+# full-text search on chunk_text finds them; the two ranked lists are
+# merged with reciprocal rank fusion, which only looks at ranks, so the
+# unrelated score scales of ts_rank_cd and inner product never have to be
+# calibrated against each other. The fused candidates can then be
+# re-scored pair by pair (question, chunk) by a reranker.
+
+# Metadata keys that retrieval may filter on; each gets an expression index
+FILTERABLE_METADATA_KEYS = ("bootcamp_id", "student_id")
+
+# Only one worker builds the search indexes at a time (pg_try_advisory_lock key)
+_INDEX_LOCK_KEY = 74212
+
+_METADATA_KEY = re.compile(r"^[a-z_][a-z0-9_]*$")
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Small English stop list; Postgres drops its own when building the tsquery
+_STOPWORDS = frozenset("""
+    a about all an and any are as at be by can did do does for from had has have how
+    i in is it its me my of on or show tell that the their them there they this to
+    was we were what when where which who whom why will with you your
+""".split())
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60) -> Dict[Hashable, float]:
+    """
+    Fuse ranked lists of ids: score(id) = sum over lists of 1 / (k + rank).
+
+    Ranks start at 1. An id missing from a list contributes nothing for it.
+    """
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+def query_terms(text: str) -> List[str]:
+    """Lowercased content words of a question, in order."""
+    return [w for w in _WORD.findall(text.lower()) if len(w) > 1 and w not in _STOPWORDS]
+
+
+def lexical_tsquery(text: str) -> Optional[str]:
+    """
+    OR-tsquery over the question's content words, for to_tsquery().
+
+    Any word may match; ts_rank_cd then favours chunks that contain more of
+    them close together. None when nothing searchable is left.
+    """
+    terms = list(dict.fromkeys(query_terms(text)))
+    return " | ".join(terms) if terms else None
+
+
+def metadata_filter_sql(filters: Optional[Dict[str, Any]], first_param: int) -> Tuple[str, List[Any]]:
+    """
+    AND-ed WHERE conditions restricting chunks by metadata.
+
+    Args:
+        filters: metadata key -> allowed value or list of values; a key
+            mapped to an empty list matches nothing
+        first_param: Number of the first $n placeholder to use
+
+    Returns:
+        (" AND ..." SQL fragment or "", parameter values)
+    """
+    clauses: List[str] = []
+    params: List[Any] = []
+    for key, allowed in (filters or {}).items():
+        if not _METADATA_KEY.match(key):
+            raise ValueError(f"Invalid metadata filter key: {key!r}")
+        values = allowed if isinstance(allowed, (list, tuple, set, frozenset)) else [allowed]
+        params.append([str(v) for v in values])
+        clauses.append(f"(metadata::jsonb ->> '{key}') = ANY(${first_param + len(params) - 1}::text[])")
+    return "".join(f" AND {clause}" for clause in clauses), params
+
+
+class LexicalReranker:
+    """
+    Local stand-in for a cross-encoder: scores each (question, chunk) pair.
+
+    The score in [0, 1] mixes IDF-weighted coverage of the question's
+    content words (IDF over the candidate set, so a rare name outweighs
+    "grade") with how many adjacent question word pairs appear adjacent in
+    the chunk, which rewards full names and unit titles.
+    """
+
+    blocking = False
+
+    def score(self, question: str, texts: List[str]) -> List[float]:
+        terms = list(dict.fromkeys(query_terms(question)))
+        if not terms or not texts:
+            return [0.0] * len(texts)
+
+        docs = [_WORD.findall(text.lower()) for text in texts]
+        doc_sets = [set(words) for words in docs]
+        idf = {t: math.log(1 + len(docs) / (1 + sum(t in words for words in doc_sets))) for t in terms}
+        total_idf = sum(idf.values()) or 1.0
+
+        ordered = query_terms(question)
+        pairs = {(a, b) for a, b in zip(ordered, ordered[1:])}
+        scores = []
+        for words, word_set in zip(docs, doc_sets):
+            coverage = sum(idf[t] for t in terms if t in word_set) / total_idf
+            if pairs:
+                doc_pairs = set(zip(words, words[1:]))
+                phrase = len(pairs & doc_pairs) / len(pairs)
+                scores.append(0.6 * coverage + 0.4 * phrase)
+            else:
+                scores.append(coverage)
+        return scores
+
+
+class CrossEncoderReranker:
+    """sentence-transformers CrossEncoder, scores squashed to [0, 1]."""
+
+    blocking = True
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import CrossEncoder  # optional dependency
+
+        self.model = CrossEncoder(model_name)
+
+    def score(self, question: str, texts: List[str]) -> List[float]:
+        if not texts:
+            return []
+        logits = self.model.predict([(question, text) for text in texts])
+        return [1.0 / (1.0 + math.exp(-float(v))) for v in logits]
+
+
+def build_reranker(name: str, model_name: str = ""):
+    """Reranker selected by name ("none", "lexical" or "cross_encoder"); None for no reranking."""
+    if name == "lexical":
+        return LexicalReranker()
+    if name == "cross_encoder":
+        try:
+            return CrossEncoderReranker(model_name)
+        except Exception as e:
+            logger.warning(f"Cross-encoder reranker unavailable ({e}), using lexical reranker")
+            return LexicalReranker()
+    return None
+
+
+def rag_search_index_definitions(rag_table: str) -> Dict[str, str]:
+    """Index name -> `ON ...` clause of the full-text and metadata filter indexes."""
+    config = settings.rag_text_search_config
+    definitions = {
+        f"{rag_table}_chunk_text_fts_idx": f"ON {rag_table} USING GIN (to_tsvector('{config}', chunk_text))"
+    }
+    for key in FILTERABLE_METADATA_KEYS:
+        definitions[f"{rag_table}_meta_{key}_idx"] = f"ON {rag_table} ((metadata::jsonb ->> '{key}'))"
+    return definitions
+
+
+async def ensure_rag_search_indexes(pool: asyncpg.Pool, rag_table: str) -> bool:
+    """
+    Create the full-text and metadata filter indexes hybrid retrieval uses.
+
+    Built CONCURRENTLY so a large chunk table stays writable. A concurrent
+    build that failed or was cancelled leaves an INVALID index behind, which
+    `IF NOT EXISTS` would skip forever, so those are dropped and rebuilt.
+    Only one caller builds at a time; the others return straight away.
+    Returns readiness; retrieval still works without them, just slower.
+    """
+    async with pool.acquire() as conn:
+        if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", _INDEX_LOCK_KEY):
+            logger.info(f"RAG search indexes on {rag_table} are being built elsewhere")
+            return False
+        try:
+            for name, definition in rag_search_index_definitions(rag_table).items():
+                valid = await conn.fetchval(
+                    "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)", name
+                )
+                if valid:
+                    continue
+                if valid is not None:
+                    logger.warning(f"Rebuilding invalid index {name}")
+                    await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+                await conn.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+            return True
+        except Exception as e:
+            logger.warning(f"RAG search indexes unavailable on {rag_table}: {e}")
+            return False
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", _INDEX_LOCK_KEY)
@@ -0,0 +1,157 @@
+import asyncpg
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
+
+# Shared mapping CTE: one row per (instructor, bootcamp) assignment
+_ASSIGNMENTS_CTE = """
+    WITH assignments AS (
+        SELECT DISTINCT instructor_id, bootcamp_id
+        FROM unnest($1::text[], $2::int[]) AS m(instructor_id, bootcamp_id)
+    )
+"""
+
+PERFORMANCE_TIERS = [
+    (80, "Excellent"),
+    (65, "Good"),
+    (50, "Average"),
+]
+
+
+async def fetch_instructor_metrics(
+    conn: asyncpg.Connection,
+    assignments: List[Tuple[str, int]],
+    date_start: Optional[str] = None,
+    date_end: Optional[str] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch raw per-instructor aggregates in three grouped queries.
+
+    Args:
+        conn: Database connection
+        assignments: (instructor_id, bootcamp_id) pairs
+        date_start: Optional lower bound on class_samples.date
+        date_end: Optional upper bound on class_samples.date
+
+    Returns:
+        Dict of instructor_id -> {avg_attendance, avg_attention, avg_distraction,
+        total_sessions, unique_days, total_students, avg_grades, total_grades,
+        students_with_grades}. Instructors without data are absent.
+    """
+    instructor_keys = [str(instructor_id) for instructor_id, _ in assignments]
+    bootcamp_keys = [bootcamp_id for _, bootcamp_id in assignments]
+    metrics: Dict[str, Dict[str, Any]] = {}
+
+    if not assignments:
+        return metrics
+
+    class_params: List[Any] = [instructor_keys, bootcamp_keys]
+    date_filter = ""
+    if date_start:
+        class_params.append(date_start)
+        date_filter += f" AND cs.date >= ${len(class_params)}"
+    if date_end:
+        class_params.append(date_end)
+        date_filter += f" AND cs.date <= ${len(class_params)}"
+
+    class_query = _ASSIGNMENTS_CTE + f"""
+        SELECT
+            a.instructor_id,
+            AVG(cs.attendance_pct) as avg_attendance,
+            AVG(cs.avg_attention_rate) as avg_attention,
+            AVG(cs.avg_distraction_rate) as avg_distraction,
+            COUNT(*) as total_sessions,
+            COUNT(DISTINCT cs.date) as unique_days
+        FROM assignments a
+        JOIN class_samples cs ON cs.bootcamp_id = a.bootcamp_id
+        WHERE TRUE {date_filter}
+        GROUP BY a.instructor_id
+    """
+
+    students_query = _ASSIGNMENTS_CTE + """
+        SELECT
+            a.instructor_id,
+            COUNT(DISTINCT s.student_id) as total_students
+        FROM assignments a
+        JOIN students s ON s.bootcamp_id = a.bootcamp_id
+        GROUP BY a.instructor_id
+    """
+
+    grades_query = _ASSIGNMENTS_CTE + """
+        SELECT
+            a.instructor_id,
+            AVG(g.score) as avg_grades,
+            COUNT(*) as total_grades,
+            COUNT(DISTINCT g.student_id) as students_with_grades
+        FROM assignments a
+        JOIN students s ON s.bootcamp_id = a.bootcamp_id
+        JOIN grades g ON g.student_id = s.student_id
+        GROUP BY a.instructor_id
+    """
+
+    for query, params in (
+        (class_query, class_params),
+        (students_query, [instructor_keys, bootcamp_keys]),
+        (grades_query, [instructor_keys, bootcamp_keys]),
+    ):
+        for row in await conn.fetch(query, *params):
+            entry = metrics.setdefault(row["instructor_id"], {})
+            entry.update({key: value for key, value in row.items() if key != "instructor_id"})
+
+    return metrics
+
+
+def score_instructors(
+    instructor_ids: List[str],
+    metrics: Dict[str, Dict[str, Any]]
+) -> Dict[str, np.ndarray]:
+    """
+    Compute effectiveness, engagement and tier for all instructors at once.
+
+    Effectiveness weights attendance 30%, attention 40%, grades 30%.
+    Engagement is attention minus distraction (floored at 0), or plain
+    attention when no distraction is recorded.
+
+    Returns:
+        Dict of column name -> array aligned with `instructor_ids`
+    """
+    def column(name: str, dtype=float) -> np.ndarray:
+        return np.array(
+            [metrics.get(iid, {}).get(name) or 0 for iid in instructor_ids],
+            dtype=dtype
+        )
+
+    attendance = column("avg_attendance")
+    attention = column("avg_attention")
+    distraction = column("avg_distraction")
+    grades = column("avg_grades")
+
+    has_data = (attendance > 0) | (attention > 0) | (grades > 0)
+    effectiveness = np.where(
+        has_data,
+        attendance * 0.30 + attention * 0.40 + grades * 0.30,
+        0.0
+    )
+
+    engagement = np.where(
+        (attention > 0) & (distraction > 0),
+        np.maximum(0.0, attention - distraction),
+        np.where(attention > 0, attention, 0.0)
+    )
+
+    tier = np.select(
+        [effectiveness >= threshold for threshold, _ in PERFORMANCE_TIERS] + [effectiveness > 0],
+        [label for _, label in PERFORMANCE_TIERS] + ["Needs Improvement"],
+        default="No Data"
+    )
+
+    return {
+        "avg_attendance": attendance,
+        "avg_attention": attention,
+        "avg_distraction": distraction,
+        "avg_student_grades": grades,
+        "total_students": column("total_students", int),
+        "total_sessions": column("total_sessions", int),
+        "effectiveness_score": effectiveness,
+        "engagement_score": engagement,
+        "performance_tier": tier,
+    }
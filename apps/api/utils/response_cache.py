@@ -0,0 +1,185 @@
+import functools
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from core.settings import settings
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Response cache for dashboard endpoints.
+#
+# Keys combine the endpoint, the normalized filters, the resolved bootcamp
+# set and the current data version of each of those bootcamps. Bumping a
+# bootcamp's version (grades edited, instructors assigned or removed,
+# bootcamps created or edited, new class_samples folded in) makes every key
+# that covers it unreachable; stale entries then age out. With the memory
+# backend a bump only reaches the worker that made it.
+
+_VERSION_PREFIX = "classsight:data_version:"
+_RESPONSE_PREFIX = "classsight:response:"
+# Bumped alongside any bootcamp, for caches whose scope is "everything"
+_GLOBAL_VERSION = f"{_VERSION_PREFIX}all"
+
+
+class MemoryCacheBackend:
+    """In-process LRU backend. Versions are per worker."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._responses = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Any:
+        return self._responses.get(key)
+
+    async def set(self, key: str, value: Any) -> None:
+        self._responses.set(key, value)
+
+    async def get_versions(self, names: List[str]) -> List[int]:
+        return [self._versions.get(name, 0) for name in names]
+
+    async def bump_versions(self, names: List[str]) -> None:
+        for name in names:
+            self._versions[name] = self._versions.get(name, 0) + 1
+
+
+class RedisCacheBackend:
+    """Redis-compatible backend (Redis, Valkey, KeyDB...). Versions are shared by all workers."""
+
+    def __init__(self, url: str, ttl: float):
+        import redis.asyncio as redis  # optional dependency
+
+        self._client = redis.from_url(url)
+        self._ttl = int(ttl)
+
+    async def get(self, key: str) -> Any:
+        raw = await self._client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any) -> None:
+        # Encode the way FastAPI does for a response (Decimal -> number, models
+        # -> dicts), so a cache hit has the same JSON shape as a miss
+        await self._client.set(key, json.dumps(jsonable_encoder(value)), ex=self._ttl)
+
+    async def get_versions(self, names: List[str]) -> List[int]:
+        if not names:
+            return []
+        return [int(v or 0) for v in await self._client.mget(names)]
+
+    async def bump_versions(self, names: List[str]) -> None:
+        if not names:
+            return
+        async with self._client.pipeline(transaction=False) as pipe:
+            for name in names:
+                pipe.incr(name)
+            await pipe.execute()
+
+
+_backend = None
+
+
+def get_response_cache():
+    """Return the configured cache backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        if settings.response_cache_backend == "redis":
+            try:
+                _backend = RedisCacheBackend(
+                    settings.response_cache_url,
+                    settings.response_cache_ttl_seconds
+                )
+            except ImportError:
+                logger.warning("redis package not installed; using in-process response cache")
+        if _backend is None:
+            _backend = MemoryCacheBackend(
+                settings.response_cache_size,
+                settings.response_cache_ttl_seconds
+            )
+    return _backend
+
+
+def _version_names(bootcamp_ids: Iterable[int]) -> List[str]:
+    return [f"{_VERSION_PREFIX}{bid}" for bid in bootcamp_ids]
+
+
+async def get_data_versions(bootcamp_ids: List[int]) -> List[int]:
+    """Current data version per bootcamp (0 if never bumped)."""
+    return await get_response_cache().get_versions(_version_names(bootcamp_ids))
+
+
+async def get_global_data_version() -> int:
+    """Version that changes whenever any bootcamp's data changes."""
+    return (await get_response_cache().get_versions([_GLOBAL_VERSION]))[0]
+
+
+async def bump_data_version(bootcamp_ids: Iterable[int]) -> None:
+    """Invalidate cached responses covering any of these bootcamps."""
+    bootcamp_ids = sorted(set(bootcamp_ids))
+    if not bootcamp_ids:
+        return
+    try:
+        await get_response_cache().bump_versions(_version_names(bootcamp_ids) + [_GLOBAL_VERSION])
+    except Exception as e:
+        logger.error(f"Failed to bump data version for bootcamps {bootcamp_ids}: {e}")
+
+
+def make_cache_key(endpoint: str, filters: BaseModel, bootcamp_ids: List[int], versions: List[int]) -> str:
+    """Stable key from endpoint, normalized filters, bootcamp set and versions."""
+    normalized = filters.model_dump()
+    # The resolved bootcamp set already captures the requested IDs
+    normalized.pop("bootcamp_ids", None)
+    payload = json.dumps(
+        {
+            "endpoint": endpoint,
+            "filters": normalized,
+            "bootcamps": list(zip(bootcamp_ids, versions)),
+        },
+        sort_keys=True,
+        default=str
+    )
+    return _RESPONSE_PREFIX + hashlib.sha1(payload.encode()).hexdigest()
+
+
+def cache_response(endpoint: str) -> Callable:
+    """
+    Decorator for dashboard POST handlers taking `filters` and `scope` kwargs.
+
+    Place it under the @router decorator. Errors (including HTTPException)
+    are never cached, and cache backend failures fall through to the handler.
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            filters = kwargs.get("filters")
+            scope = kwargs.get("scope")
+            if not settings.response_cache_enabled or filters is None or scope is None:
+                return await func(*args, **kwargs)
+
+            backend = get_response_cache()
+            key = None
+            try:
+                bootcamp_ids = sorted(set(scope.restrict(filters.bootcamp_ids)))
+                versions = await get_data_versions(bootcamp_ids)
+                key = make_cache_key(endpoint, filters, bootcamp_ids, versions)
+                cached = await backend.get(key)
+                if cached is not None:
+                    return cached
+            except Exception as e:
+                logger.error(f"Response cache lookup failed for {endpoint}: {e}")
+
+            result = await func(*args, **kwargs)
+
+            if key is not None:
+                try:
+                    await backend.set(key, result)
+                except Exception as e:
+                    logger.error(f"Response cache store failed for {endpoint}: {e}")
+            return result
+
+        return wrapper
+    return decorator
@@ -0,0 +1,278 @@
+import asyncio
+import asyncpg
+import hashlib
+import json
+import logging
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from db.pool import get_pool, get_readonly_pool
+from utils.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Schema snapshot for the SQL assistant prompt.
+#
+# One pg_catalog query fingerprints every table: a hash of its columns and
+# foreign keys (the structure), plus relfilenode, which changes when a table
+# is rewritten or truncated. Only tables whose fingerprint moved are
+# re-described and re-sampled. Descriptions are persisted to Postgres so a
+# fresh worker starts warm and only checks fingerprints.
+
+SNAPSHOT_TABLE = "schema_snapshots"
+
+_FINGERPRINT_QUERY = """
+    SELECT
+        c.relname AS table_name,
+        c.relfilenode::text AS relfilenode,
+        md5(string_agg(
+            a.attname || ':' || format_type(a.atttypid, a.atttypmod) || ':' || a.attnotnull::text,
+            ',' ORDER BY a.attnum
+        )) AS columns_hash,
+        md5(COALESCE((
+            SELECT string_agg(pg_get_constraintdef(con.oid), ',' ORDER BY con.conname)
+            FROM pg_constraint con
+            WHERE con.conrelid = c.oid AND con.contype = 'f'
+        ), '')) AS fk_hash
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    WHERE n.nspname = 'public' AND c.relname = ANY($1::text[])
+    GROUP BY c.oid, c.relname, c.relfilenode
+    ORDER BY c.relname
+"""
+
+# Shorter spellings of common Postgres types for the compact prompt schema
+_TYPE_ABBREVIATIONS = [
+    (re.compile(r"^character varying"), "varchar"),
+    (re.compile(r"^character\b"), "char"),
+    (re.compile(r"^timestamp(\(\d+\))? without time zone"), "timestamp"),
+    (re.compile(r"^timestamp(\(\d+\))? with time zone"), "timestamptz"),
+    (re.compile(r"^time(\(\d+\))? without time zone"), "time"),
+    (re.compile(r"^double precision"), "float8"),
+    (re.compile(r"^integer"), "int"),
+    (re.compile(r"^boolean"), "bool"),
+]
+
+
+def _short_type(data_type: str) -> str:
+    for pattern, short in _TYPE_ABBREVIATIONS:
+        if pattern.match(data_type):
+            return pattern.sub(short, data_type)
+    return data_type
+
+
+def _truncate(value: Any, limit: int = 40) -> Any:
+    if isinstance(value, str) and len(value) > limit:
+        return value[:limit] + "..."
+    return value
+
+
+class SchemaSnapshotService:
+    """
+    Per-table schema descriptions that refresh only when a table changes.
+
+    Args:
+        tables: Tables to describe
+        sample_rows: Sample rows kept per table
+        check_interval: Seconds between fingerprint checks in this process
+        read_pool_getter: Pool for catalog and sample reads
+        write_pool_getter: Pool for persisting descriptions
+    """
+
+    def __init__(
+        self,
+        tables: List[str],
+        sample_rows: int = 10,
+        check_interval: float = 60.0,
+        read_pool_getter: Callable[[], asyncpg.Pool] = get_readonly_pool,
+        write_pool_getter: Callable[[], asyncpg.Pool] = get_pool
+    ):
+        self.tables = tables
+        self.sample_rows = sample_rows
+        self.check_interval = check_interval
+        self._read_pool_getter = read_pool_getter
+        self._write_pool_getter = write_pool_getter
+        # table -> {"fingerprint", "structure", "columns", "fks", "samples"}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._checked_at = 0.0
+        self._loaded_persisted = False
+        self._lock = asyncio.Lock()
+        self.rebuilt_tables = 0
+
+    async def refresh(self, force: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Re-describe tables whose fingerprint changed (all of them if `force`)."""
+        if not force and self._entries and time.monotonic() - self._checked_at < self.check_interval:
+            return self._entries
+
+        async with self._lock:
+            if not force and self._entries and time.monotonic() - self._checked_at < self.check_interval:
+                return self._entries
+
+            if not self._loaded_persisted:
+                self._entries = await self._load_persisted()
+                self._loaded_persisted = True
+
+            async with self._read_pool_getter().acquire() as conn:
+                current = {
+                    row["table_name"]: row
+                    for row in await conn.fetch(_FINGERPRINT_QUERY, self.tables)
+                }
+                changed: Dict[str, Dict[str, Any]] = {}
+                for table, row in current.items():
+                    structure = f"{row['columns_hash']}:{row['fk_hash']}"
+                    fingerprint = f"{structure}:{row['relfilenode']}"
+                    entry = self._entries.get(table)
+                    if force or entry is None or entry["fingerprint"] != fingerprint:
+                        entry = await self._describe(conn, table)
+                        entry["fingerprint"] = fingerprint
+                        entry["structure"] = structure
+                        changed[table] = entry
+
+            entries = {table: changed.get(table) or self._entries[table] for table in current}
+            self._entries = entries
+            self._checked_at = time.monotonic()
+            if changed:
+                self.rebuilt_tables += len(changed)
+                logger.info(f"Schema snapshot rebuilt for {sorted(changed)}")
+                await self._persist(changed)
+            return entries
+
+    async def structure_fingerprint(self) -> str:
+        """Hash of every table's columns and FKs (ignores data rewrites)."""
+        entries = await self.refresh()
+        payload = "\n".join(f"{table}:{entries[table]['structure']}" for table in sorted(entries))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def _describe(self, conn: asyncpg.Connection, table: str) -> Dict[str, Any]:
+        columns = await conn.fetch("""
+            select a.attname as column_name,
+                   format_type(a.atttypid, a.atttypmod) as data_type,
+                   not a.attnotnull as nullable
+            from pg_attribute a
+            where a.attrelid = ('public.' || quote_ident($1))::regclass
+              and a.attnum > 0 and not a.attisdropped
+            order by a.attnum;
+        """, table)
+        fks = await conn.fetch("""
+            select
+              kcu.column_name,
+              ccu.table_name as fk_table,
+              ccu.column_name as fk_column
+            from information_schema.table_constraints tc
+            join information_schema.key_column_usage kcu
+              on tc.constraint_name = kcu.constraint_name
+             and tc.table_schema = kcu.table_schema
+            join information_schema.constraint_column_usage ccu
+              on ccu.constraint_name = tc.constraint_name
+             and ccu.table_schema = tc.table_schema
+            where tc.table_schema='public'
+              and tc.table_name=$1
+              and tc.constraint_type='FOREIGN KEY';
+        """, table)
+        samples = await conn.fetch(f'SELECT * FROM "{table}" LIMIT $1;', self.sample_rows)
+        return {
+            "columns": [[c["column_name"], c["data_type"], c["nullable"]] for c in columns],
+            "fks": [[f["column_name"], f["fk_table"], f["fk_column"]] for f in fks],
+            # Round-trip through JSON so persisted and fresh entries look the same
+            "samples": json.loads(json.dumps([dict(r) for r in samples], default=str)),
+        }
+
+    async def _load_persisted(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            rows = await self._write_pool_getter().fetch(
+                f"SELECT table_name, entry FROM {SNAPSHOT_TABLE} WHERE table_name = ANY($1::text[])",
+                self.tables
+            )
+        except Exception as e:
+            logger.warning(f"Persisted schema snapshot unavailable: {e}")
+            return {}
+        return {row["table_name"]: json.loads(row["entry"]) for row in rows}
+
+    async def _persist(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        try:
+            await self._write_pool_getter().executemany(f"""
+                INSERT INTO {SNAPSHOT_TABLE} (table_name, entry, updated_at)
+                VALUES ($1, $2::jsonb, NOW())
+                ON CONFLICT (table_name) DO UPDATE
+                SET entry = EXCLUDED.entry, updated_at = EXCLUDED.updated_at
+            """, [(table, json.dumps(entry)) for table, entry in entries.items()])
+        except Exception as e:
+            logger.warning(f"Failed to persist schema snapshot: {e}")
+
+    async def render(self, sample_rows: Optional[int] = None, force: bool = False) -> str:
+        """Full snapshot text: columns, FKs and sample rows per table."""
+        entries = await self.refresh(force)
+        parts = []
+        for table in sorted(entries):
+            entry = entries[table]
+            col_str = ", ".join(f"{c} {dt}{' NULL' if n else ''}" for c, dt, n in entry["columns"])
+            fk_str = "; ".join(f"{col} -> {fk_t}.{fk_c}" for col, fk_t, fk_c in entry["fks"]) or "None"
+            samples = entry["samples"][:sample_rows] if sample_rows is not None else entry["samples"]
+            parts.append(
+                f"TABLE {table}\n  COLUMNS: {col_str}\n  FKs: {fk_str}\n  SAMPLES: {json.dumps(samples, default=str)}"
+            )
+        return "\n\n".join(parts)
+
+    async def render_budgeted(self, max_tokens: int, question: str = "", include_samples: bool = True) -> str:
+        """
+        Compact snapshot that fits in `max_tokens`.
+
+        Tables mentioned in the question come first. Every table gets one
+        line of columns and FKs while the budget lasts; whatever is left is
+        spent on sample rows (long values truncated), one row per table per
+        round, unless `include_samples` is False.
+        """
+        entries = await self.refresh()
+        words = set(re.findall(r"[a-z_]+", question.lower()))
+
+        def relevance(table: str) -> int:
+            names = {table, table.rstrip("s")} | {c[0] for c in entries[table]["columns"]}
+            return -len(names & words)
+
+        tables = sorted(entries, key=lambda t: (relevance(t), t))
+        lines: Dict[str, List[str]] = {}
+        used = 0
+        for table in tables:
+            entry = entries[table]
+            cols = ", ".join(f"{c} {_short_type(dt)}" for c, dt, _ in entry["columns"])
+            line = f"{table}({cols})"
+            if entry["fks"]:
+                line += " FK " + ", ".join(f"{col}->{fk_t}.{fk_c}" for col, fk_t, fk_c in entry["fks"])
+            cost = estimate_tokens(line) + 1
+            if used + cost > max_tokens:
+                break
+            lines[table] = [line]
+            used += cost
+
+        sample_rounds = max((len(entries[t]["samples"]) for t in lines), default=0) if include_samples else 0
+        for i in range(sample_rounds):
+            for table in lines:
+                samples = entries[table]["samples"]
+                if i >= len(samples):
+                    continue
+                row = json.dumps({k: _truncate(v) for k, v in samples[i].items()}, default=str)
+                text = f"  e.g. {row}"
+                cost = estimate_tokens(text) + 1
+                if used + cost <= max_tokens:
+                    lines[table].append(text)
+                    used += cost
+
+        return "\n".join(line for table in lines for line in lines[table])
+
+
+async def ensure_schema_snapshot_table(pool: asyncpg.Pool) -> bool:
+    """Create the persisted snapshot table if missing. Returns readiness."""
+    try:
+        await pool.execute(f"""
+            CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} (
+                table_name TEXT PRIMARY KEY,
+                entry JSONB NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        """)
+        return True
+    except Exception as e:
+        logger.warning(f"Schema snapshot persistence disabled: {e}")
+        return False
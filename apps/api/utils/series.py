@@ -0,0 +1,69 @@
+import asyncpg
+from datetime import date
+from typing import Dict, List
+
+from models.schemas import SeriesPoint
+from utils.dates import granularity_to_sql_bucket
+
+# Series name -> class_samples column averaged per bucket.
+# Capacity utilisation is currently derived from attendance_pct.
+SERIES_COLUMNS = {
+    "attention": "avg_attention_rate",
+    "attendance": "attendance_pct",
+    "capacity": "attendance_pct",
+    "distraction": "avg_distraction_rate",
+}
+
+
+async def get_combined_series(
+    pool: asyncpg.Pool,
+    bootcamp_filter: List[int],
+    start_date: date,
+    end_date: date,
+    granularity: str
+) -> Dict[str, List[SeriesPoint]]:
+    """
+    Compute every dashboard time series in a single grouped scan of class_samples.
+    
+    Args:
+        pool: Database pool
+        bootcamp_filter: Bootcamp IDs to include (empty = all)
+        start_date: Inclusive start date
+        end_date: Inclusive end date
+        granularity: '30m', 'hour', 'day', 'week'
+        
+    Returns:
+        Dict of series name (see SERIES_COLUMNS) -> list of SeriesPoint
+    """
+    bucket = granularity_to_sql_bucket(granularity)
+    bootcamp_condition = ""
+    params = [start_date, end_date]
+    
+    if bootcamp_filter:
+        bootcamp_condition = f"AND bootcamp_id = ANY(${len(params) + 1})"
+        params.append(bootcamp_filter)
+    
+    # Each distinct column is aggregated once, even if several series share it
+    columns = sorted(set(SERIES_COLUMNS.values()))
+    aggregates = ",\n            ".join(f"AVG({col}) as {col}" for col in columns)
+    
+    query = f"""
+        SELECT 
+            DATE_TRUNC('{bucket}', bucket_at) as bucket,
+            {aggregates}
+        FROM class_samples 
+        WHERE date BETWEEN $1 AND $2 {bootcamp_condition}
+        GROUP BY bucket
+        ORDER BY bucket
+    """
+    
+    rows = await pool.fetch(query, *params)
+    
+    return {
+        name: [
+            SeriesPoint(t=row['bucket'], v=round(float(row[col]), 2))
+            for row in rows
+            if row[col] is not None
+        ]
+        for name, col in SERIES_COLUMNS.items()
+    }
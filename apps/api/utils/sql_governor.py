@@ -0,0 +1,98 @@
+import re
+import statistics
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+# Cost guard for LLM-generated SQL.
+#
+# Every generated statement is EXPLAINed before it runs. A plan whose
+# estimated cost or row count is over the limit first gets its outer LIMIT
+# lowered to the row cap (or is wrapped in one), which lets the planner
+# stop early; if the re-planned cost is still over the limit the query is
+# rejected and never reaches the shared database. Per-query estimates and
+# actuals are kept in a bounded window for the stats endpoint.
+
+_TRAILING_LIMIT = re.compile(r"\bLIMIT\s+(\d+)\s*;?\s*$", re.IGNORECASE)
+
+
+class QueryRejected(ValueError):
+    """A generated query whose plan is over the cost limit."""
+
+
+def cap_limit(sql: str, max_rows: int) -> str:
+    """SQL returning at most `max_rows` rows: lower the outer LIMIT, or wrap the query in one."""
+    sql = sql.strip().rstrip(";")
+    match = _TRAILING_LIMIT.search(sql)
+    if match:
+        if int(match.group(1)) <= max_rows:
+            return sql
+        return sql[:match.start()] + f"LIMIT {max_rows}"
+    return f"SELECT * FROM (\n{sql}\n) AS governed LIMIT {max_rows}"
+
+
+def plan_summary(plan: Any) -> Dict[str, float]:
+    """Total cost and estimated rows of the top node of EXPLAIN (FORMAT JSON) output."""
+    top = plan[0]["Plan"]
+    return {"cost": float(top["Total Cost"]), "rows": float(top["Plan Rows"])}
+
+
+class SqlCostStats:
+    """Recent generated-query records (bounded) plus lifetime counters."""
+
+    def __init__(self, maxsize: int = 500):
+        self._records: Deque[Dict[str, Any]] = deque(maxlen=max(1, maxsize))
+        self.queries = 0
+        self.rejected = 0
+        self.rewritten = 0
+        self.truncated = 0
+
+    def record(
+        self,
+        estimated_cost: Optional[float],
+        estimated_rows: Optional[float],
+        rows: int = 0,
+        elapsed_ms: float = 0.0,
+        rewritten: bool = False,
+        truncated: bool = False,
+        rejected: bool = False
+    ) -> None:
+        self.queries += 1
+        self.rejected += rejected
+        self.rewritten += rewritten
+        self.truncated += truncated
+        self._records.append({
+            "at": time.time(),
+            "estimated_cost": estimated_cost,
+            "estimated_rows": estimated_rows,
+            "rows": rows,
+            "elapsed_ms": round(elapsed_ms, 2),
+            "rewritten": rewritten,
+            "truncated": truncated,
+            "rejected": rejected,
+        })
+
+    def snapshot(self, recent: int = 20) -> Dict[str, Any]:
+        records = list(self._records)
+        executed = [r for r in records if not r["rejected"]]
+        costs = sorted(r["estimated_cost"] for r in records if r["estimated_cost"] is not None)
+        elapsed = sorted(r["elapsed_ms"] for r in executed)
+        return {
+            "queries": self.queries,
+            "rejected": self.rejected,
+            "rewritten": self.rewritten,
+            "truncated": self.truncated,
+            "window": len(records),
+            "estimated_cost_p50": _percentile(costs, 0.5),
+            "estimated_cost_p95": _percentile(costs, 0.95),
+            "elapsed_ms_p50": _percentile(elapsed, 0.5),
+            "elapsed_ms_p95": _percentile(elapsed, 0.95),
+            "mean_rows": statistics.mean(r["rows"] for r in executed) if executed else None,
+            "recent": records[-recent:],
+        }
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(q * len(values)))]
@@ -0,0 +1,208 @@
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.settings import settings
+from db.pool import get_readonly_pool
+from utils.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Question -> SQL plan cache for the SQL assistant.
+#
+# Known entity names (students, units, bootcamps) are lifted out of the
+# question, leaving a template such as "average grade of {student} in
+# {unit}". The first time a template is answered, the literals holding
+# those names in the generated SQL are swapped for $n placeholders. Later
+# questions with the same shape bind their own names and run that SQL as
+# a prepared statement, without asking the LLM to write it again.
+# Plans are tied to a schema fingerprint and dropped when it changes.
+
+# entity kind -> (table, column) whose values are recognised in questions
+ENTITY_SOURCES = {
+    "student": ("students", "full_name"),
+    "unit": ("units", "unit_title"),
+    "bootcamp": ("bootcamps", "bootcamp_name"),
+}
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_TOKEN = re.compile(r"\S+")
+
+
+class EntityCatalog:
+    """Entity names indexed by first word, reloaded every `ttl` seconds."""
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._loaded_at = 0.0
+        # first word -> [(name words, kind, canonical value)], longest first
+        self._by_first_word: Dict[str, List[Tuple[List[str], str, str]]] = {}
+
+    async def ensure_loaded(self) -> None:
+        if self._by_first_word and time.monotonic() - self._loaded_at < self.ttl:
+            return
+
+        index: Dict[str, List[Tuple[List[str], str, str]]] = {}
+        async with get_readonly_pool().acquire() as conn:
+            for kind, (table, column) in ENTITY_SOURCES.items():
+                try:
+                    rows = await conn.fetch(f"SELECT DISTINCT {column} AS value FROM {table} WHERE {column} IS NOT NULL")
+                except Exception as e:
+                    logger.warning(f"Plan cache cannot load {kind} names from {table}.{column}: {e}")
+                    continue
+                for row in rows:
+                    words = normalize_text(str(row["value"])).split()
+                    if words:
+                        index.setdefault(words[0], []).append((words, kind, str(row["value"])))
+
+        for candidates in index.values():
+            candidates.sort(key=lambda c: len(c[0]), reverse=True)
+        self._by_first_word = index
+        self._loaded_at = time.monotonic()
+
+    def templatize(self, question: str) -> Tuple[str, List[Tuple[str, str]]]:
+        """
+        Replace known entity names with {kind} placeholders.
+
+        Returns:
+            (template, [(kind, canonical value), ...] in order of appearance)
+        """
+        words = [w.strip(",;:!?\"()") for w in _TOKEN.findall(normalize_text(question))]
+        out: List[str] = []
+        params: List[Tuple[str, str]] = []
+        counts: Dict[str, int] = {}
+        i = 0
+        while i < len(words):
+            match = None
+            for name_words, kind, value in self._by_first_word.get(words[i], []):
+                if words[i:i + len(name_words)] == name_words:
+                    match = (len(name_words), kind, value)
+                    break
+            if match is None:
+                out.append(words[i])
+                i += 1
+                continue
+            length, kind, value = match
+            counts[kind] = counts.get(kind, 0) + 1
+            out.append(f"{{{kind}}}" if counts[kind] == 1 else f"{{{kind}_{counts[kind]}}}")
+            params.append((kind, value))
+            i += length
+        return " ".join(out), params
+
+
+class SqlPlan:
+    """A parameterized SELECT for one question template, with usage stats."""
+
+    def __init__(self, sql: str, binds: List[Tuple[int, str, str]], schema_fingerprint: str):
+        self.sql = sql
+        # one (question param index, prefix, suffix) per $n, in order
+        self.binds = binds
+        self.schema_fingerprint = schema_fingerprint
+        self.successes = 0
+        self.failures = 0
+        self.last_used = time.time()
+
+    def bind(self, params: List[Tuple[str, str]]) -> List[str]:
+        return [prefix + params[index][1] + suffix for index, prefix, suffix in self.binds]
+
+    def record(self, ok: bool) -> None:
+        if ok:
+            self.successes += 1
+        else:
+            self.failures += 1
+        self.last_used = time.time()
+
+    @property
+    def healthy(self) -> bool:
+        return self.failures < settings.sql_plan_max_failures and self.failures <= self.successes
+
+
+def parameterize_sql(sql: str, params: List[Tuple[str, str]]) -> Optional[Tuple[str, List[Tuple[int, str, str]]]]:
+    """
+    Swap string literals that contain a question entity for $n placeholders.
+
+    Returns None unless every entity ended up as a parameter, since a
+    plan that hard-codes one of them would answer later questions wrongly.
+    """
+    if "$" in sql or not params:
+        return None
+
+    binds: List[Tuple[int, str, str]] = []
+    covered = set()
+
+    def replace(match: "re.Match") -> str:
+        literal = match.group(0)[1:-1].replace("''", "'")
+        folded = literal.casefold()
+        for index, (_, value) in enumerate(params):
+            pos = folded.find(value.casefold())
+            if pos >= 0:
+                binds.append((index, literal[:pos], literal[pos + len(value):]))
+                covered.add(index)
+                return f"${len(binds)}"
+        return match.group(0)
+
+    templated = _LITERAL.sub(replace, sql)
+    if len(covered) != len(params):
+        return None
+    return templated, binds
+
+
+class SqlPlanCache:
+    """Bounded LRU of template -> SqlPlan. Not shared across workers."""
+
+    def __init__(self, maxsize: int = 512, entity_ttl: float = 300.0):
+        self.maxsize = max(1, maxsize)
+        self.entities = EntityCatalog(ttl=entity_ttl)
+        self._plans: "OrderedDict[str, SqlPlan]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def templatize(self, question: str) -> Tuple[str, List[Tuple[str, str]]]:
+        await self.entities.ensure_loaded()
+        return self.entities.templatize(question)
+
+    def get(self, template: str, schema_fingerprint: str) -> Optional[SqlPlan]:
+        plan = self._plans.get(template)
+        if plan is not None and plan.schema_fingerprint != schema_fingerprint:
+            # Schema changed under every plan built against the old one
+            self._plans.clear()
+            plan = None
+        if plan is None:
+            self.misses += 1
+            return None
+        self._plans.move_to_end(template)
+        self.hits += 1
+        return plan
+
+    def learn(self, template: str, params: List[Tuple[str, str]], sql: str, schema_fingerprint: str) -> Optional[SqlPlan]:
+        """Cache `sql` (already validated and run successfully) for this template, if it can be parameterized."""
+        parameterized = parameterize_sql(sql, params)
+        if parameterized is None:
+            return None
+        plan = SqlPlan(parameterized[0], parameterized[1], schema_fingerprint)
+        plan.record(True)
+        self._plans[template] = plan
+        self._plans.move_to_end(template)
+        while len(self._plans) > self.maxsize:
+            self._plans.popitem(last=False)
+        return plan
+
+    def report_failure(self, template: str, plan: SqlPlan) -> None:
+        plan.record(False)
+        if not plan.healthy and self._plans.get(template) is plan:
+            del self._plans[template]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "plans": len(self._plans),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+plan_cache = SqlPlanCache(
+    maxsize=settings.sql_plan_cache_size,
+    entity_ttl=settings.sql_plan_entity_refresh_seconds
+)
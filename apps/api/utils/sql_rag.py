@@ -1,92 +1,55 @@
+import asyncio
+import logging
 import os
 import re
 import json
-import psycopg2
+import time
 from dotenv import load_dotenv
-from openai import OpenAI
-from typing import Dict, Any, List
+from openai import AsyncOpenAI
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional, Tuple
+
+from core.settings import settings
+from db.pool import get_readonly_pool
+from utils.conversation_memory import conversation_memory
+from utils.schema_snapshot import SchemaSnapshotService
+from utils.sql_governor import QueryRejected, SqlCostStats, cap_limit, plan_summary
+from utils.sql_plan_cache import plan_cache
 
 load_dotenv()
-DB_URL = os.getenv("DATABASE_URL")
 OPENAI_KEY = os.getenv("OPENAI_API_KEY")
 
-if not DB_URL or not OPENAI_KEY:
-    raise ValueError("DATABASE_URL or OPENAI_API_KEY not loaded from .env")
+if not OPENAI_KEY:
+    raise ValueError("OPENAI_API_KEY not loaded from .env")
 
-client = OpenAI(api_key=OPENAI_KEY)
+client = AsyncOpenAI(api_key=OPENAI_KEY, max_retries=1)
 openai_model = 'gpt-4o-mini'
 
+logger = logging.getLogger(__name__)
+
 ########################################################
 # 1) Get schema
 ########################################################
 
-_SCHEMA_CACHE = None  # global cache
-
-def get_schema_snapshot(max_sample_rows: int = 10, force_refresh: bool = False) -> str:
-    global _SCHEMA_CACHE
-
-    # If _SCHEMA_CACHE already holds the schema AND force_refresh is not set to True, the cached schema is
-    # immediately returned and the database query is skipped.
-    if _SCHEMA_CACHE is not None and not force_refresh:
-        return _SCHEMA_CACHE
-
-    with psycopg2.connect(DB_URL) as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                select table_name
-                from information_schema.tables
-                where table_schema='public'
-                  and table_name in ('students','units','grades','attendance','bootcamps','assessments',
-                  'grades_summary', 'classroom_synthetic_data_filtered')
-                order by table_name;
-            """)
-            tables = [r[0] for r in cur.fetchall()]
-
-            snapshot_parts = []
-
-            for t in tables:
-                # columns
-                cur.execute("""
-                    select column_name, data_type, is_nullable
-                    from information_schema.columns
-                    where table_schema='public' and table_name=%s
-                    order by ordinal_position;
-                """, (t,))
-                cols = cur.fetchall()
-                col_str = ", ".join([f"{c} {dt}{' NULL' if n=='YES' else ''}" for c, dt, n in cols])
-
-                # foreign keys
-                cur.execute("""
-                    select
-                      kcu.column_name,
-                      ccu.table_name as fk_table,
-                      ccu.column_name as fk_column
-                    from information_schema.table_constraints tc
-                    join information_schema.key_column_usage kcu
-                      on tc.constraint_name = kcu.constraint_name
-                     and tc.table_schema = kcu.table_schema
-                    join information_schema.constraint_column_usage ccu
-                      on ccu.constraint_name = tc.constraint_name
-                     and ccu.table_schema = tc.table_schema
-                    where tc.table_schema='public'
-                      and tc.table_name=%s
-                      and tc.constraint_type='FOREIGN KEY';
-                """, (t,))
-                fks = cur.fetchall()
-                fk_str = "; ".join([f"{col} -> {fk_t}.{fk_c}" for col, fk_t, fk_c in fks]) or "None"
-
-                # sample rows
-                cur.execute(f'SELECT * FROM "{t}" LIMIT %s;', (max_sample_rows,))
-                rows = cur.fetchall()
-                headers = [desc[0] for desc in cur.description]
-                sample_json = [dict(zip(headers, r)) for r in rows]
-
-                snapshot_parts.append(
-                    f"TABLE {t}\n  COLUMNS: {col_str}\n  FKs: {fk_str}\n  SAMPLES: {json.dumps(sample_json, default=str)}"
-                )
-
-            _SCHEMA_CACHE = "\n\n".join(snapshot_parts)
-            return _SCHEMA_CACHE
+# Tables the assistant may query
+SCHEMA_TABLES = ['students', 'units', 'grades', 'attendance', 'bootcamps', 'assessments',
+                 'grades_summary', 'classroom_synthetic_data_filtered']
+
+# Rebuilds only tables whose catalog fingerprint changed; persisted so workers start warm
+schema_service = SchemaSnapshotService(
+    SCHEMA_TABLES,
+    sample_rows=10,
+    check_interval=settings.schema_check_interval_seconds
+)
+
+
+async def get_schema_snapshot(max_sample_rows: int = 10, force_refresh: bool = False) -> str:
+    """Full schema text (columns, FKs, sample rows) for the assistant tables."""
+    return await schema_service.render(max_sample_rows, force_refresh)
+
+
+async def get_schema_fingerprint() -> str:
+    """Hash of the assistant tables' columns and FKs; changes whenever their schema does."""
+    return await schema_service.structure_fingerprint()
 
 ########################################################
 # 2) SQL generation by LLM
@@ -104,20 +67,43 @@ SQL_SYSTEM_INSTRUCTIONS = """You are a careful SQL writer.
 - When asked for average attendance, give percentages.
 """
 
-def generate_select_sql(question: str, schema_snapshot: str) -> str:
-    resp = client.chat.completions.create(
+async def generate_select_sql(question: str, schema_snapshot: str) -> str:
+    resp = await client.chat.completions.create(
         model=openai_model,
         messages=[
             {"role": "system", "content": SQL_SYSTEM_INSTRUCTIONS},
             {"role": "user", "content": f"Schema:\n{schema_snapshot}\n\nQuestion:\n{question}"}
-        ]
+        ],
+        timeout=settings.llm_timeout_seconds
     )
 
-    sql = resp.choices[0].message.content.strip()
+    return _strip_fences(resp.choices[0].message.content)
 
+
+def _strip_fences(sql: str) -> str:
     # Strip code fences if model ever adds them
-    sql = re.sub(r"^```(?:sql)?|```$", "", sql.strip(), flags=re.IGNORECASE|re.MULTILINE).strip()
-    return sql
+    return re.sub(r"^```(?:sql)?|```$", "", sql.strip(), flags=re.IGNORECASE|re.MULTILINE).strip()
+
+
+async def generate_sql_candidates(question: str, schema_snapshot: str, n: int) -> List[str]:
+    """
+    Up to `n` distinct candidate SELECTs for a question.
+
+    One request with `n` sampled completions: the schema prompt is sent and
+    billed once, and all candidates arrive together.
+    """
+    resp = await client.chat.completions.create(
+        model=openai_model,
+        messages=[
+            {"role": "system", "content": SQL_SYSTEM_INSTRUCTIONS},
+            {"role": "user", "content": f"Schema:\n{schema_snapshot}\n\nQuestion:\n{question}"}
+        ],
+        n=n,
+        temperature=settings.sql_rag_candidate_temperature,
+        timeout=settings.llm_timeout_seconds
+    )
+    candidates = [_strip_fences(choice.message.content or "") for choice in resp.choices]
+    return list(dict.fromkeys(sql for sql in candidates if sql))
 
 ########################################################
 # 3) SQL sanitizer
@@ -141,42 +127,256 @@ def sanitize_sql(sql: str) -> str:
     return sql
 
 ########################################################
-# 4) Execute SQL (read-only)
+# 4) Bootcamp scope
 ########################################################
 
-def run_readonly_sql(sql: str) -> List[Dict[str, Any]]:
-    with psycopg2.connect(DB_URL) as conn:
-        with conn.cursor() as cur:
-            # read-only + timeout
-            cur.execute("SET LOCAL statement_timeout = 5000;")  # 5s
-            cur.execute("START TRANSACTION READ ONLY;")
+# How a row is tied to bootcamps, by the first of these columns its table has;
+# {p} is the $n placeholder bound to the allowed bootcamp IDs
+_SCOPE_PREDICATES = [
+    ("bootcamp_id", "bootcamp_id = ANY(${p}::int[])"),
+    ("student_id", "student_id IN (SELECT student_id FROM public.students WHERE bootcamp_id = ANY(${p}::int[]))"),
+    ("unit_id", "unit_id IN (SELECT unit_id FROM public.units WHERE bootcamp_id = ANY(${p}::int[]))"),
+]
+
+# Functions (and keywords followed by "(") scoped queries may use. Anything
+# else is rejected: functions such as query_to_xml, table_to_xml,
+# cursor_to_xml or dblink run SQL built at runtime, which neither the CTE
+# shadowing nor the reference checks below can see.
+_ALLOWED_CALLS = frozenset("""
+    all and any array as between by case cube distinct else except exists filter from group
+    grouping having ilike in intersect is join lateral like limit not offset on or over rollup
+    row select sets some then union using values when where with within
+    bigint bool boolean char character date decimal float int integer interval numeric text
+    time timestamp varchar
+    avg bool_and bool_or corr count covar_pop covar_samp every max min mode
+    percentile_cont percentile_disc regr_avgx regr_avgy regr_count regr_intercept regr_r2
+    regr_slope stddev stddev_pop stddev_samp sum var_pop var_samp variance
+    cume_dist dense_rank first_value lag last_value lead nth_value ntile percent_rank rank
+    row_number
+    abs cbrt ceil ceiling div exp floor ln log log10 mod power round sign sqrt trunc width_bucket
+    btrim concat concat_ws initcap left length lower lpad ltrim position replace right rpad
+    rtrim split_part strpos substr substring trim upper
+    age date_part date_trunc extract justify_days justify_hours make_date make_interval
+    to_char to_date to_number to_timestamp
+    array_agg array_length cardinality string_agg unnest
+    cast coalesce generate_series greatest least nullif
+""".split())
+
+# Postgres lexical tokens, enough to tell code from literals and comments.
+# Block comments (which nest) and dollar quoting are deliberately missing:
+# generated queries do not need them, and text the scanner cannot place is
+# rejected rather than guessed at.
+_SQL_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>--[^\n]*)
+  | (?P<escape_string>[Ee]'(?:[^'\\]|\\.|'')*')
+  | (?P<string>[BbNnXx]?'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<param>\$\d+)
+  | (?P<other>[^\sA-Za-z_'"$/-]+|/(?!\*)|-(?!-))
+""", re.VERBOSE | re.DOTALL)
+
+
+def _called_names(sql: str) -> List[str]:
+    """Lowercased names written directly before "(" in a query, outside literals and comments."""
+    if re.search(r"[Uu]&[\'\"]", sql):
+        raise ValueError("Unicode-escaped identifiers and strings are not allowed.")
+    names: List[str] = []
+    previous = None
+    pos = 0
+    while pos < len(sql):
+        match = _SQL_TOKEN.match(sql, pos)
+        if match is None:
+            raise ValueError(f"Unsupported SQL syntax near: {sql[pos:pos + 20]!r}")
+        pos = match.end()
+        kind = match.lastgroup
+        if kind in ("space", "comment"):
+            continue
+        if kind == "other" and match.group().startswith("(") and previous is not None:
+            names.append(previous)
+        if kind == "ident":
+            previous = match.group().lower()
+        elif kind == "quoted":
+            previous = match.group()[1:-1].replace('""', '"').lower()
+        else:
+            previous = None
+    return names
+
+
+def check_scoped_calls(sql: str) -> None:
+    """Reject a generated query that calls anything outside _ALLOWED_CALLS."""
+    disallowed = sorted(set(_called_names(sql)) - _ALLOWED_CALLS)
+    if disallowed:
+        raise ValueError(f"Function(s) not allowed in assistant queries: {', '.join(disallowed)}.")
+
+
+async def scope_sql(conn, sql: str, param: int) -> str:
+    """
+    Restrict a generated SELECT to the bootcamps bound to ${param}.
+
+    Every assistant table that can be tied to a bootcamp is shadowed by a
+    CTE of the same name holding only in-scope rows. Run the result with
+    search_path set to pg_catalog: unqualified names then resolve only to
+    those CTEs, so tables that cannot be scoped are simply not found.
+    Schema-qualified names would bypass the CTEs and are rejected, as are
+    calls outside an allowlist (see check_scoped_calls), since a function
+    that runs dynamic SQL could name any table at runtime.
+    """
+    check_scoped_calls(sql)
+    schemas = [row["nspname"] for row in await conn.fetch("SELECT nspname FROM pg_namespace")]
+    qualified = re.compile(
+        r'"?\b(?:' + "|".join(re.escape(name) for name in schemas) + r')\b"?\s*\.',
+        re.IGNORECASE
+    )
+    if qualified.search(sql) or re.search(r"\bpg_\w+\b(?!\s*\()", sql, re.IGNORECASE):
+        raise ValueError("Schema-qualified and system table references are not allowed.")
+
+    entries = await schema_service.refresh()
+    ctes = []
+    for table in sorted(entries):
+        columns = {column[0] for column in entries[table]["columns"]}
+        for column, predicate in _SCOPE_PREDICATES:
+            if column in columns:
+                ctes.append(f'{table} AS (SELECT * FROM public."{table}" WHERE {predicate.format(p=param)})')
+                break
+    if not ctes:
+        raise ValueError("No assistant tables can be scoped to bootcamps.")
+    return "WITH " + ",\n".join(ctes) + "\n" + sql
 
-            cur.execute(sql)
-            if cur.description is None:
-                return []
+########################################################
+# 5) Execute SQL (read-only)
+########################################################
 
-            cols = [d[0] for d in cur.description]
-            rows = [dict(zip(cols, r)) for r in cur.fetchall()]
-            cur.execute("COMMIT;")
-            return rows
+async def _prepare_statement(
+    conn,
+    sql: str,
+    params: Optional[List[Any]],
+    bootcamp_ids: Optional[List[int]]
+) -> Tuple[str, List[Any]]:
+    """Inside an open read-only transaction: set the timeout, apply bootcamp scope, return (sql, params) to run."""
+    params = list(params or [])
+    sql = sql.strip().rstrip(";")
+    # read-only + timeout
+    await conn.execute(f"SET LOCAL statement_timeout = {int(settings.sql_rag_statement_timeout_ms)}")
+    if bootcamp_ids is not None:
+        sql = await scope_sql(conn, sql, len(params) + 1)
+        params.append(list(bootcamp_ids))
+        await conn.execute("SET LOCAL search_path TO pg_catalog")
+    return sql, params
+
+
+# Per-query plan estimates and actuals, for /assistant/sql-stats
+sql_cost_stats = SqlCostStats(settings.sql_rag_stats_size)
+
+
+async def _explain(conn, sql: str, params: List[Any]) -> Dict[str, float]:
+    plan = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {sql}", *params)
+    return plan_summary(json.loads(plan) if isinstance(plan, str) else plan)
+
+async def explain_sql(
+    sql: str,
+    params: Optional[List[Any]] = None,
+    bootcamp_ids: Optional[List[int]] = None
+) -> Dict[str, Any]:
+    """
+    Planner estimates for a SELECT without running it.
+
+    Raises whatever the planner raises (unknown column, bad syntax), which
+    makes this a cheap validity check too. Returns the top plan node's
+    total cost and estimated rows.
+    """
+    async with get_readonly_pool().acquire() as conn:
+        async with conn.transaction(readonly=True):
+            sql, params = await _prepare_statement(conn, sql, params, bootcamp_ids)
+            return await _explain(conn, sql, params)
+
+async def _govern(conn, sql: str, params: List[Any], max_rows: int) -> Tuple[str, Dict[str, float], bool]:
+    """
+    Check a prepared statement's plan against the cost and row limits.
+
+    A plan over either limit is re-planned with its outer LIMIT capped at
+    `max_rows`; if that is still over the cost limit the query is rejected.
+    Returns (SQL to run, plan estimate, whether it was rewritten).
+    """
+    estimate = await _explain(conn, sql, params)
+    rewritten = False
+    if estimate["cost"] > settings.sql_rag_max_plan_cost or estimate["rows"] > settings.sql_rag_max_plan_rows:
+        capped = cap_limit(sql, max_rows)
+        if capped != sql.strip().rstrip(";"):
+            sql, rewritten = capped, True
+            estimate = await _explain(conn, sql, params)
+    if estimate["cost"] > settings.sql_rag_max_plan_cost:
+        sql_cost_stats.record(estimate["cost"], estimate["rows"], rewritten=rewritten, rejected=True)
+        raise QueryRejected(
+            f"Query plan too expensive (estimated cost {estimate['cost']:.0f}, "
+            f"limit {settings.sql_rag_max_plan_cost:.0f}). Filter on indexed columns, "
+            f"aggregate earlier, or avoid cross joins and scans of large tables."
+        )
+    return sql, estimate, rewritten
+
+async def run_readonly_sql(
+    sql: str,
+    max_rows: Optional[int] = None,
+    params: Optional[List[Any]] = None,
+    bootcamp_ids: Optional[List[int]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Run a generated SELECT on the read-only pool.
+
+    The statement runs in a READ ONLY transaction with a statement timeout.
+    With the governor enabled it is EXPLAINed first: expensive plans are
+    capped or rejected (QueryRejected) before they touch the database.
+    Rows are streamed through a cursor and cut off at `max_rows` or
+    `sql_rag_max_result_bytes`, whatever LIMIT the model wrote. `params`
+    bind $n placeholders (cached plans), making this a prepared statement.
+    With `bootcamp_ids`, the query only sees rows of those bootcamps (None
+    means no restriction).
+    """
+    max_rows = max_rows or settings.sql_rag_max_rows
+    estimate: Dict[str, Optional[float]] = {"cost": None, "rows": None}
+    rewritten = truncated = False
+    rows: List[Dict[str, Any]] = []
+    size = 0
+    async with get_readonly_pool().acquire() as conn:
+        async with conn.transaction(readonly=True):
+            sql, params = await _prepare_statement(conn, sql, params, bootcamp_ids)
+            if settings.sql_rag_governor_enabled:
+                sql, estimate, rewritten = await _govern(conn, sql, params, max_rows)
+            started = time.perf_counter()
+            async for record in conn.cursor(sql, *params, prefetch=min(max_rows + 1, 100)):
+                row = dict(record)
+                size += sum(len(str(v)) for v in row.values())
+                if len(rows) >= max_rows or size > settings.sql_rag_max_result_bytes:
+                    truncated = True
+                    break
+                rows.append(row)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+    sql_cost_stats.record(
+        estimate["cost"], estimate["rows"], rows=len(rows), elapsed_ms=elapsed_ms,
+        rewritten=rewritten, truncated=truncated
+    )
+    return rows
 
 ########################################################
-# 5) Let the model compute/explain
+# 6) Let the model compute/explain
 ########################################################
 
-# Global variable to store Q&A history
-conversation_history = []  # Stores (question, answer) tuples
+NO_ROWS_ANSWER = "No relevant data found. Please check that you entered the correct student name, bootcamp, or unit title."
 
-def llm_answer(question: str, sql: str, rows: List[Dict[str, Any]]) -> str:
-    """Ask the model to compute any aggregates from the rows and answer concisely."""
-    # If no results, return early
-    if not rows:
-        return f"No relevant data found. Please check that you entered the correct student name, bootcamp, or unit title."
 
-    # Build context from the last 5 Q&A pairs
-    recent_context = "\n".join([
-        f"Q: {q}\nA: {a}" for q, a in conversation_history[-5:]
-    ])
+async def _answer_messages(
+    question: str,
+    sql: str,
+    rows: List[Dict[str, Any]],
+    session_id: Any = None
+) -> List[Dict[str, str]]:
+    """Chat messages asking the model to answer from the rows, with the session's recent Q&A as memory."""
+    # Build context from the session summary and recent Q&A pairs
+    summary, history = await conversation_memory.context(session_id)
+    recent_context = "\n".join(
+        ([f"Earlier: {summary}"] if summary else []) + [f"Q: {q}\nA: {a}" for q, a in history]
+    )
 
     # Prepare prompt with memory + current data
     prompt = (
@@ -185,34 +385,111 @@ def llm_answer(question: str, sql: str, rows: List[Dict[str, Any]]) -> str:
         f"SQL: {sql}\n"
         f"Rows: {json.dumps(rows, default=str)}"
     )
+    return [
+        {"role": "system", "content": "You are a precise analyst. Use the provided rows and context to answer succinctly. Always check whether the student has taken the unit or is enrolled in the bootcamp. Do not mention the SQL query in your final output."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+async def llm_answer(question: str, sql: str, rows: List[Dict[str, Any]], session_id: Any = None) -> str:
+    """Ask the model to compute any aggregates from the rows and answer concisely."""
+    # If no results, return early
+    if not rows:
+        return NO_ROWS_ANSWER
 
     # Call the LLM with added context
-    resp = client.chat.completions.create(
+    resp = await client.chat.completions.create(
         model=openai_model,
-        messages=[
-            {"role": "system", "content": "You are a precise analyst. Use the provided rows and context to answer succinctly. Always check whether the student has taken the unit or is enrolled in the bootcamp. Do not mention the SQL query in your final output."},
-            {"role": "user", "content": prompt}
-        ]
+        messages=await _answer_messages(question, sql, rows, session_id),
+        timeout=settings.llm_timeout_seconds
     )
 
     # Extract the answer from the LLM response
-    answer = resp.choices[0].message.content.strip()
+    return resp.choices[0].message.content.strip()
 
-    # Save this Q&A in memory
-    conversation_history.append((question, answer))
 
-    return answer
+async def stream_llm_answer(
+    question: str,
+    sql: str,
+    rows: List[Dict[str, Any]],
+    session_id: Any = None
+) -> AsyncIterator[str]:
+    """Like llm_answer, yielding answer text as the model produces it."""
+    if not rows:
+        yield NO_ROWS_ANSWER
+        return
+
+    stream = await client.chat.completions.create(
+        model=openai_model,
+        messages=await _answer_messages(question, sql, rows, session_id),
+        timeout=settings.llm_timeout_seconds,
+        stream=True
+    )
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
 
 ########################################################
-# 6) Orchestrator
+# 7) Orchestrator
 ########################################################
 
-def answer_question(question: str) -> Dict[str, Any]:
-    # --- schema ---
-    schema = get_schema_snapshot(max_sample_rows=10)
+def _query_sources(sql: str, rows: List[Dict[str, Any]], **flags: Any) -> List[Dict[str, Any]]:
+    if not rows:
+        return []
+    return [{
+        "type": "database_query",
+        "sql": sql,
+        "row_count": len(rows),
+        "tables_used": _extract_table_names(sql),
+        **flags
+    }]
+
+
+async def resolve_question_sql(question: str, bootcamp_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    Find and run SQL for a question: cached plan, else generation with one repair retry.
+
+    `bootcamp_ids` limits every query to those bootcamps' rows (None: no
+    limit). Returns sql, rows and sources. If no SQL could be run, the
+    result also has an "answer" explaining the failure, and is final.
+    """
+    # --- cached plan for this question shape ---
+    template, entities, fingerprint = None, [], None
+    if settings.sql_plan_cache_enabled:
+        try:
+            template, entities = await plan_cache.templatize(question)
+            fingerprint = await get_schema_fingerprint()
+        except Exception as e:
+            logger.warning(f"SQL plan cache unavailable: {e}")
+            template = None
+
+    plan = plan_cache.get(template, fingerprint) if template and entities else None
+    if plan is not None:
+        try:
+            rows = await run_readonly_sql(plan.sql, params=plan.bind(entities), bootcamp_ids=bootcamp_ids)
+            plan.record(True)
+            return {"sql": plan.sql, "rows": rows, "sources": _query_sources(plan.sql, rows, cached_plan=True)}
+        except Exception as e:
+            logger.warning(f"Cached SQL plan failed, regenerating: {e}")
+            plan_cache.report_failure(template, plan)
+
+    # --- schema (compact, within the prompt budget) ---
+    # Sample rows span every bootcamp, so scoped callers get the structure only
+    schema = await schema_service.render_budgeted(
+        settings.sql_schema_token_budget, question, include_samples=bootcamp_ids is None
+    )
+
+    def learn(rows: List[Dict[str, Any]], sql: str) -> None:
+        if rows and template and entities:
+            plan_cache.learn(template, entities, sql, fingerprint)
+
+    # --- parallel candidates: cheapest valid plan runs, the others are fallbacks ---
+    if settings.sql_rag_candidates > 1:
+        return await _resolve_from_candidates(question, schema, bootcamp_ids, learn)
 
     # --- sql generation ---
-    sql = generate_select_sql(question, schema)
+    sql = await generate_select_sql(question, schema)
 
     try:
         sql_safe = sanitize_sql(sql)
@@ -221,73 +498,124 @@ def answer_question(question: str) -> Dict[str, Any]:
             "answer": f"Failed to validate SQL. Error: {e}",
             "sql": sql,
             "sources": [],
-            "rows": []
+            "rows": [],
+            "error": str(e)
         }
 
     # --- DB exec ---
     try:
-        rows = run_readonly_sql(sql_safe)
-
-        # --- LLM answer ---
-        ans = llm_answer(question, sql_safe, rows)
-        
-        # Format sources for API response
-        sources = []
-        if rows:
-            sources.append({
-                "type": "database_query",
-                "sql": sql_safe,
-                "row_count": len(rows),
-                "tables_used": _extract_table_names(sql_safe)
-            })
+        rows = await run_readonly_sql(sql_safe, bootcamp_ids=bootcamp_ids)
+        learn(rows, sql_safe)
+        return {"sql": sql_safe, "rows": rows, "sources": _query_sources(sql_safe, rows)}
 
+    except Exception as e:
+        return await _repair_and_run(question, schema, sql, str(e), bootcamp_ids, learn)
+
+
+async def _repair_and_run(
+    question: str,
+    schema: str,
+    failed_sql: str,
+    err: str,
+    bootcamp_ids: Optional[List[int]],
+    learn: Callable[[List[Dict[str, Any]], str], None]
+) -> Dict[str, Any]:
+    """Auto-retry once by sharing the error with the model to refine SQL."""
+    try:
+        resp = await client.chat.completions.create(
+            model=openai_model,
+            messages=[
+                {"role": "system", "content": SQL_SYSTEM_INSTRUCTIONS},
+                {"role": "user",
+                 "content": f"Schema:\n{schema}\n\nQuestion:\n{question}\n\nThe previous SQL failed with error:\n{err}\n\nRevise and return ONLY a safe single SELECT with LIMIT."}
+            ],
+            timeout=settings.llm_timeout_seconds
+        )
+        sql2 = sanitize_sql(resp.choices[0].message.content.strip())
+        rows2 = await run_readonly_sql(sql2, bootcamp_ids=bootcamp_ids)
+        learn(rows2, sql2)
+        return {"sql": sql2, "rows": rows2, "sources": _query_sources(sql2, rows2, retry=True)}
+    except Exception as retry_err:
+        return _error_result(failed_sql, retry_err)
+
+
+async def _check_candidate(sql: str, bootcamp_ids: Optional[List[int]]) -> Dict[str, Any]:
+    """Sanitized SQL with its planner cost, or the reason it was rejected."""
+    try:
+        sql_safe = sanitize_sql(sql)
+        return {"sql": sql_safe, **await explain_sql(sql_safe, bootcamp_ids=bootcamp_ids)}
+    except Exception as e:
+        return {"sql": sql, "error": str(e)}
+
+
+async def _resolve_from_candidates(
+    question: str,
+    schema: str,
+    bootcamp_ids: Optional[List[int]],
+    learn: Callable[[List[Dict[str, Any]], str], None]
+) -> Dict[str, Any]:
+    """
+    Generate several SQL candidates at once, EXPLAIN them concurrently and
+    run the cheapest valid one; if it fails at run time the next cheapest is
+    already validated. The repair round trip is only needed when every
+    candidate fails.
+    """
+    candidates = await generate_sql_candidates(question, schema, settings.sql_rag_candidates)
+    checked = await asyncio.gather(*(_check_candidate(sql, bootcamp_ids) for sql in candidates))
+    valid = sorted((c for c in checked if "error" not in c), key=lambda c: c["cost"])
+    failed = [c for c in checked if "error" in c]
+
+    for candidate in valid:
+        try:
+            rows = await run_readonly_sql(candidate["sql"], bootcamp_ids=bootcamp_ids)
+        except Exception as e:
+            failed.append({"sql": candidate["sql"], "error": str(e)})
+            continue
+        learn(rows, candidate["sql"])
         return {
-            "answer": ans,
-            "sql": sql_safe,
-            "sources": sources,
-            "rows": rows[:10]  # Limit rows in response for performance
+            "sql": candidate["sql"],
+            "rows": rows,
+            "sources": _query_sources(
+                candidate["sql"], rows, candidates=len(candidates), estimated_cost=candidate["cost"]
+            )
         }
 
+    if not failed:
+        return _error_result("", ValueError("No SQL candidates were generated."))
+    return await _repair_and_run(question, schema, failed[0]["sql"], failed[0]["error"], bootcamp_ids, learn)
+
+
+def _error_result(sql: str, error: Exception) -> Dict[str, Any]:
+    return {
+        "answer": f"I encountered an error while processing your query. Please try rephrasing your question or contact support if the issue persists.",
+        "sql": sql,
+        "sources": [],
+        "rows": [],
+        "error": str(error)
+    }
+
+
+async def answer_question(
+    question: str,
+    session_id: Any = None,
+    bootcamp_ids: Optional[List[int]] = None
+) -> Dict[str, Any]:
+    resolved = await resolve_question_sql(question, bootcamp_ids)
+    if "answer" in resolved:
+        return resolved
+
+    # --- LLM answer ---
+    try:
+        ans = await llm_answer(question, resolved["sql"], resolved["rows"], session_id)
     except Exception as e:
-        # Auto-retry once by sharing the error with the model to refine SQL
-        err = str(e)
-        try:
-            resp = client.chat.completions.create(
-                model=openai_model,
-                messages=[
-                    {"role": "system", "content": SQL_SYSTEM_INSTRUCTIONS},
-                    {"role": "user",
-                     "content": f"Schema:\n{schema}\n\nQuestion:\n{question}\n\nThe previous SQL failed with error:\n{err}\n\nRevise and return ONLY a safe single SELECT with LIMIT."}
-                ]
-            )
-            sql2 = sanitize_sql(resp.choices[0].message.content.strip())
-            rows2 = run_readonly_sql(sql2)
-            ans2 = llm_answer(question, sql2, rows2)
-
-            sources = []
-            if rows2:
-                sources.append({
-                    "type": "database_query",
-                    "sql": sql2,
-                    "row_count": len(rows2),
-                    "tables_used": _extract_table_names(sql2),
-                    "retry": True
-                })
-
-            return {
-                "answer": ans2,
-                "sql": sql2,
-                "sources": sources,
-                "rows": rows2[:10]
-            }
-        except Exception as retry_err:
-            return {
-                "answer": f"I encountered an error while processing your query. Please try rephrasing your question or contact support if the issue persists.",
-                "sql": sql,
-                "sources": [],
-                "rows": [],
-                "error": str(retry_err)
-            }
+        return _error_result(resolved["sql"], e)
+
+    return {
+        "answer": ans,
+        "sql": resolved["sql"],
+        "sources": resolved["sources"],
+        "rows": resolved["rows"][:10]  # Limit rows in response for performance
+    }
 
 
 def _extract_table_names(sql: str) -> List[str]:
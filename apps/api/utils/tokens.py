@@ -0,0 +1,17 @@
+import math
+
+try:
+    import tiktoken  # optional dependency
+
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count for prompt budgeting: exact with tiktoken installed, else ~4 characters per token."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
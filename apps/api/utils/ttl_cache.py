@@ -0,0 +1,62 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Small bounded in-process cache with per-entry expiry.
+    
+    Entries are evicted least-recently-used first once `maxsize` is reached,
+    and are treated as missing after `ttl` seconds. Not shared across workers.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing/expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value under key, evicting the oldest entry if full."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        """Drop a single key if present."""
+        self._data.pop(key, None)
+
+    def pop_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every key matching predicate. Returns the number removed."""
+        doomed = [key for key in self._data if predicate(key)]
+        for key in doomed:
+            del self._data[key]
+        return len(doomed)
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -1,66 +1,242 @@
-import psycopg2
+import asyncio
+import asyncpg
+import json
 import os
-from openai import OpenAI
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 import numpy as np
 from datetime import date
-from typing import List, Tuple, Dict, Any
+from typing import AsyncIterator, List, Optional, Tuple, Dict, Any
+
+from core.settings import settings
+from db.pool import get_pool
+from utils.ann_index import chunk_index
+from utils.chunk_ingest import ChunkIngestor
+from utils.context_packer import pack_chunks, pack_history
+from utils.conversation_memory import conversation_memory
+from utils.embedding_cache import EmbeddingCache, build_embedder
+from utils.hybrid_retrieval import (
+    build_reranker,
+    lexical_tsquery,
+    metadata_filter_sql,
+    reciprocal_rank_fusion
+)
+from utils.tokens import estimate_tokens
 
 # Load environment
 load_dotenv()
-DB_URL = os.getenv("DATABASE_URL")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Async client so LLM calls never block the event loop; max_retries keeps
+# the worst case bounded by roughly (retries + 1) x timeout
+client = AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=1)
 EMBED_MODEL = "text-embedding-3-small"
-RAG_TABLE = "rag_chunks4"
+RAG_TABLE = settings.rag_table
+
+NO_CONTEXT_ANSWER = "No relevant information was found in the knowledge base."
+
+
+# Repeated questions skip the embedding round trip (memory, then Postgres)
+embedding_cache = EmbeddingCache(
+    build_embedder(client, EMBED_MODEL),
+    maxsize=settings.embedding_cache_size,
+    ttl=settings.embedding_cache_ttl_seconds,
+    persistent=settings.embedding_cache_persistent
+)
 
-# Global variable to store Q&A history
-conversation_history = []  # Stores (question, answer) tuples
+# Keeps RAG_TABLE in step with the source tables, re-embedding only changed chunks
+chunk_ingestor = ChunkIngestor(
+    embedding_cache.embedder,
+    RAG_TABLE,
+    batch_size=settings.rag_ingest_batch_size
+)
 
+# Optional second-stage scoring of fused hybrid candidates
+reranker = build_reranker(settings.rag_reranker, settings.rag_reranker_model)
 
-def get_text_embedding(text: str) -> List[float]:
+
+async def get_text_embedding(text: str) -> List[float]:
     """Generate a normalized embedding vector for the given text using an embedding model."""
-    response = client.embeddings.create(
-        model=EMBED_MODEL,
-        input=text
+    vec = await embedding_cache.get(text)
+    return vec.tolist()  # already normalized for cosine
+
+
+def _vector_literal(embedding: List[float]) -> str:
+    """pgvector text form; asyncpg has no native codec for the vector type."""
+    return "[" + ",".join(repr(float(v)) for v in embedding) + "]"
+
+
+async def _fetch_rag_rows(conn: asyncpg.Connection, rag_table: str, sql: str, *args, timeout: float) -> List[asyncpg.Record]:
+    """Run `sql` against {table} in the public schema, then the archive schema if it is missing there."""
+    try:
+        return await conn.fetch(sql.replace("{table}", rag_table), *args, timeout=timeout)
+    except asyncpg.exceptions.UndefinedTableError:
+        return await conn.fetch(sql.replace("{table}", f"archive.{rag_table}"), *args, timeout=timeout)
+
+
+async def _vector_candidates(
+    query_text: str,
+    rag_table: str,
+    k: int,
+    pool: asyncpg.Pool,
+    filters: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """(id, chunk_text, metadata, score) rows by inner product with the query embedding, best first."""
+    query_vector = await get_text_embedding(query_text)
+    filter_sql, filter_params = metadata_filter_sql(filters, 2)
+    timeout = settings.rag_retrieval_timeout_seconds
+
+    async with pool.acquire() as conn:
+        if settings.retriever_backend == "ann" and chunk_index.size and rag_table == settings.rag_table:
+            # Bootcamp scope is searched as index partitions; any other filter is
+            # applied in SQL, so over-fetch to still end up with ~k rows
+            partitions = [int(b) for b in filters["bootcamp_id"]] if filters and "bootcamp_id" in filters else None
+            fetch_k = k * settings.ann_filter_overfetch if set(filters or ()) - {"bootcamp_id"} else k
+            ids, scores = await asyncio.to_thread(
+                chunk_index.search, np.asarray(query_vector, dtype=np.float32), fetch_k, partitions
+            )
+            rows = await conn.fetch(f"""
+                SELECT id, chunk_text, metadata
+                FROM {rag_table}
+                WHERE id = ANY($1::bigint[]){filter_sql}
+            """, ids.tolist(), *filter_params, timeout=timeout)
+            # Back into similarity order; ids deleted since the last refresh drop out
+            score = dict(zip(ids.tolist(), scores.tolist()))
+            rows = sorted(rows, key=lambda row: score[row["id"]], reverse=True)[:k]
+            return [{**dict(row), "score": score[row["id"]]} for row in rows]
+
+        rows = await _fetch_rag_rows(conn, rag_table, f"""
+            SELECT id, chunk_text, metadata, -(embedding <#> $1::vector) AS score
+            FROM {{table}}
+            WHERE TRUE{filter_sql}
+            ORDER BY embedding <#> $1::vector
+            LIMIT ${len(filter_params) + 2}
+        """, _vector_literal(query_vector), *filter_params, k, timeout=timeout)
+    return [dict(row) for row in rows]
+
+
+async def _lexical_candidates(
+    query_text: str,
+    rag_table: str,
+    k: int,
+    pool: asyncpg.Pool,
+    filters: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """(id, chunk_text, metadata, score) rows by full-text rank (ts_rank_cd) on chunk_text, best first."""
+    tsquery = lexical_tsquery(query_text)
+    if tsquery is None:
+        return []
+    config = settings.rag_text_search_config
+    filter_sql, filter_params = metadata_filter_sql(filters, 2)
+    async with pool.acquire() as conn:
+        rows = await _fetch_rag_rows(conn, rag_table, f"""
+            SELECT id, chunk_text, metadata, ts_rank_cd(to_tsvector('{config}', chunk_text), q) AS score
+            FROM {{table}}, to_tsquery('{config}', $1) AS q
+            WHERE to_tsvector('{config}', chunk_text) @@ q{filter_sql}
+            ORDER BY score DESC
+            LIMIT ${len(filter_params) + 2}
+        """, tsquery, *filter_params, k, timeout=settings.rag_retrieval_timeout_seconds)
+    return [dict(row) for row in rows]
+
+
+async def get_top_k_chunks(
+    query_text: str,
+    rag_table: str = RAG_TABLE,
+    k: int = 50,
+    pool: asyncpg.Pool = None,
+    filters: Optional[Dict[str, Any]] = None
+) -> List[Tuple[str, Any, float]]:
+    """
+    Retrieve the top-k most relevant chunks from the RAG table based on semantic similarity to the query.
+
+    Returns (chunk_text, metadata, score) tuples, best first; score is the
+    inner product with the query embedding. `filters` maps metadata keys to
+    allowed values and is applied in the query.
+    """
+    rows = await _vector_candidates(query_text, rag_table, k, pool or get_pool(), filters)
+    return [(row["chunk_text"], _decode_metadata(row["metadata"]), row["score"]) for row in rows]
+
+
+async def get_hybrid_chunks(
+    query_text: str,
+    rag_table: str = RAG_TABLE,
+    k: int = 10,
+    pool: asyncpg.Pool = None,
+    filters: Optional[Dict[str, Any]] = None
+) -> List[Tuple[str, Any, float]]:
+    """
+    Retrieve the top-k chunks by vector similarity and full-text match combined.
+
+    Each retriever contributes `rag_candidate_k` candidates (run concurrently,
+    so the lexical query overlaps the embedding call), fused by reciprocal
+    rank. With a reranker configured, the fused candidates are re-scored per
+    (question, chunk) pair and blended with the fused score by
+    `rag_rerank_weight`. Returns (chunk_text, metadata, score), best first.
+    """
+    pool = pool or get_pool()
+    candidate_k = max(k, settings.rag_candidate_k)
+    vector_rows, lexical_rows = await asyncio.gather(
+        _vector_candidates(query_text, rag_table, candidate_k, pool, filters),
+        _lexical_candidates(query_text, rag_table, candidate_k, pool, filters)
+    )
+
+    rows = {row["id"]: row for row in list(lexical_rows) + list(vector_rows)}
+    fused = reciprocal_rank_fusion(
+        [[row["id"] for row in vector_rows], [row["id"] for row in lexical_rows]],
+        settings.rag_rrf_k
     )
-    vec = np.array(response.data[0].embedding)
-    norm = np.linalg.norm(vec)
-    if norm == 0:
-        return vec.tolist()  # edge case
-    return (vec / norm).tolist()  # normalize for cosine
-
-
-def get_top_k_chunks(query_text: str, rag_table: str = RAG_TABLE, k: int = 50) -> List[Tuple[str, Any]]:
-    """Retrieve the top-k most relevant chunks from the RAG table based on semantic similarity to the query."""
-    embedding = get_text_embedding(query_text)
-    with psycopg2.connect(DB_URL) as conn:
-        with conn.cursor() as cur:
-            # First try public schema, then archive schema
-            try:
-                cur.execute(f"""
-                    SELECT chunk_text, metadata
-                    FROM {rag_table}
-                    ORDER BY embedding <#> %s::vector
-                    LIMIT %s;
-                """, (embedding, k))
-                return cur.fetchall()
-            except psycopg2.errors.UndefinedTable:
-                # Try archive schema
-                cur.execute(f"""
-                    SELECT chunk_text, metadata
-                    FROM archive.{rag_table}
-                    ORDER BY embedding <#> %s::vector
-                    LIMIT %s;
-                """, (embedding, k))
-                return cur.fetchall()
-
-
-def build_rag_prompt(query: str, retrieved_chunks: List[Tuple[str, Any]]) -> str:
-    """Construct a prompt for the LLM model using the query and retrieved context chunks."""
+    ranked = sorted(fused, key=fused.get, reverse=True)
+    if not ranked:
+        return []
+
+    # Fused scores scaled to [0, 1] so they blend with reranker scores
+    top = fused[ranked[0]]
+    scores = {chunk_id: fused[chunk_id] / top for chunk_id in ranked}
+    if reranker is not None:
+        texts = [rows[chunk_id]["chunk_text"] for chunk_id in ranked]
+        if reranker.blocking:
+            relevance = await asyncio.to_thread(reranker.score, query_text, texts)
+        else:
+            relevance = reranker.score(query_text, texts)
+        weight = settings.rag_rerank_weight
+        for chunk_id, value in zip(ranked, relevance):
+            scores[chunk_id] = weight * value + (1 - weight) * scores[chunk_id]
+        ranked.sort(key=scores.get, reverse=True)
+
+    return [
+        (rows[chunk_id]["chunk_text"], _decode_metadata(rows[chunk_id]["metadata"]), scores[chunk_id])
+        for chunk_id in ranked[:k]
+    ]
+
+
+async def retrieve_chunks(
+    query_text: str,
+    k: Optional[int] = None,
+    pool: asyncpg.Pool = None,
+    filters: Optional[Dict[str, Any]] = None
+) -> List[Tuple[str, Any, float]]:
+    """Top chunks for a question using the configured retrieval mode ("hybrid" or "vector")."""
+    k = k or settings.rag_top_k
+    if settings.rag_retrieval_mode == "hybrid":
+        return await get_hybrid_chunks(query_text, rag_table=RAG_TABLE, k=k, pool=pool, filters=filters)
+    return await get_top_k_chunks(query_text, rag_table=RAG_TABLE, k=k, pool=pool, filters=filters)
+
+
+def _decode_metadata(metadata: Any) -> Any:
+    """asyncpg returns json/jsonb as text (psycopg2 decoded it)."""
+    return json.loads(metadata) if isinstance(metadata, str) else metadata
+
+
+def build_rag_prompt(
+    query: str,
+    retrieved_chunks: List[Tuple[str, Any, float]],
+    summary: str = "",
+    history: List[Tuple[str, str]] = ()
+) -> str:
+    """Construct a prompt for the LLM model using the query, (already packed) context chunks and session memory."""
     today_date = date.today().isoformat()
-    context = "\n\n".join([f"- {text}" for text, _ in retrieved_chunks])
-    memory_context = "\n".join([f"Q: {q}\nA: {a}" for q, a in conversation_history[-5:]])
+    context = "\n\n".join([f"- {text}" for text, _, _ in retrieved_chunks])
+    turns = pack_history(history, settings.rag_history_token_budget)
+    memory_context = "\n".join(([f"Earlier: {summary}"] if summary else []) + [f"Q: {q}\nA: {a}" for q, a in turns])
     
     prompt = f"""
 You are a precise assistant. Today is {today_date}. Use only the following context to answer the question.
@@ -81,45 +257,111 @@ Answer:"""
     return prompt
 
 
-def call_llm(prompt: str) -> str:
+async def call_llm(prompt: str) -> str:
     """Send the prompt to the LLM model and return its response."""
-    response = client.chat.completions.create(
+    return (await call_llm_with_usage(prompt))[0]
+
+
+async def call_llm_with_usage(prompt: str) -> Tuple[str, Optional[int]]:
+    """Like call_llm, also returning total tokens billed (None if the API omits usage)."""
+    response = await client.chat.completions.create(
         model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}]
+        messages=[{"role": "user", "content": prompt}],
+        timeout=settings.llm_timeout_seconds
     )
-    return response.choices[0].message.content
+    usage = getattr(response, "usage", None)
+    return response.choices[0].message.content, getattr(usage, "total_tokens", None)
 
 
-def rag_answer(query_text: str) -> Dict[str, Any]:
-    """Retrieve top matching chunks, build the prompt, get the model's answer, and store the interaction in memory."""
-    top_chunks = get_top_k_chunks(query_text, rag_table=RAG_TABLE, k=50)
+async def stream_llm(prompt: str) -> AsyncIterator[str]:
+    """Like call_llm, yielding answer text as the model produces it."""
+    stream = await client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": prompt}],
+        timeout=settings.llm_timeout_seconds,
+        stream=True
+    )
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
 
-    # Handle case where nothing is retrieved
-    if not top_chunks:
-        return {
-            "answer": "No relevant information was found in the knowledge base.",
-            "sources": [],
-            "chunks": []
-        }
-    
-    prompt = build_rag_prompt(query_text, top_chunks)
-    answer = call_llm(prompt)
-    
-    # Store in conversation history
-    conversation_history.append((query_text, answer))
-    
-    # Format sources for API response
+
+def format_sources(chunks: List[Tuple[str, Any, float]], limit: int = 5) -> List[Dict[str, Any]]:
+    """API source entries for the top `limit` chunks."""
     sources = []
-    for i, (chunk_text, metadata) in enumerate(top_chunks[:5]):  # Top 5 sources
+    for i, (chunk_text, metadata, _) in enumerate(chunks[:limit]):
         sources.append({
             "type": "document_chunk",
             "content": chunk_text[:200] + "..." if len(chunk_text) > 200 else chunk_text,
             "metadata": metadata,
             "relevance_rank": i + 1
         })
+    return sources
+
+
+async def prepare_rag_prompt(
+    query_text: str,
+    pool: asyncpg.Pool = None,
+    session_id: Any = None,
+    filters: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Retrieve and pack context for a question.
+
+    `filters` (metadata key -> allowed values) restricts retrieval, e.g.
+    {"bootcamp_id": [3]}. Returns prompt, chunks, sources and
+    context_tokens, or None when nothing relevant was retrieved.
+    """
+    top_chunks = await retrieve_chunks(query_text, pool=pool, filters=filters)
+    if not top_chunks:
+        return None
+
+    # Dedupe, rank by score and keep what fits in the context budget
+    packed_chunks, context_tokens = pack_chunks(
+        top_chunks,
+        settings.rag_context_token_budget,
+        settings.rag_dedupe_threshold
+    )
+    summary, history = await conversation_memory.context(session_id)
+    return {
+        "prompt": build_rag_prompt(query_text, packed_chunks, summary, history),
+        "chunks": packed_chunks,
+        "sources": format_sources(packed_chunks),
+        "context_tokens": context_tokens
+    }
+
+
+async def rag_answer(
+    query_text: str,
+    pool: asyncpg.Pool = None,
+    session_id: Any = None,
+    filters: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Retrieve top matching chunks, build the prompt (with the session's memory) and get the model's answer.
+
+    Callers record the finished turn in conversation_memory.
+    """
+    prepared = await prepare_rag_prompt(query_text, pool, session_id, filters)
+
+    # Handle case where nothing is retrieved
+    if prepared is None:
+        return {
+            "answer": NO_CONTEXT_ANSWER,
+            "sources": [],
+            "chunks": [],
+            "tokens_used": 0
+        }
+    
+    answer, tokens_used = await call_llm_with_usage(prepared["prompt"])
+    if tokens_used is None:
+        tokens_used = estimate_tokens(prepared["prompt"]) + estimate_tokens(answer)
     
     return {
         "answer": answer,
-        "sources": sources,
-        "chunks": top_chunks
+        "sources": prepared["sources"],
+        "chunks": prepared["chunks"],
+        "context_tokens": prepared["context_tokens"],
+        "tokens_used": tokens_used
     }
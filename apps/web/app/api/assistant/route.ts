@@ -5,8 +5,6 @@ export async function POST(request: NextRequest) {
     const body = await request.json();
     const { message, conversation_history, rag_system } = body;
 
-    // No authentication required - removed for RAG testing
-
     // Prepare the request for your FastAPI backend
     const apiRequest = {
       query: message,
@@ -21,6 +19,8 @@ export async function POST(request: NextRequest) {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        'x-user-id': request.headers.get('x-user-id') || '',
+        'x-user-role': request.headers.get('x-user-role') || '',
       },
       body: JSON.stringify(apiRequest),
     });
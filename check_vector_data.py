@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 
+import asyncio
 import sys
 import os
 sys.path.append(r"c:\Users\rssh1\Desktop\ClassSight\apps\api")
 
+from db.pool import close_pool, create_pool
 from utils.vector_rag import get_top_k_chunks, RAG_TABLE
 import psycopg2
 from dotenv import load_dotenv
@@ -11,6 +13,14 @@ from dotenv import load_dotenv
 load_dotenv()
 DB_URL = os.getenv("DATABASE_URL")
 
+async def search_chunks(query, k):
+    """Vector search over the shared asyncpg pool, as the API runs it"""
+    pool = await create_pool(DB_URL)
+    try:
+        return await get_top_k_chunks(query, k=k, pool=pool)
+    finally:
+        await close_pool()
+
 def check_vector_rag_data():
     """Check what data is available in the vector RAG table"""
     
@@ -64,11 +74,11 @@ def check_vector_rag_data():
     print("="*40)
     
     try:
-        chunks = get_top_k_chunks("How many students are enrolled?", k=5)
+        chunks = asyncio.run(search_chunks("How many students are enrolled?", k=5))
         print(f"Found {len(chunks)} relevant chunks for student enrollment query:")
         
-        for i, (text, metadata) in enumerate(chunks, 1):
-            print(f"\n--- Relevant Chunk {i} ---")
+        for i, (text, metadata, score) in enumerate(chunks, 1):
+            print(f"\n--- Relevant Chunk {i} (score {score:.4f}) ---")
             print(f"Text: {text[:300]}...")
             print(f"Metadata: {metadata}")
             
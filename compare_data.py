@@ -1,9 +1,12 @@
-!/usr/bin/env python3
+#!/usr/bin/env python3
 
+import asyncio
 import sys
 import os
 sys.path.append(r"c:\Users\rssh1\Desktop\ClassSight\apps\api")
 
+from core.settings import settings
+from db.pool import close_pool, create_pool, create_readonly_pool
 from utils.sql_rag import answer_question
 import psycopg2
 from dotenv import load_dotenv
@@ -11,6 +14,19 @@ from dotenv import load_dotenv
 load_dotenv()
 DB_URL = os.getenv("DATABASE_URL")
 
+async def ask_sql_rag(question):
+    """Answer through the SQL assistant on the same pools the API uses"""
+    await create_pool(DB_URL)
+    await create_readonly_pool(
+        settings.sql_rag_database_url or DB_URL,
+        settings.sql_rag_statement_timeout_ms
+    )
+    try:
+        # No chat session, and no bootcamp restriction (admin view)
+        return await answer_question(question, session_id=None, bootcamp_ids=None)
+    finally:
+        await close_pool()
+
 def compare_data_sources():
     """Compare what SQL RAG sees vs Vector RAG"""
     
@@ -57,7 +73,7 @@ def compare_data_sources():
     print("="*40)
     
     try:
-        result = answer_question("How many students are enrolled?")
+        result = asyncio.run(ask_sql_rag("How many students are enrolled?"))
         print(f"SQL RAG Answer: {result['answer']}")
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -1,12 +1,15 @@
 #!/usr/bin/env python3
 
+import asyncio
 import sys
 import os
 sys.path.append(r"c:\Users\rssh1\Desktop\ClassSight\apps\api")
 
+from core.settings import settings
+from db.pool import close_pool, create_pool
 from utils.vector_rag import rag_answer
 
-def test_vector_rag_queries():
+async def test_vector_rag_queries():
     """Test the actual Vector RAG responses"""
     
     queries = [
@@ -19,14 +22,18 @@ def test_vector_rag_queries():
     print("🧪 Testing Vector RAG Responses:")
     print("="*60)
     
-    for i, query in enumerate(queries, 1):
-        print(f"\n--- Query {i}: {query} ---")
-        try:
-            result = rag_answer(query)
-            print(f"Answer: {result['answer']}")
-            print(f"Sources: {len(result.get('sources', []))} sources found")
-        except Exception as e:
-            print(f"❌ Error: {e}")
+    await create_pool(settings.database_url)
+    try:
+        for i, query in enumerate(queries, 1):
+            print(f"\n--- Query {i}: {query} ---")
+            try:
+                result = await rag_answer(query)
+                print(f"Answer: {result['answer']}")
+                print(f"Sources: {len(result.get('sources', []))} sources found")
+            except Exception as e:
+                print(f"❌ Error: {e}")
+    finally:
+        await close_pool()
 
 if __name__ == "__main__":
-    test_vector_rag_queries()
+    asyncio.run(test_vector_rag_queries())